@@ -1,152 +1,74 @@
+import os
+from collections import OrderedDict
 import numpy as np
-import gymnasium as gym
-from stable_baselines3 import PPO
-from stable_baselines3.common.env_checker import check_env
-import torch  # ✅ Ajout nécessaire
-import tkinter as tk
-from tkinter import messagebox
-
-# === CLASSE TIC-TAC-TOE ===
-class TicTacToe:
-    def __init__(self):
-        self.board = [[0]*3 for _ in range(3)]
-        self.current_player = 1
-        self.game_over = False
-        self.winner = None
-
-    def reset(self):
-        self.board = [[0]*3 for _ in range(3)]
-        self.current_player = 1
-        self.game_over = False
-        self.winner = None
-
-    def make_move(self, row, col):
-        if self.board[row][col] != 0 or self.game_over:
-            return False
-        self.board[row][col] = self.current_player
-
-        if self.check_winner(self.current_player):
-            self.winner = self.current_player
-            self.game_over = True
-        elif all(cell != 0 for r in self.board for cell in r):
-            self.winner = 0
-            self.game_over = True
-        else:
-            self.current_player = 2 if self.current_player == 1 else 1
-        return True
-
-    def check_winner(self, player):
-        for i in range(3):
-            if all(self.board[i][j] == player for j in range(3)) or \
-               all(self.board[j][i] == player for j in range(3)):
-                return True
-        if all(self.board[i][i] == player for i in range(3)) or \
-           all(self.board[i][2-i] == player for i in range(3)):
-            return True
-        return False
-
-    def get_valid_moves(self):
-        return [(i, j) for i in range(3) for j in range(3) if self.board[i][j] == 0]
-
-# === ENVIRONNEMENT GYMNASIUM ===
-class TicTacToeEnv(gym.Env):
-    metadata = {"render_modes": ["human"]}
-
-    def __init__(self, render_mode=None):
-        super(TicTacToeEnv, self).__init__()
-        self.render_mode = render_mode
-        self.game = TicTacToe()
-
-        self.action_space = gym.spaces.Discrete(9)
-        self.observation_space = gym.spaces.Box(low=0, high=2, shape=(9,), dtype=np.int32)
-
-    def reset(self, seed=None, options=None):
-        super().reset(seed=seed)
-        self.game.reset()
-        return np.array(self.game.board).flatten(), {}
-
-    def step(self, action):
-        row = action // 3
-        col = action % 3
+from engine import TicTacToe
+from solver import decode, oracle_report, reachable_codes
+from tictactoe_env import BOARD_POWERS, TicTacToeEnv
 
-        valid_moves = self.game.get_valid_moves()
-        if (row, col) not in valid_moves:
-            return np.array(self.game.board).flatten(), -20, True, False, {"invalid_move": True}
-
-        old_board = [r[:] for r in self.game.board]
-        self.game.make_move(row, col)
-
-        reward = 0
-        terminated = self.game.game_over
-        info = {}
+# stable_baselines3/torch (training, DRLAgent) and tkinter (GUI) are heavy:
+# they are imported in the functions that use them, so importing this
+# module for the env or the engine stays cheap.
 
-        if self.game.winner == 2:
-            reward = 100
-        elif self.game.winner == 1:
-            reward = -100
-        elif self.game.winner == 0:
-            reward = 10
-        else:
-            reward += self.calculate_strategic_reward(old_board)
-
-        return np.array(self.game.board).flatten(), reward, terminated, False, info
+# === ENTRAÎNEMENT ===
+def train_ai(save_path="tictactoe_ppo", n_envs=1, total_timesteps=200000,
+             vec_env="batch", n_workers=None, pretrain=None, self_play=False, masked=True):
+    """Train PPO; with n_envs > 1 rollouts come from a vectorized env.
+
+    vec_env="batch" steps all boards in-process with TicTacToeVecEnv,
+    vec_env="subproc" runs TicTacToeEnv copies in n_workers processes
+    (ShmSubprocVecEnv, at least one env per worker). The rollout size
+    stays 2048 steps whatever the number of envs is.
+
+    pretrain="solver" (solver-optimal moves) or a game log directory first
+    fits the policy on that dataset (pretrain.py), PPO then fine-tunes it.
+
+    self_play=True trains against a league of opponents instead (random,
+    solver and frozen snapshots of the policy, league.py), on n_envs
+    in-process games.
+
+    masked=True uses MaskedMlpPolicy (masked_policy.py): the action
+    distribution only covers the empty cells, so no rollout sample is
+    spent on an illegal move.
+    """
+    from stable_baselines3.common.env_checker import check_env
+    from vec_env import ShmSubprocVecEnv, TicTacToeVecEnv
+
+    callback = None
+    if self_play:
+        from league import LeagueCallback, LeagueVecEnv, OpponentPool
+
+        pool = OpponentPool()
+        env = LeagueVecEnv(n_envs, pool)
+        callback = LeagueCallback(pool)
+    elif vec_env == "subproc":
+        n_workers = n_workers or os.cpu_count()
+        n_envs = max(n_envs, n_workers)
+        env = ShmSubprocVecEnv([TicTacToeEnv] * n_envs, n_workers=n_workers)
+    elif n_envs > 1:
+        env = TicTacToeVecEnv(n_envs)
+    else:
+        env = TicTacToeEnv()
+        check_env(env)
+
+    model = build_model(env, n_envs, pretrain, masked=masked)
+    model.learn(total_timesteps=total_timesteps, callback=callback)
+    model.save(save_path)
+    if vec_env == "subproc" and not self_play:
+        env.close()
+    return model
 
-    def calculate_strategic_reward(self, old_board):
-        board = self.game.board
-        player = 2
-        opponent = 1
-        reward = 0
 
-        for i in range(3):
-            line = list(board[i])
-            reward += self.evaluate_line(line, player, opponent)
-            col = list([board[0][i], board[1][i], board[2][i]])
-            reward += self.evaluate_line(col, player, opponent)
-
-        diag1 = list([board[0][0], board[1][1], board[2][2]])
-        diag2 = list([board[0][2], board[1][1], board[2][0]])
-        reward += self.evaluate_line(diag1, player, opponent)
-        reward += self.evaluate_line(diag2, player, opponent)
-
-        if board[1][1] == player:
-            reward += 2
-        elif board[1][1] == opponent:
-            reward -= 1
-
-        corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
-        for r, c in corners:
-            if board[r][c] == player:
-                reward += 1
-
-        return reward
-
-    def evaluate_line(self, line, player, opponent):
-        p = line.count(player)
-        o = line.count(opponent)
-        e = line.count(0)
-
-        if p == 3:
-            return 100
-        if o == 3:
-            return -100
-        if o == 0 and p == 2 and e == 1:
-            return 10
-        if o == 0 and p == 1 and e == 2:
-            return 2
-        if p == 0 and o == 2 and e == 1:
-            return 15
-        if p == 0 and o == 1 and e == 2:
-            return 3
-        return 0
+def build_model(env, n_envs=1, pretrain=None, verbose=1, masked=True):
+    """PPO model with the project's hyperparameters, optionally pretrained and masked (see train_ai)"""
+    from stable_baselines3 import PPO
 
-# === ENTRAÎNEMENT ===
-def train_ai(save_path="tictactoe_ppo"):
-    env = TicTacToeEnv()
-    check_env(env)
+    policy = "MlpPolicy"
+    if masked:
+        from masked_policy import MaskedMlpPolicy as policy
 
-    model = PPO("MlpPolicy", env, verbose=1,
+    model = PPO(policy, env, verbose=verbose,
                 learning_rate=0.0003,
-                n_steps=2048,
+                n_steps=max(2048 // n_envs, 1),
                 batch_size=64,
                 n_epochs=10,
                 gamma=0.99,
@@ -154,32 +76,79 @@ def train_ai(save_path="tictactoe_ppo"):
                 ent_coef=0.01,
                 policy_kwargs=dict(net_arch=[64, 64]))
 
-    model.learn(total_timesteps=200000)
-    model.save(save_path)
+    if pretrain is not None:
+        from pretrain import game_log_dataset, pretrain_policy, solver_dataset
+        boards, actions = solver_dataset() if pretrain == "solver" else game_log_dataset(pretrain)
+        losses = pretrain_policy(model.policy, boards, actions)
+        if verbose:
+            print(f"Pré-entraînement sur {len(boards)} coups : perte {losses[0]:.3f} -> {losses[-1]:.3f}")
     return model
 
 # === AGENT DRL CORRIGÉ ===
 class DRLAgent:
-    def __init__(self, model_path="tictactoe_ppo"):
+    """Plays the trained PPO policy, restricted to the valid moves.
+
+    Probabilities come from one forward pass with the occupied cells
+    masked (as in MaskedMlpPolicy), cached in an LRU keyed on the base-3
+    board code. precompute=True fills the cache for every reachable
+    position at load time, so predict never runs the network.
+    """
+
+    def __init__(self, model_path="tictactoe_ppo", cache_size=8192, precompute=False):
+        from stable_baselines3 import PPO
+
         self.model = PPO.load(model_path)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._table = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        if precompute:
+            self.precompute()
+
+    def _forward(self, boards):
+        """Legal-move probabilities for an (N, 9) array of boards, one batched pass"""
+        import torch
+        from masked_policy import mask_logits
+
+        with torch.no_grad():
+            obs = torch.as_tensor(boards, dtype=torch.float32)
+            logits = self.model.policy.get_distribution(obs).distribution.logits
+            return torch.softmax(mask_logits(logits, obs), dim=-1).numpy()
+
+    def precompute(self):
+        codes = reachable_codes()
+        probs = self._forward(np.array([decode(code) for code in codes]))
+        self._table = dict(zip(codes, probs))
+
+    def action_probs(self, flat_board):
+        code = int(flat_board.dot(BOARD_POWERS))
+        if self._table is not None and code in self._table:
+            self.cache_hits += 1
+            return self._table[code]
+        probs = self._cache.get(code)
+        if probs is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(code)
+            return probs
+        self.cache_misses += 1
+        probs = self._forward(flat_board[None])[0]
+        self._cache[code] = probs
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return probs
 
     def predict(self, board, valid_moves):
         flat_board = np.array(board).flatten()
-        action, _ = self.model.predict(flat_board, deterministic=True)
-        row, col = divmod(action, 3)
-
-        if (row, col) in valid_moves:
-            return row, col
-
-        valid_actions = [r * 3 + c for (r, c) in valid_moves]
-        obs = torch.tensor([flat_board], dtype=torch.float32)  # ✅ CORRECTION ICI
-        dist = self.model.policy.get_distribution(obs)
-        probs = dist.distribution.probs.detach().numpy().flatten()
+        probs = self.action_probs(flat_board)
+        # Les cases occupées ont déjà une probabilité nulle ; valid_moves peut restreindre davantage
+        mask = np.zeros(9, dtype=bool)
+        mask[[r * 3 + c for (r, c) in valid_moves]] = True
+        return divmod(int(np.where(mask, probs, -1.0).argmax()), 3)
 
-        valid_probs = np.zeros(9)
-        valid_probs[valid_actions] = probs[valid_actions]
-        best_action = valid_actions[np.argmax(valid_probs[valid_actions])]
-        return divmod(best_action, 3)
+    def predict_batch(self, boards, masks):
+        """Most probable legal cell for each row of boards (N, 9), in one forward pass"""
+        return np.where(masks, self._forward(boards), -1.0).argmax(axis=-1)
 
 # === INTERFACE TKINTER ===
 class TicTacToeGUI:
@@ -193,6 +162,8 @@ class TicTacToeGUI:
         self.create_widgets()
 
     def create_widgets(self):
+        import tkinter as tk
+
         for i in range(3):
             for j in range(3):
                 btn = tk.Button(self.root, text="", font=("Helvetica", 36), width=5, height=2,
@@ -227,6 +198,8 @@ class TicTacToeGUI:
                 self.buttons[i][j].config(text=symbols[self.game.board[i][j]])
 
     def show_result(self):
+        from tkinter import messagebox
+
         if self.game.winner == 1:
             msg = "🎉 Tu as gagné !"
         elif self.game.winner == 2:
@@ -238,11 +211,15 @@ class TicTacToeGUI:
 
 # === LANCEMENT ===
 if __name__ == "__main__":
+    import tkinter as tk
+
     print("Entraînement de l'IA...")
     train_ai()
 
     print("Démarrage de l'interface graphique...")
     root = tk.Tk()
     agent = DRLAgent("tictactoe_ppo")
+    report = oracle_report(agent, player=2)
+    print(f"Coups optimaux (vs solveur) : {report['optimal']}/{report['positions']}")
     app = TicTacToeGUI(root, agent)
     root.mainloop()
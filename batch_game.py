@@ -0,0 +1,86 @@
+import numpy as np
+
+# Cell indices (row * 3 + col) of the 8 winning lines
+LINES = np.array([
+    [0, 1, 2], [3, 4, 5], [6, 7, 8],  # rows
+    [0, 3, 6], [1, 4, 7], [2, 5, 8],  # columns
+    [0, 4, 8], [2, 4, 6],             # diagonals
+], dtype=np.intp)
+
+
+def _cell_lines(cell):
+    lines = LINES[(LINES == cell).any(axis=1)]
+    return np.concatenate([lines, np.repeat(lines[:1], 4 - len(lines), axis=0)])
+
+
+# Lines going through each cell, padded to 4 by repeating the first one,
+# so win detection after a move only looks at the lines the move touches
+CELL_LINES = np.stack([_cell_lines(cell) for cell in range(9)])  # (9, 4, 3)
+
+
+class BatchTicTacToe:
+    """N tic-tac-toe games advanced together with one vectorized call.
+
+    Boards are stored as an (N, 9) int8 array (0 empty, 1 X, 2 O); the
+    other per-game fields are length-N arrays. ``winner`` is 0 while the
+    game is running and for a draw.
+    """
+
+    def __init__(self, n_games, auto_reset=False):
+        self.n_games = n_games
+        self.auto_reset = auto_reset
+        self._index = np.arange(n_games)
+        self.boards = np.zeros((n_games, 9), dtype=np.int8)
+        self.current_player = np.ones(n_games, dtype=np.int8)
+        self.game_over = np.zeros(n_games, dtype=bool)
+        self.winner = np.zeros(n_games, dtype=np.int8)
+
+    def reset(self, mask=None):
+        """Reset every game, or only those where the boolean mask is set"""
+        if mask is None:
+            mask = slice(None)
+        self.boards[mask] = 0
+        self.current_player[mask] = 1
+        self.game_over[mask] = False
+        self.winner[mask] = 0
+
+    def valid_moves_mask(self):
+        """(N, 9) boolean array of the cells each game can play"""
+        return (self.boards == 0) & ~self.game_over[:, None]
+
+    def sample_valid_actions(self, rng):
+        """Uniformly random legal cell per game (0 for finished games)"""
+        scores = rng.random((self.n_games, 9)) * self.valid_moves_mask()
+        return scores.argmax(axis=1)
+
+    def step(self, actions):
+        """Play one move (cell index 0-8) in every game.
+
+        Moves on occupied cells, out of range or in finished games are
+        ignored. Returns (valid, winner, done) arrays describing this move;
+        with auto_reset the finished games are then reset in place.
+        """
+        actions = np.asarray(actions)
+        cells = np.clip(actions, 0, 8)
+        index = self._index
+        players = self.current_player
+
+        valid = ((actions >= 0) & (actions < 9) & ~self.game_over
+                 & (self.boards[index, cells] == 0))
+        moved = index[valid]
+        self.boards[moved, cells[valid]] = players[valid]
+
+        lines = self.boards[index[:, None, None], CELL_LINES[cells]]
+        won = valid & (lines == players[:, None, None]).all(axis=2).any(axis=1)
+        draw = valid & ~won & (self.boards != 0).all(axis=1)
+        done = won | draw
+        winner = np.where(won, players, 0).astype(np.int8)
+
+        self.winner[won] = players[won]
+        self.game_over |= done
+        switch = valid & ~done
+        self.current_player[switch] = 3 - self.current_player[switch]
+
+        if self.auto_reset and done.any():
+            self.reset(done)
+        return valid, winner, done
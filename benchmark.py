@@ -0,0 +1,1199 @@
+"""Micro-benchmarks for the game engines.
+
+Usage:
+    python benchmark.py            # run every benchmark
+    python benchmark.py engine     # run only the named benchmarks
+
+Regression suite (engine, env, agent, server; every result in ops/s):
+    python benchmark.py suite --save benchmark_baseline.json
+    python benchmark.py compare benchmark_baseline.json [current.json] [--threshold 0.1]
+compare runs the suite (or reads current.json) and exits with status 1 if
+a case is slower than the baseline by more than the threshold.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from engine import TicTacToe
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.replace('bench_', '')] = func
+    return func
+
+
+def timed(func, repeat=3):
+    """Best wall time over `repeat` runs of func()"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class ListTicTacToe:
+    """Reference list-of-lists engine (the implementation before the bitboard one)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.board = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+        self.current_player = 1
+        self.game_over = False
+        self.winner = None
+        self.winning_line = None
+
+    def make_move(self, row, col):
+        if self.game_over or row not in range(3) or col not in range(3):
+            return False
+        if self.board[row][col] != 0:
+            return False
+        self.board[row][col] = self.current_player
+        self.check_winner(row, col)
+        if not self.game_over:
+            self.current_player = 3 - self.current_player
+        return True
+
+    def check_winner(self, row, col):
+        player = self.board[row][col]
+        if all(cell == player for cell in self.board[row]):
+            self.winning_line, self.game_over, self.winner = ('row', row), True, player
+            return
+        if all(self.board[i][col] == player for i in range(3)):
+            self.winning_line, self.game_over, self.winner = ('col', col), True, player
+            return
+        if row == col and all(self.board[i][i] == player for i in range(3)):
+            self.winning_line, self.game_over, self.winner = ('diag', 1), True, player
+            return
+        if row + col == 2 and all(self.board[i][2-i] == player for i in range(3)):
+            self.winning_line, self.game_over, self.winner = ('diag', 2), True, player
+            return
+        if all(cell != 0 for row in self.board for cell in row):
+            self.game_over = True
+
+    def get_valid_moves(self):
+        moves = []
+        for row in range(3):
+            for col in range(3):
+                if self.board[row][col] == 0:
+                    moves.append((row, col))
+        return moves
+
+
+def play_random_games(engine_cls, n_games, seed=0):
+    """Play n_games random games, return the number of moves made"""
+    rng = random.Random(seed)
+    game = engine_cls()
+    moves = 0
+    for _ in range(n_games):
+        game.reset()
+        while not game.game_over:
+            row, col = rng.choice(game.get_valid_moves())
+            game.make_move(row, col)
+            moves += 1
+    return moves
+
+
+@benchmark
+def bench_engine(n_games=20000):
+    """Random games through make_move/get_valid_moves, list vs bitboard engine"""
+    results = {}
+    for name, engine_cls in (('list', ListTicTacToe), ('bitboard', TicTacToe)):
+        moves = play_random_games(engine_cls, n_games)
+        seconds = timed(lambda: play_random_games(engine_cls, n_games))
+        results[name] = moves / seconds
+        print(f"  {name:<10} {moves / seconds:>12,.0f} moves/s")
+    print(f"  speedup    {results['bitboard'] / results['list']:>12.2f}x")
+    return results
+
+
+class ScanKInARow:
+    """Reference N x N engine scanning every line of the board after each move"""
+
+    def __init__(self, size=15, win_length=5):
+        self.size = size
+        self.win_length = win_length
+        self.reset()
+
+    def reset(self):
+        self.board = [[0] * self.size for _ in range(self.size)]
+        self.current_player = 1
+        self.game_over = False
+        self.winner = None
+
+    def get_valid_moves(self):
+        return [(r, c) for r in range(self.size) for c in range(self.size) if self.board[r][c] == 0]
+
+    def make_move(self, row, col):
+        if self.game_over or self.board[row][col] != 0:
+            return False
+        self.board[row][col] = self.current_player
+        self.winner = scan_winner(self.board, self.win_length)
+        if self.winner or all(0 not in line for line in self.board):
+            self.game_over = True
+        else:
+            self.current_player = 3 - self.current_player
+        return True
+
+
+def scan_winner(board, win_length):
+    """Player with win_length stones in a row anywhere on the board, else None"""
+    size = len(board)
+    for row in range(size):
+        for col in range(size):
+            player = board[row][col]
+            if not player:
+                continue
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row, end_col = row + (win_length - 1) * dr, col + (win_length - 1) * dc
+                if not (0 <= end_row < size and 0 <= end_col < size):
+                    continue
+                if all(board[row + i * dr][col + i * dc] == player for i in range(win_length)):
+                    return player
+    return None
+
+
+@benchmark
+def bench_board_size(n_moves=20000, sizes=(3, 7, 15, 19, 31)):
+    """Cost of one move (play + win check + legal-move update) as the board grows"""
+    from engine import KInARow, make_game
+
+    def run(game, cells_of, n):
+        rng = random.Random(0)
+        moves = 0
+        while moves < n:
+            game.reset()
+            while not game.game_over:
+                row, col = rng.choice(cells_of(game))
+                game.make_move(row, col)
+                moves += 1
+        return moves
+
+    results = {}
+    for size in sizes:
+        win_length = min(size, 5)
+        engines = {'KInARow': (KInARow(size, win_length), KInARow.get_valid_moves)}
+        if size == 3:
+            engines['bitboard'] = (make_game(3), TicTacToe.get_valid_moves)
+        if size <= 15:
+            # Le balayage complet devient trop lent au-delà
+            engines['full scan'] = (ScanKInARow(size, win_length), ScanKInARow.get_valid_moves)
+        for name, (game, cells_of) in engines.items():
+            n = n_moves if name != 'full scan' else max(n_moves // size ** 2, 100)
+            seconds = timed(lambda: run(game, cells_of, n), repeat=1)
+            results[f'{size}x{size} {name}'] = seconds / n
+            print(f"  {size:>2}x{size:<2} k={win_length}  {name:<9} {seconds / n * 1e6:>9.2f} us/move")
+
+    # Coût du coup seul : cases tirées dans free_cells, sans construire la liste des coups
+    for size in sizes:
+        game = KInARow(size, min(size, 5))
+        rng = random.Random(0)
+
+        def play_only():
+            played = 0
+            while played < n_moves:
+                game.reset()
+                while not game.game_over:
+                    game.play(game.free_cells[int(rng.random() * len(game.free_cells))])
+                    played += 1
+
+        seconds = timed(play_only, repeat=1)
+        results[f'{size}x{size} play'] = seconds / n_moves
+        print(f"  {size:>2}x{size:<2} play(cell) only      {seconds / n_moves * 1e6:>9.2f} us/move")
+    return results
+
+
+@benchmark
+def bench_batch(n_games=4096, n_steps=200):
+    """Moves/sec of BatchTicTacToe (auto-reset) vs looping over TicTacToe instances"""
+    import numpy as np
+    from batch_game import BatchTicTacToe
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in (1, 64, n_games):
+        batch = BatchTicTacToe(size, auto_reset=True)
+
+        def run():
+            for _ in range(n_steps):
+                batch.step(batch.sample_valid_actions(rng))
+
+        results[size] = size * n_steps / timed(run)
+        print(f"  batch N={size:<7} {results[size]:>12,.0f} moves/s")
+    moves = play_random_games(TicTacToe, n_games)
+    results['single'] = moves / timed(lambda: play_random_games(TicTacToe, n_games))
+    print(f"  single engine   {results['single']:>12,.0f} moves/s")
+    return results
+
+
+@benchmark
+def bench_env(n_steps=20000):
+    """Env steps/sec: TicTacToeEnv vs TicTacToeVecEnv (random legal actions)"""
+    import numpy as np
+    from tictactoe_env import TicTacToeEnv
+    from vec_env import TicTacToeVecEnv
+
+    rng = np.random.default_rng(0)
+    env = TicTacToeEnv()
+
+    def run_single():
+        env.reset()
+        for _ in range(n_steps):
+            board = np.array(env.game.board).flatten()
+            _, _, terminated, _, _ = env.step(rng.choice(np.flatnonzero(board == 0)))
+            if terminated:
+                env.reset()
+
+    results = {'single': n_steps / timed(run_single)}
+    print(f"  TicTacToeEnv          {results['single']:>12,.0f} steps/s")
+    for n_envs in (16, 256):
+        vec_env = TicTacToeVecEnv(n_envs)
+        vec_env.reset()
+
+        def run_vec():
+            for _ in range(n_steps // n_envs):
+                vec_env.step(vec_env.games.sample_valid_actions(rng))
+
+        results[n_envs] = (n_steps // n_envs) * n_envs / timed(run_vec)
+        print(f"  TicTacToeVecEnv N={n_envs:<4} {results[n_envs]:>12,.0f} steps/s")
+    return results
+
+
+@benchmark
+def bench_reward(n=200000):
+    """Strategic reward of one board: legacy per-step function vs table lookup, and a batch of boards"""
+    import numpy as np
+    from solver import TERNARY
+    from tictactoe_env import STRATEGIC_REWARDS, strategic_rewards
+
+    board = [[1, 0, 2], [0, 1, 0], [0, 0, 2]]
+    x, o = 0b000010001, 0b100000100
+
+    results = {
+        'legacy': timed(lambda: [legacy_strategic_reward(board) for _ in range(n // 10)]) / (n // 10),
+        'table': timed(lambda: [STRATEGIC_REWARDS[TERNARY[x] + 2 * TERNARY[o]] for _ in range(n)]) / n,
+    }
+    boards = np.random.default_rng(0).integers(0, 3, (4096, 9)).astype(np.int8)
+    results['batch_4096'] = timed(lambda: strategic_rewards(boards)) / len(boards)
+    for name, seconds in results.items():
+        print(f"  {name:<10} {seconds * 1e9:>9,.0f} ns/board")
+    return results
+
+
+@benchmark
+def bench_subproc(n_envs_per_worker=8, n_steps=500):
+    """Steps/sec of ShmSubprocVecEnv from 1 worker up to one per core"""
+    import os
+    import numpy as np
+    from tictactoe_env import TicTacToeEnv
+    from vec_env import ShmSubprocVecEnv
+
+    rng = np.random.default_rng(0)
+    n_cores = os.cpu_count()
+    counts = sorted({1, n_cores} | {2 ** i for i in range(1, n_cores.bit_length()) if 2 ** i < n_cores})
+    results = {}
+    for n_workers in counts:
+        n_envs = n_workers * n_envs_per_worker
+        env = ShmSubprocVecEnv([TicTacToeEnv] * n_envs, n_workers=n_workers)
+        obs = env.reset()
+
+        def run():
+            nonlocal obs
+            for _ in range(n_steps):
+                actions = (rng.random(obs.shape) * (obs == 0)).argmax(axis=1)
+                obs = env.step(actions)[0]
+
+        try:
+            results[n_workers] = n_envs * n_steps / timed(run, repeat=1)
+        finally:
+            env.close()
+        print(f"  workers={n_workers:<3} envs={n_envs:<4} {results[n_workers]:>12,.0f} steps/s"
+              f"  (x{results[n_workers] / results[1]:.2f})")
+    return results
+
+
+def legacy_predict(model, board, valid_moves):
+    """DRLAgent.predict before the cache: model.predict, then a second pass if illegal"""
+    import numpy as np
+    import torch
+
+    flat_board = np.array(board).flatten()
+    action, _ = model.predict(flat_board, deterministic=True)
+    row, col = divmod(action, 3)
+    if (row, col) in valid_moves:
+        return row, col
+    valid_actions = [r * 3 + c for (r, c) in valid_moves]
+    obs = torch.tensor([flat_board], dtype=torch.float32)
+    probs = model.policy.get_distribution(obs).distribution.probs.detach().numpy().flatten()
+    return divmod(valid_actions[np.argmax(probs[valid_actions])], 3)
+
+
+def legacy_strategic_reward(board):
+    """TicTacToeEnv.calculate_strategic_reward before the reward table, for a 3x3 board"""
+    def evaluate_line(line, player, opponent):
+        p = line.count(player)
+        o = line.count(opponent)
+        e = line.count(0)
+
+        if p == 3:
+            return 100
+        if o == 3:
+            return -100
+        if o == 0 and p == 2 and e == 1:
+            return 10
+        if o == 0 and p == 1 and e == 2:
+            return 2
+        if p == 0 and o == 2 and e == 1:
+            return 15
+        if p == 0 and o == 1 and e == 2:
+            return 3
+        return 0
+
+    player = 2
+    opponent = 1
+    reward = 0
+
+    for i in range(3):
+        line = list(board[i])
+        reward += evaluate_line(line, player, opponent)
+        col = list([board[0][i], board[1][i], board[2][i]])
+        reward += evaluate_line(col, player, opponent)
+
+    diag1 = list([board[0][0], board[1][1], board[2][2]])
+    diag2 = list([board[0][2], board[1][1], board[2][0]])
+    reward += evaluate_line(diag1, player, opponent)
+    reward += evaluate_line(diag2, player, opponent)
+
+    if board[1][1] == player:
+        reward += 2
+    elif board[1][1] == opponent:
+        reward -= 1
+
+    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
+    for r, c in corners:
+        if board[r][c] == player:
+            reward += 1
+
+    return reward
+
+
+def reachable_boards():
+    """(board, valid_moves) for every non-final reachable position"""
+    from solver import decode, reachable_codes, winner
+
+    positions = []
+    for code in reachable_codes():
+        cells = decode(code)
+        if winner(cells) or 0 not in cells:
+            continue
+        board = [cells[0:3], cells[3:6], cells[6:9]]
+        positions.append((board, [divmod(i, 3) for i in range(9) if cells[i] == 0]))
+    return positions
+
+
+@benchmark
+def bench_agent():
+    """predict calls/sec over all reachable positions: DRLAgent (legacy, cold, warm, precomputed) and NumpyPolicyAgent"""
+    from ai import DRLAgent
+    from numpy_policy import NumpyPolicyAgent
+
+    positions = reachable_boards()
+    agent = DRLAgent()
+    results = {}
+
+    def run(predict):
+        for board, valid_moves in positions:
+            predict(board, valid_moves)
+
+    results['legacy'] = len(positions) / timed(lambda: run(
+        lambda board, valid_moves: legacy_predict(agent.model, board, valid_moves)), repeat=1)
+
+    def cold():
+        agent._cache.clear()
+        run(agent.predict)
+
+    results['cold'] = len(positions) / timed(cold, repeat=1)
+    results['warm'] = len(positions) / timed(lambda: run(agent.predict))
+    start = time.perf_counter()
+    precomputed = DRLAgent(precompute=True)
+    load_seconds = time.perf_counter() - start
+    results['precomputed'] = len(positions) / timed(lambda: run(precomputed.predict))
+    results['numpy'] = len(positions) / timed(lambda: run(NumpyPolicyAgent().predict))
+    for name in ('legacy', 'cold', 'warm', 'precomputed', 'numpy'):
+        print(f"  {name:<12} {results[name]:>12,.0f} predictions/s")
+    print(f"  load with precompute: {load_seconds:.2f}s"
+          f"  (cache hits {agent.cache_hits}, misses {agent.cache_misses})")
+    return results
+
+
+@benchmark
+def bench_mcts(budgets=(25, 100, 400, 1600), time_budgets=(0.01, 0.05, 0.2), n_games=10):
+    """MCTSAgent: playouts/sec by board size, strength vs budget (3x3 vs solver, 7x7 vs random)"""
+    from mcts import MCTSAgent, PolicyPriors, RandomAgent, play_game
+    from numpy_policy import NumpyPolicyAgent
+    from solver import SolverAgent
+
+    results = {}
+    empty = lambda size: ([[0] * size for _ in range(size)],
+                          [(r, c) for r in range(size) for c in range(size)])
+    setups = {
+        '3x3': (3, 3, None),
+        '3x3 priors': (3, 3, PolicyPriors(NumpyPolicyAgent())),
+        '3x3 priors+value': (3, 3, PolicyPriors(NumpyPolicyAgent(), use_value=True)),
+        '7x7 k=4': (7, 4, None),
+        '15x15 k=5': (15, 5, None),
+    }
+    for name, (size, win_length, evaluator) in setups.items():
+        agent = MCTSAgent(playouts=None, time_budget=1.0, win_length=win_length, evaluator=evaluator)
+        agent.predict(*empty(size))
+        rate = agent.last_playouts / agent.last_seconds
+        results[f'{name} playouts/s'] = rate
+        print(f"  {name:<17} {rate:>9,.0f} playouts/s (first move, {len(agent):,} nodes)")
+
+    # Force selon le budget : parties nulles ou gagnées contre le solveur, X puis O
+    solver = SolverAgent()
+    variants = (('', None), (' priors', PolicyPriors(NumpyPolicyAgent())),
+                (' priors+value', PolicyPriors(NumpyPolicyAgent(), use_value=True)))
+    for evaluator_name, evaluator in variants:
+        for budget in budgets:
+            outcomes = []
+            reused = []
+            for seed in range(n_games):
+                agent = MCTSAgent(playouts=budget, evaluator=evaluator, seed=seed)
+                x_agent, o_agent = (agent, solver) if seed % 2 == 0 else (solver, agent)
+                winner = play_game(x_agent, o_agent)
+                outcomes.append(winner in (0, 1 if seed % 2 == 0 else 2))
+                reused.append(agent.reused_visits)
+            results[f'3x3{evaluator_name} {budget} vs solver'] = sum(outcomes) / n_games
+            print(f"  3x3{evaluator_name:<13} {budget:>5} playouts  vs solver: {sum(outcomes)}/{n_games} not lost"
+                  f"  (visits reused on last move {sum(reused) / n_games:.0f})")
+
+    for seconds in time_budgets:
+        wins = 0
+        playouts = []
+        for seed in range(n_games):
+            agent = MCTSAgent(playouts=None, time_budget=seconds, win_length=4, seed=seed)
+            opponent = RandomAgent(seed)
+            side = 1 if seed % 2 == 0 else 2
+            winner = play_game(agent, opponent, 7, 4) if side == 1 else play_game(opponent, agent, 7, 4)
+            wins += winner == side
+            playouts.append(agent.last_playouts)
+        results[f'7x7 {seconds}s vs random'] = wins / n_games
+        print(f"  7x7 k=4 {seconds * 1000:>5.0f} ms/move  vs random: {wins}/{n_games} won"
+              f"  ({sum(playouts) / n_games:,.0f} playouts on last move)")
+    return results
+
+
+@benchmark
+def bench_pretrain(checkpoints=(0, 8192, 32768), n_envs=8):
+    """PPO with and without solver pretraining: O's results vs random X and optimal-move rate"""
+    from ai import build_model
+    from numpy_policy import NumpyPolicyAgent, policy_weights
+    from pretrain import win_rate_vs_random
+    from solver import oracle_report
+    from vec_env import TicTacToeVecEnv
+
+    results = {}
+    for pretrain in (None, "solver"):
+        name = pretrain or "scratch"
+        start = time.perf_counter()
+        model = build_model(TicTacToeVecEnv(n_envs), n_envs, pretrain, verbose=0)
+        results[name] = {'pretrain_s': time.perf_counter() - start}
+        trained = 0
+        for steps in checkpoints:
+            if steps > trained:
+                model.learn(steps - trained, reset_num_timesteps=False)
+                trained = steps
+            agent = NumpyPolicyAgent(policy_weights(model.policy))
+            rates = win_rate_vs_random(agent)
+            optimal = oracle_report(agent, player=2)['accuracy']
+            results[name][steps] = dict(rates, optimal=optimal)
+            print(f"  {name:<8} {steps:>6} steps  win {rates['win']:.2f}  draw {rates['draw']:.2f}"
+                  f"  loss {rates['loss']:.2f}  optimal moves {optimal:.2f}")
+    print(f"  pretraining took {results['solver']['pretrain_s'] - results['scratch']['pretrain_s']:.1f}s")
+    return results
+
+
+@benchmark
+def bench_league(total_timesteps=100000, n_envs=16):
+    """PPO on TicTacToeVecEnv vs the self-play league at equal env steps: results as O and CPU time"""
+    from ai import build_model
+    from league import LeagueCallback, LeagueVecEnv, OpponentPool, SolverOpponent, play_match
+    from numpy_policy import NumpyPolicyAgent, policy_weights
+    from pretrain import win_rate_vs_random
+    from solver import oracle_report
+    from vec_env import TicTacToeVecEnv
+
+    solver = SolverOpponent()
+    results = {}
+    for name in ("vec_env", "league"):
+        callback = None
+        if name == "league":
+            pool = OpponentPool()
+            env = LeagueVecEnv(n_envs, pool)
+            callback = LeagueCallback(pool, snapshot_interval=total_timesteps // 5, verbose=0)
+        else:
+            env = TicTacToeVecEnv(n_envs)
+        model = build_model(env, n_envs, verbose=0)
+        start = time.process_time()
+        model.learn(total_timesteps, callback=callback)
+        cpu_s = time.process_time() - start
+        agent = NumpyPolicyAgent(policy_weights(model.policy))
+        random_rates = win_rate_vs_random(agent)
+        solver_rates = play_match(agent, solver, 1, player=2)
+        optimal = oracle_report(agent, player=2)['accuracy']
+        results[name] = {'cpu_s': cpu_s, 'vs_random': random_rates, 'vs_solver': solver_rates,
+                         'optimal': optimal}
+        print(f"  {name:<8} {cpu_s:>6.1f}s CPU  vs random: win {random_rates['win']:.2f}"
+              f"  loss {random_rates['loss']:.2f}  vs solver: loss {solver_rates['loss']:.0f}"
+              f"  optimal moves {optimal:.2f}")
+    return results
+
+
+@benchmark
+def bench_masking(total_timesteps=50000, n_envs=16):
+    """PPO with MlpPolicy vs MaskedMlpPolicy: rollout samples lost to illegal moves, results as O"""
+    from stable_baselines3.common.callbacks import BaseCallback
+    from ai import build_model
+    from league import LeagueCallback, LeagueVecEnv, OpponentPool
+    from numpy_policy import NumpyPolicyAgent, policy_weights
+    from pretrain import win_rate_vs_random
+    from solver import oracle_report
+    from vec_env import TicTacToeVecEnv
+
+    class CountIllegal(BaseCallback):
+        illegal = 0
+
+        def _on_step(self):
+            self.illegal += sum("invalid_move" in info for info in self.locals["infos"])
+            return True
+
+    results = {}
+    for env_name in ("vec_env", "league"):
+        for masked in (False, True):
+            name = f"{env_name}/{'masked' if masked else 'unmasked'}"
+            callbacks = [CountIllegal()]
+            if env_name == "league":
+                pool = OpponentPool()
+                env = LeagueVecEnv(n_envs, pool)
+                callbacks.append(LeagueCallback(pool, total_timesteps // 5, verbose=0))
+            else:
+                env = TicTacToeVecEnv(n_envs)
+            model = build_model(env, n_envs, verbose=0, masked=masked)
+            model.learn(total_timesteps, callback=callbacks)
+            agent = NumpyPolicyAgent(policy_weights(model.policy))
+            rates = win_rate_vs_random(agent)
+            optimal = oracle_report(agent, player=2)['accuracy']
+            illegal = callbacks[0].illegal / model.num_timesteps
+            results[name] = dict(rates, illegal=illegal, optimal=optimal)
+            print(f"  {name:<17} illegal moves {100 * illegal:>5.1f}% of samples  vs random:"
+                  f" win {rates['win']:.2f}  loss {rates['loss']:.2f}  optimal moves {optimal:.2f}")
+    return results
+
+
+@benchmark
+def bench_startup():
+    """Fresh-process time and peak RSS to load an agent and play one move"""
+    import subprocess
+
+    snippets = {
+        'DRLAgent': "from ai import DRLAgent; agent = DRLAgent()",
+        'NumpyPolicyAgent': "from numpy_policy import NumpyPolicyAgent; agent = NumpyPolicyAgent()",
+    }
+    results = {}
+    for name, snippet in snippets.items():
+        code = (f"import resource, time; start = time.perf_counter(); {snippet}; "
+                "agent.predict([[1, 0, 0], [0, 0, 0], [0, 0, 0]], [(1, 1), (2, 2)]); "
+                "print(time.perf_counter() - start, "
+                "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)")
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", code],
+                             capture_output=True, text=True, check=True).stdout.split()
+        seconds, rss_mb = float(out[-2]), float(out[-1])
+        results[name] = {'seconds': seconds, 'rss_mb': rss_mb}
+        print(f"  {name:<18} {seconds:>6.2f}s  {rss_mb:>7.1f} MB")
+    return results
+
+
+async def _loopback_connect(port):
+    import asyncio
+    from protocol import client_handshake
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    await client_handshake(reader, writer)
+    return reader, writer
+
+
+async def _loopback_games(server, n_games, moves_per_game):
+    """Pair 2 * n_games clients on server, play moves_per_game moves in every game; returns the seconds spent playing"""
+    import asyncio
+    from protocol import BinaryCodec, frame, read_frame
+
+    async def joined(client):
+        message = BinaryCodec.decode(await read_frame(client[0]))
+        return client + (message['player'], message['game_id'])
+
+    async def play(first, second):
+        # Les deux joueurs d'une partie jouent à tour de rôle sur une colonne différente
+        for i in range(moves_per_game):
+            reader, writer, _, game_id = (first, second)[i % 2]
+            move = {'type': 'move', 'game_id': game_id, 'row': i // 2, 'col': i % 2}
+            writer.write(frame(BinaryCodec.encode(move)))
+            await writer.drain()
+            await read_frame(reader)
+            await read_frame((second, first)[i % 2][0])
+
+    active = await asyncio.gather(*(_loopback_connect(server.port) for _ in range(2 * n_games)))
+    active = await asyncio.gather(*(joined(client) for client in active))
+    games = {}
+    for client in active:
+        games.setdefault(client[3], []).append(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(play(*sorted(pair, key=lambda c: c[2])) for pair in games.values()))
+    seconds = time.perf_counter() - start
+    for client in active:
+        client[1].close()
+    return seconds
+
+
+@benchmark
+def bench_server(n_idle=6000, n_active_games=500, moves_per_game=5):
+    """asyncio server: connection setup for idle players, then moves/sec over loopback"""
+    import asyncio
+    import resource
+    from server import TicTacToeServer, raise_fd_limit
+
+    raise_fd_limit()
+
+    async def main():
+        server = TicTacToeServer(host='127.0.0.1', port=0, verbose=False)
+        await server.listen()
+        start = time.perf_counter()
+        idle = await asyncio.gather(*(_loopback_connect(server.port) for _ in range(n_idle)))
+        connect_seconds = time.perf_counter() - start
+        move_seconds = await _loopback_games(server, n_active_games, moves_per_game)
+        for client in idle:
+            client[1].close()
+        while server.connections:
+            await asyncio.sleep(0.01)
+        await server.close()
+        return connect_seconds, move_seconds
+
+    connect_seconds, move_seconds = asyncio.run(main())
+    results = {
+        'connections_per_s': n_idle / connect_seconds,
+        'moves_per_s': n_active_games * moves_per_game / move_seconds,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print(f"  {n_idle} idle connections  {results['connections_per_s']:>10,.0f} conn/s")
+    print(f"  {n_active_games} active games     {results['moves_per_s']:>10,.0f} moves/s")
+    print(f"  peak RSS (server + clients) {results['peak_rss_mb']:.0f} MB")
+    return results
+
+
+@benchmark
+def bench_ai_games(n_games=2000):
+    """Server AI seats: moves/s and inference batching, one forward pass per turn vs micro-batches"""
+    import asyncio
+    from inference import BatchInferenceQueue
+    from protocol import VS_AI, BinaryCodec, client_handshake, frame, read_frame
+    from server import TicTacToeServer, raise_fd_limit
+
+    raise_fd_limit()
+
+    async def play(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        await client_handshake(reader, writer, mode=VS_AI)
+        game_id = BinaryCodec.decode(await read_frame(reader))['game_id']
+        board, moves, game_over = [0] * 9, 0, False
+        while not game_over:
+            cell = board.index(0)
+            writer.write(frame(BinaryCodec.encode(
+                {'type': 'move', 'game_id': game_id, 'row': cell // 3, 'col': cell % 3})))
+            # Notre delta, puis celui de l'IA si la partie continue
+            for _ in range(2):
+                delta = BinaryCodec.decode(await read_frame(reader))
+                board[delta['row'] * 3 + delta['col']] = delta['player']
+                game_over = delta['game_over']
+                if game_over:
+                    break
+            moves += 1
+        writer.close()
+        return moves
+
+    async def main(queue):
+        server = TicTacToeServer(host='127.0.0.1', port=0, verbose=False)
+        server._inference = queue
+        await server.listen()
+        start = time.perf_counter()
+        moves = sum(await asyncio.gather(*(play(server.port) for _ in range(n_games))))
+        seconds = time.perf_counter() - start
+        while server.connections:
+            await asyncio.sleep(0.01)
+        await server.close()
+        return moves / seconds
+
+    agents = {'numpy': None}
+    if os.path.exists("tictactoe_ppo.zip"):
+        from ai import DRLAgent
+        agents['torch'] = DRLAgent("tictactoe_ppo")
+
+    results = {}
+    for (agent_name, agent), (mode, max_batch, max_delay) in itertools.product(
+            agents.items(), (('unbatched', 1, 0.0), ('batched', 256, 0.002))):
+        name = f'{agent_name} {mode}'
+        queue = BatchInferenceQueue(agent, max_batch=max_batch, max_delay=max_delay)
+        moves_per_s = asyncio.run(main(queue))
+        results[name] = dict(queue.stats(), human_moves_per_s=moves_per_s)
+        stats = results[name]
+        print(f"  {name:<16} {moves_per_s:>8,.0f} moves/s  {stats['batches']:>6} batches"
+              f"  mean batch {stats['mean_batch']:>6.1f}"
+              f"  latency p50 {stats['latency_p50_ms']:.2f} ms  p99 {stats['latency_p99_ms']:.2f} ms")
+    return results
+
+
+# Partie fixe : X gagne sur la première colonne au 5e coup
+CLUSTER_MOVES = [(0, 0), (0, 1), (1, 0), (1, 1), (2, 0)]
+
+
+def _cluster_load(port, n_clients):
+    """Client process for bench_cluster: connect, then each client plays its own side"""
+    import asyncio
+    from protocol import BinaryCodec, client_handshake, frame, read_frame
+    from server import raise_fd_limit
+
+    raise_fd_limit()
+
+    async def connect():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        await client_handshake(reader, writer)
+        return reader, writer
+
+    async def play(reader, writer):
+        # L'adversaire peut être servi par un autre processus client : chacun joue à son tour
+        joined = BinaryCodec.decode(await read_frame(reader))
+        for i, (row, col) in enumerate(CLUSTER_MOVES):
+            if i % 2 + 1 == joined['player']:
+                move = {'type': 'move', 'game_id': joined['game_id'], 'row': row, 'col': col}
+                writer.write(frame(BinaryCodec.encode(move)))
+            await read_frame(reader)
+
+    async def main():
+        start = time.time()
+        clients = await asyncio.gather(*(connect() for _ in range(n_clients)))
+        connected = time.time()
+        await asyncio.gather(*(play(*client) for client in clients))
+        for _, writer in clients:
+            writer.close()
+        return start, connected, time.time()
+
+    return asyncio.run(main())
+
+
+@benchmark
+def bench_cluster(n_clients=4000, worker_counts=None):
+    """SO_REUSEPORT cluster: connections/s and moves/s against the number of workers"""
+    import multiprocessing as mp
+    import threading
+    from cluster import ServerCluster
+
+    cpus = os.cpu_count() or 1
+    worker_counts = worker_counts or sorted({1, 2, max(cpus // 2, 1)})
+    n_loaders = max(cpus // 2, 2)
+    results = {}
+    if cpus < 2:
+        print("  (une seule CPU : les workers se partagent le même cœur, pas de gain attendu)")
+    for workers in worker_counts:
+        cluster = ServerCluster(host='127.0.0.1', port=0, workers=workers, verbose=False).start()
+        coordinator = threading.Thread(target=cluster.run)
+        coordinator.start()
+        while cluster.ready < workers:  # Laisser les workers se mettre à l'écoute
+            time.sleep(0.01)
+        try:
+            with mp.Pool(n_loaders) as pool:
+                spans = pool.starmap(_cluster_load, [(cluster.port, n_clients // n_loaders)] * n_loaders)
+        finally:
+            cluster.stop()
+            coordinator.join()
+            cluster.close()
+        start = min(span[0] for span in spans)
+        connected = max(span[1] for span in spans)
+        end = max(span[2] for span in spans)
+        total = n_clients // n_loaders * n_loaders
+        results[workers] = {
+            'connections_per_s': total / (connected - start),
+            'moves_per_s': total // 2 * len(CLUSTER_MOVES) / (end - connected),
+            'handoffs': cluster.handoffs,
+        }
+        print(f"  {workers} workers  {results[workers]['connections_per_s']:>10,.0f} conn/s"
+              f"  {results[workers]['moves_per_s']:>10,.0f} moves/s"
+              f"  ({cluster.handoffs} sockets transférés)")
+    return results
+
+
+@benchmark
+def bench_metrics(n=200000):
+    """Metrics overhead: instrumentation added per handled message, and render() cost"""
+    from metrics import MetricsRegistry
+
+    metrics = MetricsRegistry()
+    messages = metrics.counter('messages_total', "", ('type',))
+    seconds = metrics.histogram('message_seconds', "").labels()
+    for kind in ('move', 'get_state', 'get_hint', 'queue'):
+        messages.labels(kind).inc()
+
+    def instrumented():
+        # Ce que serve() ajoute autour de handle_message
+        perf_counter = time.perf_counter
+        for _ in range(n):
+            start = perf_counter()
+            seconds.observe(perf_counter() - start)
+            messages.labels('move').inc()
+
+    per_message = timed(instrumented) / n
+    render = timed(metrics.render)
+    print(f"  instrumentation per message {per_message * 1e9:>8.0f} ns")
+    print(f"  render ({len(metrics.render())} bytes)  {render * 1e6:>10.1f} us")
+    return {'per_message_ns': per_message * 1e9, 'render_us': render * 1e6}
+
+
+@benchmark
+def bench_gamelog(n_games=2000000):
+    """Game log: log_game() cost on the request path, then memmap scan speed for the stats"""
+    import tempfile
+    from gamelog import GameLogReader, GameLogWriter
+
+    rng = random.Random(0)
+    games = []
+    for _ in range(1000):
+        cells = rng.sample(range(9), rng.randint(5, 9))
+        games.append((cells, rng.randint(0, 2)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = GameLogWriter(directory, segment_records=1 << 19)
+        start = time.perf_counter()
+        for i in range(n_games):
+            cells, result = games[i % 1000]
+            writer.log_game(cells, result, 1.7e9, 1.7e9 + 30)
+        log_seconds = time.perf_counter() - start
+        writer.close()
+        total_seconds = time.perf_counter() - start
+
+        reader = GameLogReader(directory)
+        scan_seconds = timed(lambda: (reader.opening_frequency(), reader.win_rate_by_first_move()))
+        results = {
+            'log_game_us': log_seconds / n_games * 1e6,
+            'written_per_s': n_games / total_seconds,
+            'scanned_per_s': len(reader) / scan_seconds,
+            'bytes_per_game': os.path.getsize(os.path.join(directory, 'games-000000.log')) / (1 << 19),
+        }
+    print(f"  log_game()  {results['log_game_us']:>6.2f} us/game"
+          f"  (écriture de {n_games:,} parties : {results['written_per_s']:,.0f}/s)")
+    print(f"  stats (ouvertures + taux de victoire)  {results['scanned_per_s']:,.0f} parties/s")
+    return results
+
+
+def legacy_state_json(game):
+    """Full-board JSON broadcast as sent by the server before the binary protocol"""
+    import json
+
+    state = game.get_state()
+    return json.dumps({
+        'board': state['board'],
+        'current_player': state['current_player'],
+        'game_over': state['game_over'],
+        'winner': state['winner'],
+        'winning_line': state['winning_line']
+    }).encode()
+
+
+@benchmark
+def bench_protocol(n=20000):
+    """Bytes/message and encode/decode time: legacy JSON state vs framed JSON/binary state and delta"""
+    import json
+    from protocol import (BinaryCodec, JsonCodec, delta_message, frame, state_message)
+
+    game = TicTacToe()
+    for row, col in [(0, 0), (1, 1), (0, 1)]:
+        game.make_move(row, col)
+    cases = {
+        'legacy json state': (lambda: legacy_state_json(game), json.loads),
+    }
+    for codec_name, codec in (('json', JsonCodec), ('binary', BinaryCodec)):
+        for kind, build in (('state', lambda: state_message(1, game)),
+                            ('delta', lambda: delta_message(1, game, 0, 1, 1))):
+            cases[f'{codec_name} {kind}'] = (
+                lambda codec=codec, build=build: frame(codec.encode(build())),
+                lambda data, codec=codec: codec.decode(data[2:]))
+
+    results = {}
+    for name, (encode, decode) in cases.items():
+        data = encode()
+        encode_s = timed(lambda: [encode() for _ in range(n)]) / n
+        decode_s = timed(lambda: [decode(data) for _ in range(n)]) / n
+        results[name] = {'bytes': len(data), 'encode_us': encode_s * 1e6, 'decode_us': decode_s * 1e6}
+        print(f"  {name:<18} {len(data):>4} bytes  encode {encode_s * 1e6:>6.2f} us"
+              f"  decode {decode_s * 1e6:>6.2f} us")
+    return results
+
+
+# === SUITE DE RÉGRESSION ===
+# name -> (function(scale) returning ops/s, unit); bigger is better for every case
+SUITE = {}
+BASELINE_PATH = "benchmark_baseline.json"
+
+
+def suite_case(name, unit):
+    def register(func):
+        SUITE[name] = (func, unit)
+        return func
+    return register
+
+
+@suite_case('engine.make_move', 'moves/s')
+def case_make_move(scale):
+    n_games = max(int(2000 * scale), 1)
+    moves = play_random_games(TicTacToe, n_games)
+    return moves / timed(lambda: play_random_games(TicTacToe, n_games))
+
+
+@suite_case('engine.check_winner', 'calls/s')
+def case_check_winner(scale):
+    game = TicTacToe()
+    for row, col in [(0, 0), (1, 1), (0, 1), (2, 2)]:
+        game.make_move(row, col)
+    n = max(int(100000 * scale), 1)
+    return n / timed(lambda: [game.check_winner(0, 1) for _ in range(n)])
+
+
+@suite_case('env.step', 'steps/s')
+def case_env_step(scale):
+    from tictactoe_env import TicTacToeEnv
+
+    env = TicTacToeEnv()
+    rng = random.Random(0)
+    n = max(int(10000 * scale), 1)
+
+    def run():
+        env.reset()
+        for _ in range(n):
+            _, _, terminated, _, _ = env.step(rng.choice(env.game.free_cells))
+            if terminated:
+                env.reset()
+
+    return n / timed(run)
+
+
+@suite_case('env.reset', 'resets/s')
+def case_env_reset(scale):
+    from tictactoe_env import TicTacToeEnv
+
+    env = TicTacToeEnv()
+    n = max(int(20000 * scale), 1)
+    return n / timed(lambda: [env.reset() for _ in range(n)])
+
+
+_suite_agent = None
+
+
+def suite_agent():
+    """DRLAgent and the positions it predicts, loaded once for both agent cases"""
+    global _suite_agent
+    if _suite_agent is None:
+        from ai import DRLAgent
+        _suite_agent = DRLAgent(), reachable_boards()
+    return _suite_agent
+
+
+@suite_case('agent.predict_cold', 'predictions/s')
+def case_predict_cold(scale):
+    agent, positions = suite_agent()
+    positions = positions[:max(int(500 * scale), 1)]
+
+    def run():
+        agent._cache.clear()
+        for board, valid_moves in positions:
+            agent.predict(board, valid_moves)
+
+    return len(positions) / timed(run)
+
+
+@suite_case('agent.predict_warm', 'predictions/s')
+def case_predict_warm(scale):
+    agent, positions = suite_agent()
+    positions = positions[:max(int(500 * scale), 1)]
+    for board, valid_moves in positions:
+        agent.predict(board, valid_moves)
+    # Cache chaud : quelques µs par appel, 20 passes pour une mesure stable
+    repeats = 20
+    return repeats * len(positions) / timed(
+        lambda: [agent.predict(board, valid_moves) for _ in range(repeats) for board, valid_moves in positions])
+
+
+class NullWriter:
+    """Transport stand-in that drops the bytes, to time encoding without sockets"""
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+@suite_case('server.broadcast_state', 'broadcasts/s')
+def case_broadcast_state(scale):
+    from protocol import BinaryCodec, JsonCodec
+    from server import Player, TicTacToeServer
+
+    server = TicTacToeServer(verbose=False)
+    # Un joueur par codec : chaque broadcast encode l'état deux fois
+    session = server.registry.create_game(Player(NullWriter(), BinaryCodec, 'x'),
+                                          Player(NullWriter(), JsonCodec, 'o'))
+    for row, col in [(0, 0), (1, 1), (0, 1)]:
+        session.game.make_move(row, col)
+    n = max(int(20000 * scale), 1)
+    return n / timed(lambda: [server.broadcast_game_state(session) for _ in range(n)])
+
+
+@suite_case('server.loopback_moves', 'moves/s')
+def case_loopback_moves(scale, moves_per_game=5):
+    import asyncio
+    from server import TicTacToeServer
+
+    n_games = max(int(100 * scale), 1)
+
+    async def main():
+        server = TicTacToeServer(host='127.0.0.1', port=0, verbose=False)
+        await server.listen()
+        best = float('inf')
+        for _ in range(3):
+            best = min(best, await _loopback_games(server, n_games, moves_per_game))
+        while server.connections:
+            await asyncio.sleep(0.01)
+        await server.close()
+        return best
+
+    return n_games * moves_per_game / asyncio.run(main())
+
+
+def run_suite(scale=1.0, names=None):
+    """{case name: {'value': ops/s, 'unit': unit}} for the named cases (default all)"""
+    results = {}
+    for name in names or SUITE:
+        func, unit = SUITE[name]
+        value = func(scale)
+        results[name] = {'value': value, 'unit': unit}
+        print(f"  {name:<24} {value:>14,.0f} {unit}")
+    return results
+
+
+def save_results(results, path=BASELINE_PATH):
+    data = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """(name, baseline value, current value, current / baseline, status) for every case.
+
+    status is 'REGRESSION' below (1 - threshold) x baseline, 'faster' above
+    (1 + threshold) x baseline, 'ok' in between, 'new' or 'missing' when
+    the case is only in one of the two runs.
+    """
+    rows = []
+    for name in list(baseline) + [name for name in current if name not in baseline]:
+        old = baseline.get(name, {}).get('value')
+        new = current.get(name, {}).get('value')
+        if old is None or new is None:
+            rows.append((name, old, new, None, 'new' if old is None else 'missing'))
+            continue
+        ratio = new / old if old else float('inf')
+        status = 'REGRESSION' if ratio < 1 - threshold else 'faster' if ratio > 1 + threshold else 'ok'
+        rows.append((name, old, new, ratio, status))
+    return rows
+
+
+def print_comparison(rows):
+    for name, old, new, ratio, status in rows:
+        old_text = f"{old:>14,.0f}" if old is not None else f"{'-':>14}"
+        new_text = f"{new:>14,.0f}" if new is not None else f"{'-':>14}"
+        ratio_text = f"{(ratio - 1) * 100:>+7.1f}%" if ratio is not None else f"{'':>8}"
+        print(f"  {name:<24} {old_text} -> {new_text} {ratio_text}  {status}")
+
+
+def suite_command(argv):
+    parser = argparse.ArgumentParser(prog="benchmark.py suite", description="Run the regression suite")
+    parser.add_argument('cases', nargs='*', metavar='case', help=', '.join(SUITE))
+    parser.add_argument('--save', metavar='PATH', help="write the results as a JSON baseline")
+    parser.add_argument('--scale', type=float, default=1.0, help="workload multiplier")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    results = run_suite(args.scale, args.cases)
+    if args.save:
+        print(f"Résultats enregistrés dans {save_results(results, args.save)}")
+    return 0
+
+
+def compare_command(argv):
+    parser = argparse.ArgumentParser(prog="benchmark.py compare",
+                                     description="Compare the suite against a JSON baseline")
+    parser.add_argument('baseline')
+    parser.add_argument('current', nargs='?', help="results file (default: run the suite now)")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    parser.add_argument('--scale', type=float, default=1.0)
+    args = parser.parse_args(argv)
+    baseline = load_results(args.baseline)
+    if args.current:
+        current = load_results(args.current)
+    else:
+        current = run_suite(args.scale, [name for name in baseline if name in SUITE])
+    rows = compare_results(baseline, current, args.threshold)
+    print_comparison(rows)
+    regressions = [row[0] for row in rows if row[4] == 'REGRESSION']
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0%} : {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+COMMANDS = {'suite': suite_command, 'compare': compare_command}
+
+
+def main(argv):
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name!r}, choose from: {', '.join(BENCHMARKS)}")
+            return 1
+        print(f"[{name}] {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,6 +1,16 @@
+import argparse
 import pygame
 import sys
+import threading
+import time
 from pygame.locals import *
+from engine import make_game
+from netclient import NetworkClient, OnlineGame
+from protocol import PVP, VS_AI
+from render import EXPOSE_EVENTS, GUI_EVENTS, FrameCounter, allow_events
+
+# Posté par le thread réseau pour réveiller la boucle de rendu
+NETWORK_EVENT = pygame.USEREVENT + 1
 
 class GameMenu:
     def __init__(self):
@@ -8,7 +18,6 @@ class GameMenu:
         self.width, self.height = 600, 400
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Tic Tac Toe - Menu")
-        self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont('Arial', 32)
         self.selected_mode = None
         
@@ -25,28 +34,35 @@ class GameMenu:
             "hover": (100, 150, 255)
         }
         
+        # Textes rendus une fois (normal et survolé) ; on ne redessine que si le survol change
+        self.title = self.font.render("Choisissez un mode de jeu", True, self.colors["text"])
+        for i, option in enumerate(self.options):
+            option["images"] = [self.font.render(option["text"], True, self.colors[state])
+                                for state in ("text", "hover")]
+            option["rect"] = option["images"][0].get_rect(center=(self.width//2, 150 + i*70))
+        self.hovered = None
+        
+    def hovered_option(self, pos):
+        return next((i for i, option in enumerate(self.options) if option["rect"].collidepoint(pos)), None)
+    
     def draw_menu(self):
         self.screen.fill(self.colors["background"])
-        title = self.font.render("Choisissez un mode de jeu", True, self.colors["text"])
-        self.screen.blit(title, (self.width//2 - title.get_width()//2, 50))
+        self.screen.blit(self.title, (self.width//2 - self.title.get_width()//2, 50))
         
         for i, option in enumerate(self.options):
-            text_color = self.colors["hover"] if option["rect"] and option["rect"].collidepoint(pygame.mouse.get_pos()) else self.colors["text"]
-            text = self.font.render(option["text"], True, text_color)
-            
-            text_rect = text.get_rect(center=(self.width//2, 150 + i*70))
-            self.options[i]["rect"] = text_rect
-            
-            self.screen.blit(text, text_rect)
+            self.screen.blit(option["images"][i == self.hovered], option["rect"])
             
         pygame.display.flip()
     
     def run(self):
+        allow_events(GUI_EVENTS + (MOUSEMOTION,))
+        self.hovered = self.hovered_option(pygame.mouse.get_pos())
+        self.draw_menu()
         running = True
         while running:
-            mouse_pos = pygame.mouse.get_pos()
-            
-            for event in pygame.event.get():
+            events = [pygame.event.wait()] + pygame.event.get()
+            redraw = False
+            for event in events:
                 if event.type == QUIT:
                     running = False
                     pygame.quit()
@@ -60,31 +76,36 @@ class GameMenu:
                 
                 if event.type == MOUSEBUTTONDOWN and event.button == 1:
                     for option in self.options:
-                        if option["rect"] and option["rect"].collidepoint(mouse_pos):
+                        if option["rect"].collidepoint(event.pos):
                             self.selected_mode = option["mode"]
                             running = False
+                
+                if event.type == MOUSEMOTION:
+                    hovered = self.hovered_option(event.pos)
+                    redraw |= hovered != self.hovered
+                    self.hovered = hovered
+                
+                redraw |= event.type in EXPOSE_EVENTS
             
-            self.draw_menu()
-            self.clock.tick(60)
+            if redraw and running:
+                self.draw_menu()
         
         pygame.quit()
         return self.selected_mode
 
 class TicTacToeGUI:
-    def __init__(self, is_ai_game=False):
+    SYMBOLS = {1: 'X', 2: 'O'}
+    EVENTS = GUI_EVENTS
+
+    def __init__(self, is_ai_game=False, size=3, win_length=None):
         pygame.init()
         self.width, self.height = 600, 600
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Tic Tac Toe")
         
-        self.board = [['' for _ in range(3)] for _ in range(3)]
-        self.current_player = 'X'
-        self.game_over = False
-        self.winner = None
         self.is_ai_game = is_ai_game
-        self.ai_player = 'O' if is_ai_game else None
+        self.ai_player = 2 if is_ai_game else None
         
-        self.font = pygame.font.SysFont('Arial', 120)
         self.small_font = pygame.font.SysFont('Arial', 40)
         
         self.colors = {
@@ -94,121 +115,250 @@ class TicTacToeGUI:
             "O": (0, 0, 255),
             "text": (0, 0, 0)
         }
-    
-    def draw_board(self):
-        self.screen.fill(self.colors["background"])
-        
-        # Dessiner les lignes du plateau
-        pygame.draw.line(self.screen, self.colors["lines"], (self.width//3, 0), (self.width//3, self.height), 4)
-        pygame.draw.line(self.screen, self.colors["lines"], (2*self.width//3, 0), (2*self.width//3, self.height), 4)
-        pygame.draw.line(self.screen, self.colors["lines"], (0, self.height//3), (self.width, self.height//3), 4)
-        pygame.draw.line(self.screen, self.colors["lines"], (0, 2*self.height//3), (self.width, 2*self.height//3), 4)
-        
-        # Dessiner les X et O
-        for row in range(3):
-            for col in range(3):
-                if self.board[row][col] == 'X':
-                    x = col * self.width//3 + self.width//6
-                    y = row * self.height//3 + self.height//6
-                    text = self.font.render('X', True, self.colors["X"])
-                    self.screen.blit(text, (x - text.get_width()//2, y - text.get_height()//2))
-                elif self.board[row][col] == 'O':
-                    x = col * self.width//3 + self.width//6
-                    y = row * self.height//3 + self.height//6
-                    text = self.font.render('O', True, self.colors["O"])
-                    self.screen.blit(text, (x - text.get_width()//2, y - text.get_height()//2))
         
+        # Rendu événementiel : grille et symboles dessinés une fois, seules les
+        # zones modifiées depuis le dernier rendu sont recopiées à l'écran
+        self.status_images = {}
+        self.status_rect = pygame.Rect(0, self.height - 50, self.width, 50)
+        self.frames = FrameCounter()
+        self._drawn_status = None
+        self.setup_board(size, win_length)
+    
+    def setup_board(self, size, win_length=None):
+        """Engine, glyphs and grid for a size x size board"""
+        # Règles et détection de victoire du moteur partagé (N x N, k alignés)
+        self.size = size
+        self.win_length = win_length
+        self.game = make_game(size, win_length)
+        self.font = pygame.font.SysFont('Arial', 360 // size)
+        self.background = self.create_background()
+        self.glyphs = {symbol: self.font.render(symbol, True, self.colors[symbol])
+                       for symbol in self.SYMBOLS.values()}
+        self._drawn = None  # cases telles qu'affichées (None : tout redessiner)
+    
+    def create_background(self):
+        surf = pygame.Surface((self.width, self.height))
+        surf.fill(self.colors["background"])
+        size = self.size
+        for i in range(1, size):
+            pygame.draw.line(surf, self.colors["lines"], (i * self.width // size, 0), (i * self.width // size, self.height), 4)
+            pygame.draw.line(surf, self.colors["lines"], (0, i * self.height // size), (self.width, i * self.height // size), 4)
+        return surf
+    
+    def cell_rect(self, row, col):
+        cell_w, cell_h = self.width // self.size, self.height // self.size
+        return pygame.Rect(col * cell_w, row * cell_h, cell_w, cell_h)
+    
+    def draw_cell(self, row, col):
+        rect = self.cell_rect(row, col)
+        self.screen.blit(self.background, rect, rect)
+        symbol = self.SYMBOLS.get(self.game.board[row][col])
+        if symbol:
+            glyph = self.glyphs[symbol]
+            self.screen.blit(glyph, glyph.get_rect(center=rect.center))
+        return rect
+    
+    def status_text(self):
+        if self.game.game_over:
+            if self.game.winner:
+                return f"Le gagnant est {self.SYMBOLS[self.game.winner]} !"
+            return "Match nul !"
+        return f"Tour du joueur {self.SYMBOLS[self.game.current_player]}"
+    
+    def draw_status(self):
         # Afficher le joueur actuel ou le gagnant
-        status_rect = pygame.Rect(0, self.height - 50, self.width, 50)
-        pygame.draw.rect(self.screen, self.colors["background"], status_rect)
-        
-        if self.game_over:
-            if self.winner:
-                status_text = f"Le gagnant est {self.winner} !"
-            else:
-                status_text = "Match nul !"
-        else:
-            status_text = f"Tour du joueur {self.current_player}"
-        
-        text = self.small_font.render(status_text, True, self.colors["text"])
+        pygame.draw.rect(self.screen, self.colors["background"], self.status_rect)
+        status_text = self.status_text()
+        if status_text not in self.status_images:
+            self.status_images[status_text] = self.small_font.render(status_text, True, self.colors["text"])
+        text = self.status_images[status_text]
         self.screen.blit(text, (self.width//2 - text.get_width()//2, self.height - 45))
-        
-        pygame.display.flip()
+        self._drawn_status = status_text
+        return self.status_rect
     
-    def check_winner(self):
-        # Vérifier les lignes
-        for row in range(3):
-            if self.board[row][0] == self.board[row][1] == self.board[row][2] != '':
-                return self.board[row][0]
-        
-        # Vérifier les colonnes
-        for col in range(3):
-            if self.board[0][col] == self.board[1][col] == self.board[2][col] != '':
-                return self.board[0][col]
-        
-        # Vérifier les diagonales
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] != '':
-            return self.board[0][0]
-        if self.board[0][2] == self.board[1][1] == self.board[2][0] != '':
-            return self.board[0][2]
-        
-        # Vérifier si le plateau est plein (match nul)
-        if all(self.board[row][col] != '' for row in range(3) for col in range(3)):
-            return 'tie'
+    def draw_board(self):
+        """Full repaint, returns the dirty rects (the whole window)"""
+        self.screen.blit(self.background, (0, 0))
+        for row in range(self.size):
+            for col in range(self.size):
+                if self.game.board[row][col]:
+                    self.draw_cell(row, col)
+        self.draw_status()
+        self._drawn = [cell for row in self.game.board for cell in row]
+        return [self.screen.get_rect()]
+    
+    def render(self):
+        """Repaint the cells and the status that changed since the last render, returns the dirty rects"""
+        cells = [cell for row in self.game.board for cell in row]
+        drawn = self._drawn
+        # Partie réinitialisée ou fenêtre découverte : tout redessiner
+        if drawn is None or any(old and not new for old, new in zip(drawn, cells)):
+            return self.draw_board()
         
-        return None
+        dirty = [self.draw_cell(*divmod(i, self.size))
+                 for i, (old, new) in enumerate(zip(drawn, cells)) if old != new]
+        # Le bandeau d'état recouvre la dernière rangée : le redessiner par-dessus
+        if self.status_text() != self._drawn_status or self.status_rect.collidelist(dirty) != -1:
+            dirty.append(self.draw_status())
+        self._drawn = cells
+        return dirty
+    
+    def refresh(self):
+        start = time.perf_counter()
+        dirty = self.render()
+        if dirty:
+            pygame.display.update(dirty)
+            self.frames.record(start)
     
     def make_ai_move(self):
         # IA simple qui joue au hasard
         import random
-        empty_cells = [(row, col) for row in range(3) for col in range(3) if self.board[row][col] == '']
+        empty_cells = self.game.get_valid_moves()
         if empty_cells:
-            row, col = random.choice(empty_cells)
-            self.board[row][col] = self.ai_player
-            self.current_player = 'X'
+            self.game.make_move(*random.choice(empty_cells))
     
     def handle_click(self, pos):
-        if self.game_over or (self.is_ai_game and self.current_player == self.ai_player):
+        if self.game.game_over or (self.is_ai_game and self.game.current_player == self.ai_player):
             return
         
-        col = pos[0] // (self.width // 3)
-        row = pos[1] // (self.height // 3)
+        col = pos[0] // (self.width // self.size)
+        row = pos[1] // (self.height // self.size)
         
-        if 0 <= row < 3 and 0 <= col < 3 and self.board[row][col] == '':
-            self.board[row][col] = self.current_player
-            
-            winner = self.check_winner()
-            if winner:
-                self.game_over = True
-                self.winner = winner if winner != 'tie' else None
-            else:
-                self.current_player = 'O' if self.current_player == 'X' else 'X'
-                
-                if self.is_ai_game and self.current_player == self.ai_player and not self.game_over:
-                    self.make_ai_move()
-                    winner = self.check_winner()
-                    if winner:
-                        self.game_over = True
-                        self.winner = winner if winner != 'tie' else None
+        if self.game.make_move(row, col):
+            if self.is_ai_game and self.game.current_player == self.ai_player and not self.game.game_over:
+                self.make_ai_move()
+    
+    def restart(self):
+        self.game.reset()
+    
+    def handle_event(self, event):
+        """Events other than quit, click, R and expose (see EVENTS)"""
     
     def run(self):
+        allow_events(self.EVENTS)
+        self.loop()
+    
+    def loop(self):
+        """Render loop until the window is closed (call after allow_events)"""
+        # Attente bloquante des événements : aucun rendu (ni CPU) tant que rien ne change
+        self.refresh()
         running = True
         while running:
-            for event in pygame.event.get():
+            for event in self.frames.wait_events():
                 if event.type == QUIT:
                     running = False
                 elif event.type == MOUSEBUTTONDOWN and event.button == 1:
                     self.handle_click(event.pos)
-                elif event.type == KEYDOWN and event.key == K_r and self.game_over:
+                elif event.type == KEYDOWN and event.key == K_r and self.game.game_over:
                     # Réinitialiser le jeu si R est pressé
-                    self.__init__(self.is_ai_game)
+                    self.restart()
+                elif event.type in EXPOSE_EVENTS:
+                    self._drawn = None
+                else:
+                    self.handle_event(event)
             
-            self.draw_board()
-            pygame.time.Clock().tick(60)
+            if running:
+                self.refresh()
         
+        print(f"Rendu : {self.frames.report()}")
         pygame.quit()
 
+class OnlineGUI(TicTacToeGUI):
+    """Game against another player (or the server's AI) through the server.
+
+    A NetworkClient thread owns the socket and queues the server messages;
+    it posts NETWORK_EVENT, at most one waiting at a time, to wake the render
+    loop, which applies the messages to an OnlineGame. A click is drawn at
+    once and sent; the server's answer confirms it or rolls it back, so the
+    screen never waits for the round trip. The board size comes from the
+    server ('joined').
+    """
+    EVENTS = GUI_EVENTS + (NETWORK_EVENT,)
+
+    def __init__(self, host='127.0.0.1', port=5555, mode=PVP):
+        super().__init__()
+        pygame.display.set_caption("Tic Tac Toe - En ligne")
+        self.mode = mode
+        self.online = OnlineGame()
+        self.game = self.online
+        self._woken = threading.Event()
+        self.net = NetworkClient(host, port, mode, on_message=self.wake)
+    
+    def wake(self):
+        """Called by the network thread after each message"""
+        if not self._woken.is_set():
+            self._woken.set()
+            pygame.event.post(pygame.event.Event(NETWORK_EVENT))
+    
+    def handle_event(self, event):
+        if event.type != NETWORK_EVENT:
+            return
+        # Effacer avant de lire la file : un message arrivé entretemps reposte l'événement
+        self._woken.clear()
+        for message in self.net.poll():
+            self.online.handle(message)
+            if message['type'] == 'joined':
+                if (self.online.size, self.online.win_length) != (self.size, self.win_length):
+                    self.setup_board(self.online.size, self.online.win_length)
+                    self.game = self.online
+                self._drawn = None
+    
+    def handle_click(self, pos):
+        col = pos[0] // (self.width // self.size)
+        row = pos[1] // (self.height // self.size)
+        message = self.online.play(row, col)
+        if message is not None:
+            self.net.send(message)
+    
+    def restart(self):
+        if self.online.disconnected:
+            return
+        self.online.leave()
+        self.net.send({'type': 'play_ai' if self.mode == VS_AI else 'queue'})
+    
+    def status_text(self):
+        online = self.online
+        if online.disconnected:
+            return "Connexion perdue"
+        if not online.joined:
+            return "En attente d'un adversaire..."
+        if online.opponent_left:
+            return "Adversaire parti (R : rejouer)"
+        if online.game_over:
+            return super().status_text()
+        if online.current_player == online.player:
+            return f"À vous de jouer ({self.SYMBOLS[online.player]})"
+        return "Tour de l'adversaire"
+    
+    def run(self):
+        # Filtre d'événements avant le thread réseau : allow_events vide la file
+        # et perdrait un NETWORK_EVENT déjà posté (le 'joined' arrive tout de suite)
+        allow_events(self.EVENTS)
+        try:
+            self.net.start()
+        except (OSError, ConnectionError) as e:
+            print(f"Connexion au serveur impossible : {e}")
+            pygame.quit()
+            return
+        try:
+            self.loop()
+        finally:
+            self.net.close()
+            if self.online.ack_seconds:
+                acks = sorted(self.online.ack_seconds)
+                print(f"Coups confirmés par le serveur : {len(acks)}, aller-retour médian "
+                      f"{acks[len(acks) // 2] * 1000:.1f} ms, {self.online.rollbacks} annulation(s)")
+
 if __name__ == "__main__":
+    # python client.py [taille [alignement]], par exemple python client.py 15 5
+    parser = argparse.ArgumentParser(description="Client Tic Tac Toe")
+    parser.add_argument('board_args', nargs='*', type=int, metavar='taille [alignement]',
+                        help="taille du plateau local et nombre de pions à aligner")
+    parser.add_argument('--host', default='127.0.0.1', help="serveur du mode en ligne")
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--ai', action='store_true', help="en ligne, jouer contre l'IA du serveur")
+    args = parser.parse_args()
+    board_args = args.board_args[:2]
     menu = GameMenu()
     mode = menu.run()
     
@@ -218,12 +368,12 @@ if __name__ == "__main__":
     print(f"Mode sélectionné : {mode}")
     
     if mode == "local_pvp":
-        game = TicTacToeGUI(is_ai_game=False)
+        game = TicTacToeGUI(False, *board_args)
         game.run()
     elif mode == "vs_ai":
-        game = TicTacToeGUI(is_ai_game=True)
+        game = TicTacToeGUI(True, *board_args)
         game.run()
     elif mode == "online":
-        print("Mode en ligne - À implémenter")
-        # Ici vous pourriez ajouter le code pour le mode en ligne
+        game = OnlineGUI(args.host, args.port, VS_AI if args.ai else PVP)
+        game.run()
         
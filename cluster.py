@@ -0,0 +1,376 @@
+"""Multi-process server: N workers share one port with SO_REUSEPORT.
+
+The kernel spreads new connections over the workers, each running its own
+asyncio TicTacToeServer. Matchmaking stays global: the coordinator (the
+parent process) holds the single waiting slot and talks to every worker
+over a Unix datagram socket. When the two players to pair sit on different
+workers, the newcomer's socket is passed (SCM_RIGHTS) to the worker of the
+player who waited, so both players of a game are always served by the same
+process and a move never crosses a process boundary.
+
+    worker -> coordinator
+        ready()                           the worker listens on the shared port
+        wait(token)                       a player looks for an opponent
+        cancel(token)                     a waiting player disconnected
+        fd(to, peer, encoding, unread) + socket
+                                          hand-off of a player to worker `to`
+        failed(to, peer)                  hand-off impossible, requeue `peer`
+    coordinator -> worker
+        pair(waiting, newcomer)           both players are local
+        handoff(token, to, peer)          send player `token` to worker `to`
+        adopt(peer, encoding, unread) + socket
+                                          serve this player against `peer`
+
+`unread` (base64) holds the bytes the client already sent that the first
+worker read from the socket but did not handle: pipelined frames, or the
+start of a frame. The adopting worker reads them before the socket, so the
+stream of frames stays aligned.
+
+Messages cross while players disconnect, so a worker receiving a token it
+no longer knows simply queues the surviving player again. Both ends send at
+the same time, so sends never block: what does not fit in the socket waits
+in an outbox until it becomes writable.
+"""
+import asyncio
+import base64
+import json
+import multiprocessing as mp
+import os
+import selectors
+import signal
+import socket
+from collections import deque
+
+from protocol import CODECS
+from registry import GameRegistry
+from server import FrameProtocol, Player, TicTacToeServer, check_geometry, raise_fd_limit
+
+_MAX_MESSAGE = 8192
+# Au-delà, le client envoie bien plus qu'un joueur en attente : pas de transfert
+_MAX_UNREAD = 4096
+
+
+class Channel:
+    """Non-blocking end of a datagram socketpair with an outgoing queue"""
+
+    def __init__(self, sock):
+        sock.setblocking(False)
+        self.sock = sock
+        self.outbox = deque()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, message, fds=()):
+        """Queue message (the channel takes ownership of fds); True if everything was sent"""
+        self.outbox.append((json.dumps(message).encode(), list(fds)))
+        return self.flush()
+
+    def flush(self):
+        while self.outbox:
+            data, fds = self.outbox[0]
+            try:
+                socket.send_fds(self.sock, [data], fds)
+            except BlockingIOError:
+                return False
+            self.outbox.popleft()
+            for fd in fds:
+                os.close(fd)
+        return True
+
+    def receive(self):
+        """Next (message, fds), or None if nothing is pending"""
+        try:
+            data, fds, _, _ = socket.recv_fds(self.sock, _MAX_MESSAGE, 1)
+        except BlockingIOError:
+            return None
+        return json.loads(data), fds
+
+    def close(self):
+        self.sock.close()
+
+
+class WorkerServer(TicTacToeServer):
+    """TicTacToeServer whose matchmaking queue lives in the coordinator"""
+
+    def __init__(self, worker_id, n_workers, channel, **kwargs):
+        super().__init__(reuse_port=True, **kwargs)
+        self.worker_id = worker_id
+        self.channel = Channel(channel)
+        # Identifiants de partie disjoints entre les workers
+        self.registry = GameRegistry(self.registry.game_factory, first_game_id=worker_id + 1,
+                                     game_id_step=n_workers)
+        self.waiting = {}  # token -> Player en attente dans le coordinateur
+        self.tokens = {}   # Player -> token
+        self._next_token = 0
+        self._adoptions = set()
+        self.handed_off = 0
+        self.adopted = 0
+
+    def matchmake(self, player):
+        if player in self.tokens:
+            return
+        token = self._next_token
+        self._next_token += 1
+        self.waiting[token] = player
+        self.tokens[player] = token
+        self.notify({'op': 'wait', 'token': token})
+
+    def notify(self, message, fds=()):
+        if not self.channel.send(message, fds):
+            asyncio.get_running_loop().add_writer(self.channel.fileno(), self._flush)
+
+    def _flush(self):
+        if self.channel.flush():
+            asyncio.get_running_loop().remove_writer(self.channel.fileno())
+
+    def _take(self, token):
+        player = self.waiting.pop(token, None)
+        if player is not None:
+            del self.tokens[player]
+        return player
+
+    def start_game(self, waiting, newcomer):
+        # Comme sur un seul processus : celui qui attendait joue O (2)
+        self.announce(self.registry.create_game(newcomer, waiting))
+
+    def cancel_matchmaking(self, player):
+        token = self.tokens.pop(player, None)
+        if token is not None:
+            del self.waiting[token]
+            self.notify({'op': 'cancel', 'token': token})
+
+    def disconnect(self, player):
+        self.cancel_matchmaking(player)
+        super().disconnect(player)
+
+    def on_coordinator(self):
+        received = self.channel.receive()
+        if received is None:
+            return
+        message, fds = received
+        op = message['op']
+        if op == 'pair':
+            waiting, newcomer = self._take(message['waiting']), self._take(message['newcomer'])
+            if waiting is not None and newcomer is not None:
+                self.start_game(waiting, newcomer)
+            elif waiting or newcomer:
+                self.matchmake(waiting or newcomer)
+        elif op == 'handoff':
+            self.hand_off(self._take(message['token']), message['to'], message['peer'])
+        elif op == 'adopt':
+            task = asyncio.ensure_future(self.adopt(socket.socket(fileno=fds[0]), message))
+            self._adoptions.add(task)
+            task.add_done_callback(self._adoptions.discard)
+
+    def hand_off(self, player, to, peer):
+        """Pass the player's socket to worker `to`, then forget the connection here"""
+        transport = player.writer.transport if player is not None else None
+        unread = player.unread() if player is not None else b''
+        # Des octets encore en attente d'envoi pourraient se mêler à ceux du nouveau worker
+        if (transport is None or transport.is_closing() or transport.get_write_buffer_size()
+                or len(unread) > _MAX_UNREAD):
+            self.notify({'op': 'failed', 'to': to, 'peer': peer})
+            if transport is not None and not transport.is_closing():
+                self.matchmake(player)
+            return
+        fd = os.dup(transport.get_extra_info('socket').fileno())
+        # Les octets reçus mais pas encore traités partent avec le socket
+        self.notify({'op': 'fd', 'to': to, 'peer': peer, 'encoding': player.codec.encoding,
+                     'unread': base64.b64encode(unread).decode('ascii')}, [fd])
+        player.detached = True
+        # Ferme seulement notre descripteur : la connexion reste ouverte dans l'autre worker
+        transport.close()
+        self.handed_off += 1
+
+    async def adopt(self, sock, message):
+        self.connections += 1
+        writer = None
+        try:
+            loop = asyncio.get_running_loop()
+            connection = FrameProtocol()
+            # Ce que l'autre worker avait déjà lu passe avant les octets du socket
+            connection.frames.buffer += base64.b64decode(message['unread'])
+            transport, _ = await loop.create_connection(lambda: connection, sock=sock)
+            writer = asyncio.StreamWriter(transport, connection, None, loop)
+            player = Player(writer, CODECS[message['encoding']], writer.get_extra_info('peername'),
+                            connection)
+            self.adopted += 1
+            waiting = self._take(message['peer'])
+            if waiting is None:
+                self.matchmake(player)
+            else:
+                self.start_game(waiting, player)
+            await self.serve(player)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            self.log(f"Erreur avec un client transféré : {e}")
+        finally:
+            self.connections -= 1
+            if writer is not None:
+                writer.close()
+            else:
+                sock.close()
+
+    async def serve_forever(self):
+        await self.listen()
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.channel.fileno(), self.on_coordinator)
+        self.notify({'op': 'ready'})
+        # SIGTERM (ServerCluster.close) : arrêt propre, le journal des parties est écrit
+        stopped = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, stopped.set)
+        try:
+            await stopped.wait()
+        finally:
+            await self.close()
+
+
+def _run_worker(worker_id, n_workers, channel, host, port, verbose, metrics_port, game_log,
+                board_size, win_length):
+    raise_fd_limit()
+    if metrics_port:
+        metrics_port += worker_id  # Chaque worker expose ses propres métriques
+    if game_log:
+        from gamelog import GameLogWriter
+        game_log = GameLogWriter(game_log, prefix=f'games-w{worker_id}')
+    server = WorkerServer(worker_id, n_workers, channel, host=host, port=port, verbose=verbose,
+                          metrics_port=metrics_port, game_log=game_log, board_size=board_size,
+                          win_length=win_length)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+class ServerCluster:
+    """Coordinator of `workers` WorkerServer processes listening on the same port.
+
+    start() launches the workers, run() serves the coordinator until stop()
+    is called or a worker dies. Port 0 picks a free port, stored in self.port;
+    self.ready counts the workers already listening on it.
+    With metrics_port, worker i serves its metrics on metrics_port + i;
+    with game_log, each worker writes its own segments in that directory.
+    board_size and win_length are passed to every worker (TicTacToeServer),
+    and checked here first so a bad size fails before any worker starts.
+    """
+
+    def __init__(self, host='0.0.0.0', port=5555, workers=None, verbose=True, metrics_port=None,
+                 game_log=None, board_size=3, win_length=None):
+        check_geometry(board_size, win_length)
+        self.host = host
+        self.port = port
+        self.n_workers = workers or os.cpu_count()
+        self.verbose = verbose
+        self.metrics_port = metrics_port
+        self.game_log = game_log
+        self.board_size = board_size
+        self.win_length = win_length
+        self.processes = []
+        self.channels = []
+        self.waiting = None  # (worker, token) du joueur qui attend un adversaire
+        self.handoffs = 0
+        self.ready = 0
+        self._reserved = None
+        self._wakeup = socket.socketpair()
+
+    def start(self):
+        # Garder le port réservé (socket lié mais pas à l'écoute, il ne reçoit aucune connexion)
+        self._reserved = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._reserved.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._reserved.bind((self.host, self.port))
+        self.port = self._reserved.getsockname()[1]
+
+        for worker_id in range(self.n_workers):
+            ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+            process = mp.Process(target=_run_worker, daemon=True, args=(
+                worker_id, self.n_workers, theirs, self.host, self.port, self.verbose,
+                self.metrics_port, self.game_log, self.board_size, self.win_length))
+            process.start()
+            theirs.close()
+            self.channels.append(Channel(ours))
+            self.processes.append(process)
+        if self.verbose:
+            print(f"Cluster de {self.n_workers} workers sur {self.host}:{self.port}")
+        return self
+
+    def wait(self, worker, token):
+        if self.waiting is None:
+            self.waiting = (worker, token)
+            return
+        (other, peer), self.waiting = self.waiting, None
+        if other == worker:
+            self.channels[worker].send({'op': 'pair', 'waiting': peer, 'newcomer': token})
+        else:
+            self.channels[worker].send({'op': 'handoff', 'token': token, 'to': other, 'peer': peer})
+
+    def handle(self, worker, message, fds):
+        op = message['op']
+        if op == 'ready':
+            self.ready += 1
+        elif op == 'wait':
+            self.wait(worker, message['token'])
+        elif op == 'cancel':
+            if self.waiting == (worker, message['token']):
+                self.waiting = None
+        elif op == 'fd':
+            self.channels[message['to']].send(
+                {'op': 'adopt', 'peer': message['peer'], 'encoding': message['encoding'],
+                 'unread': message['unread']}, fds)
+            self.handoffs += 1
+            return
+        elif op == 'failed':
+            self.wait(message['to'], message['peer'])
+        for fd in fds:
+            os.close(fd)
+
+    def run(self):
+        """Coordinator loop; returns on stop() or when a worker exits"""
+        with selectors.DefaultSelector() as selector:
+            events = [selectors.EVENT_READ] * len(self.channels)
+            for worker, channel in enumerate(self.channels):
+                selector.register(channel, events[worker], worker)
+            for process in self.processes:
+                selector.register(process.sentinel, selectors.EVENT_READ, None)
+            selector.register(self._wakeup[0], selectors.EVENT_READ, None)
+            while True:
+                for key, mask in selector.select():
+                    if key.data is None:
+                        return
+                    if mask & selectors.EVENT_WRITE:
+                        key.fileobj.flush()
+                    if mask & selectors.EVENT_READ:
+                        received = key.fileobj.receive()
+                        while received is not None:
+                            self.handle(key.data, *received)
+                            received = key.fileobj.receive()
+                # Surveiller l'écriture seulement tant qu'une file d'envoi n'est pas vide
+                for worker, channel in enumerate(self.channels):
+                    wanted = selectors.EVENT_READ | (selectors.EVENT_WRITE if channel.outbox else 0)
+                    if wanted != events[worker]:
+                        selector.modify(channel, wanted, worker)
+                        events[worker] = wanted
+
+    def stop(self):
+        self._wakeup[1].send(b'\0')
+
+    def close(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        for channel in self.channels + list(self._wakeup):
+            channel.close()
+        if self._reserved is not None:
+            self._reserved.close()
+
+    def serve_forever(self):
+        raise_fd_limit()
+        self.start()
+        try:
+            self.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
@@ -0,0 +1,277 @@
+"""Tic-tac-toe engine shared by the GUIs, the server and the training code.
+
+Pure Python with no third-party imports, so headless entry points (server,
+bots, solver) can use it without pulling in pygame, tkinter or torch.
+
+TicTacToe is the 3x3 bitboard engine; KInARow plays the same interface on
+an N x N board where k stones in a row win (15x15 five-in-a-row...), and
+make_game(size, win_length) returns whichever fits.
+"""
+
+# Bitboard layout: cell index = row * 3 + col, bit i set = cell i occupied.
+FULL_MASK = 0x1FF
+
+# The 8 winning lines as (mask, winning_line) pairs, in the order the list
+# implementation used to check them: row, column, main diagonal, anti-diagonal.
+WIN_LINES = (
+    [(0b111 << (3 * r), ('row', r)) for r in range(3)] +
+    [(0b001001001 << c, ('col', c)) for c in range(3)] +
+    [(0b100010001, ('diag', 1)), (0b001010100, ('diag', 2))]
+)
+WIN_MASKS = tuple(mask for mask, _ in WIN_LINES)
+
+# Lines going through each cell, so a move only tests the (2 to 4) lines it touches
+CELL_LINES = tuple(
+    tuple(line for line in WIN_LINES if line[0] >> cell & 1)
+    for cell in range(9)
+)
+
+# Empty cells for every occupancy mask, precomputed once
+VALID_MOVES = tuple(
+    tuple(divmod(cell, 3) for cell in range(9) if not occupied >> cell & 1)
+    for occupied in range(FULL_MASK + 1)
+)
+FREE_CELLS = tuple(
+    tuple(cell for cell in range(9) if not occupied >> cell & 1)
+    for occupied in range(FULL_MASK + 1)
+)
+
+
+class TicTacToe:
+    """Tic-tac-toe engine backed by two 9-bit masks (one per player).
+
+    ``board`` is a read-only list-of-lists view rebuilt lazily from the masks,
+    kept for the GUIs, the server and the tests.
+    """
+    __slots__ = ('masks', 'current_player', 'game_over', 'winner',
+                 'winning_line', '_board')
+    size = 3
+    win_length = 3
+
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.masks = [0, 0]  # masks[0] for X (1), masks[1] for O (2)
+        self.current_player = 1  # 1 for X, 2 for O
+        self.game_over = False
+        self.winner = None
+        self.winning_line = None
+        self._board = None
+    
+    @property
+    def board(self):
+        if self._board is None:
+            x, o = self.masks
+            self._board = [[1 if x >> (3 * r + c) & 1 else 2 if o >> (3 * r + c) & 1 else 0
+                            for c in range(3)] for r in range(3)]
+        return self._board
+    
+    @property
+    def occupied(self):
+        return self.masks[0] | self.masks[1]
+    
+    @property
+    def free_cells(self):
+        """Empty cell indices, same as KInARow.free_cells"""
+        return FREE_CELLS[self.masks[0] | self.masks[1]]
+    
+    def copy(self):
+        game = TicTacToe.__new__(TicTacToe)
+        game.masks = self.masks[:]
+        game.current_player = self.current_player
+        game.game_over = self.game_over
+        game.winner = self.winner
+        game.winning_line = self.winning_line
+        game._board = None
+        return game
+    
+    def make_move(self, row, col):
+        if self.game_over or row not in range(3) or col not in range(3):
+            return False
+        return self.play(row * 3 + col)
+    
+    def play(self, cell):
+        """Play the current player on cell index 0-8 (no bounds check)"""
+        bit = 1 << cell
+        masks = self.masks
+        if self.game_over or (masks[0] | masks[1]) & bit:
+            return False
+        
+        player = self.current_player
+        masks[player - 1] |= bit
+        self._board = None
+        self._check_cell(cell, player)
+        
+        if not self.game_over:
+            self.current_player = 3 - player  # Switch player (1->2, 2->1)
+        return True
+    
+    def check_winner(self, row, col):
+        player = self.board[row][col]
+        if player:
+            self._check_cell(row * 3 + col, player)
+    
+    def _check_cell(self, cell, player):
+        mask = self.masks[player - 1]
+        for line_mask, line in CELL_LINES[cell]:
+            if mask & line_mask == line_mask:
+                self.winning_line = line
+                self.game_over = True
+                self.winner = player
+                return
+        
+        # Draw: all 9 cells occupied
+        if self.masks[0] | self.masks[1] == FULL_MASK:
+            self.game_over = True
+    
+    def get_state(self):
+        """Added for testing - returns the current game state"""
+        return {
+            'board': [row[:] for row in self.board],
+            'current_player': self.current_player,
+            'game_over': self.game_over,
+            'winner': self.winner,
+            'winning_line': self.winning_line
+        }
+    
+    def get_valid_moves(self):
+        """Added for testing - returns list of valid moves"""
+        return list(VALID_MOVES[self.masks[0] | self.masks[1]])
+
+
+# Row and column steps of the 4 line directions: row, column, diagonal, anti-diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class KInARow:
+    """N x N board where win_length stones in a row, column or diagonal win.
+
+    Same interface as TicTacToe; ``winning_line`` is the pair of end cells
+    ((row, col), (row, col)) of the winning stones. A move only walks the
+    4 lines through the cell it fills, at most win_length - 1 cells each
+    way, so win detection is O(k) whatever the board size. The empty cells
+    are kept in ``free_cells`` (unordered) with the position of each cell
+    in that list, so filling a cell is an O(1) swap-and-pop.
+    """
+    __slots__ = ('size', 'win_length', 'cells', 'current_player', 'game_over', 'winner',
+                 'winning_line', 'free_cells', '_free_index', '_board')
+
+    def __init__(self, size=15, win_length=5):
+        if not 1 <= win_length <= size:
+            raise ValueError(f"Longueur gagnante {win_length} impossible sur un plateau {size}x{size}")
+        self.size = size
+        self.win_length = win_length
+        self.reset()
+
+    def reset(self):
+        n_cells = self.size * self.size
+        self.cells = bytearray(n_cells)  # 0 vide, 1 X, 2 O ; cellule = row * size + col
+        self.free_cells = list(range(n_cells))
+        self._free_index = list(range(n_cells))
+        self.current_player = 1
+        self.game_over = False
+        self.winner = None
+        self.winning_line = None
+        self._board = None
+
+    def copy(self):
+        game = KInARow.__new__(KInARow)
+        game.size = self.size
+        game.win_length = self.win_length
+        game.cells = self.cells[:]
+        game.free_cells = self.free_cells[:]
+        game._free_index = self._free_index[:]
+        game.current_player = self.current_player
+        game.game_over = self.game_over
+        game.winner = self.winner
+        game.winning_line = self.winning_line
+        game._board = None
+        return game
+
+    @property
+    def board(self):
+        if self._board is None:
+            size, cells = self.size, self.cells
+            self._board = [list(cells[r * size:(r + 1) * size]) for r in range(size)]
+        return self._board
+
+    def make_move(self, row, col):
+        if self.game_over or row not in range(self.size) or col not in range(self.size):
+            return False
+        return self.play(row * self.size + col)
+
+    def play(self, cell):
+        """Play the current player on cell index row * size + col (no bounds check)"""
+        if self.game_over or self.cells[cell]:
+            return False
+
+        player = self.current_player
+        self.cells[cell] = player
+        self._take(cell)
+        self._board = None
+        self._check_cell(cell, player)
+
+        if not self.game_over:
+            self.current_player = 3 - player
+        return True
+
+    def _take(self, cell):
+        """Remove cell from free_cells: move the last free cell into its slot"""
+        free, index = self.free_cells, self._free_index
+        slot = index[cell]
+        last = free.pop()
+        if last != cell:
+            free[slot] = last
+            index[last] = slot
+
+    def check_winner(self, row, col):
+        player = self.board[row][col]
+        if player:
+            self._check_cell(row * self.size + col, player)
+
+    def _check_cell(self, cell, player):
+        size, cells, reach = self.size, self.cells, self.win_length - 1
+        row, col = divmod(cell, size)
+        for dr, dc in DIRECTIONS:
+            back = 0
+            r, c = row - dr, col - dc
+            while back < reach and 0 <= r < size and 0 <= c < size and cells[r * size + c] == player:
+                back += 1
+                r, c = r - dr, c - dc
+            forward = 0
+            r, c = row + dr, col + dc
+            while back + forward < reach and 0 <= r < size and 0 <= c < size and cells[r * size + c] == player:
+                forward += 1
+                r, c = r + dr, c + dc
+            if back + forward >= reach:
+                self.winning_line = ((row - back * dr, col - back * dc),
+                                     (row + forward * dr, col + forward * dc))
+                self.game_over = True
+                self.winner = player
+                return
+
+        if not self.free_cells:
+            self.game_over = True
+
+    def get_state(self):
+        return {
+            'board': [row[:] for row in self.board],
+            'current_player': self.current_player,
+            'game_over': self.game_over,
+            'winner': self.winner,
+            'winning_line': self.winning_line
+        }
+
+    def get_valid_moves(self):
+        """Empty cells as (row, col), in no particular order"""
+        size = self.size
+        return [divmod(cell, size) for cell in self.free_cells]
+
+
+def make_game(size=3, win_length=None):
+    """Engine for a size x size board (win_length defaults to min(size, 5)), the bitboard one for 3x3"""
+    win_length = win_length or min(size, 5)
+    if size == 3 and win_length == 3:
+        return TicTacToe()
+    return KInARow(size, win_length)
@@ -1,103 +1,29 @@
 import pygame
 import sys
+import time
 from pygame.locals import *
-
-class TicTacToe:
-    def __init__(self):
-        self.reset()
-    
-    def reset(self):
-        self.board = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]  # 3x3 grid
-        self.current_player = 1  # 1 for X, 2 for O
-        self.game_over = False
-        self.winner = None
-        self.winning_line = None
-    
-    def make_move(self, row, col):
-        if self.game_over or row not in range(3) or col not in range(3):
-            return False
-        
-        if self.board[row][col] != 0:
-            return False
-        
-        self.board[row][col] = self.current_player
-        self.check_winner(row, col)
-        
-        if not self.game_over:
-            self.current_player = 3 - self.current_player  # Switch player (1->2, 2->1)
-        return True
-    
-    def check_winner(self, row, col):
-        player = self.board[row][col]
-        
-        # Check row
-        if all(cell == player for cell in self.board[row]):
-            self.winning_line = ('row', row)
-            self.game_over = True
-            self.winner = player
-            return
-        
-        # Check column
-        if all(self.board[i][col] == player for i in range(3)):
-            self.winning_line = ('col', col)
-            self.game_over = True
-            self.winner = player
-            return
-        
-        # Check diagonals
-        if row == col and all(self.board[i][i] == player for i in range(3)):
-            self.winning_line = ('diag', 1)
-            self.game_over = True
-            self.winner = player
-            return
-        
-        if row + col == 2 and all(self.board[i][2-i] == player for i in range(3)):
-            self.winning_line = ('diag', 2)
-            self.game_over = True
-            self.winner = player
-            return
-        
-        # Check for draw
-        if all(cell != 0 for row in self.board for cell in row):
-            self.game_over = True
-    
-    def get_state(self):
-        """Added for testing - returns the current game state"""
-        return {
-            'board': [row[:] for row in self.board],
-            'current_player': self.current_player,
-            'game_over': self.game_over,
-            'winner': self.winner,
-            'winning_line': self.winning_line
-        }
-    
-    def get_valid_moves(self):
-        """Added for testing - returns list of valid moves"""
-        moves = []
-        for row in range(3):
-            for col in range(3):
-                if self.board[row][col] == 0:
-                    moves.append((row, col))
-        return moves
+from engine import TicTacToe, make_game  # TicTacToe réexporté : from game import TicTacToe
+from render import EXPOSE_EVENTS, FrameCounter, allow_events
 
 class TicTacToeGUI:
-    def __init__(self, is_ai_game=False):
+    def __init__(self, is_ai_game=False, size=3, win_length=None):
         pygame.init()
         
         # Configurable parameters
-        self.cell_size = 150  # Size of each cell in pixels
-        self.line_width = 10   # Width of grid lines
+        self.size = size       # Cells per row (15 with win_length 5: gomoku)
+        self.cell_size = max(450 // size, 24)  # Size of each cell in pixels
+        self.line_width = max(self.cell_size // 15, 1)  # Width of grid lines
         self.margin = 50       # Margin around the grid
         self.info_height = 100 # Height of info panel
         
         # Calculate window size
-        self.width = 3 * self.cell_size + 2 * self.margin
-        self.height = 3 * self.cell_size + 2 * self.margin + self.info_height
+        self.width = size * self.cell_size + 2 * self.margin
+        self.height = size * self.cell_size + 2 * self.margin + self.info_height
         
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Tic Tac Toe - DRL")
         
-        self.game = TicTacToe()
+        self.game = make_game(size, win_length)
         self.is_ai_game = is_ai_game
         self.ai_player = 2 if is_ai_game else None
         
@@ -116,15 +42,24 @@ class TicTacToeGUI:
         # Create symbol images
         self.x_img = self.create_symbol('X')
         self.o_img = self.create_symbol('O')
+        
+        # Event-driven rendering: background and grid drawn once, texts cached,
+        # only the rects that changed since the last render are repainted
+        self.background = self.create_background()
+        self.text_cache = {}
+        self.frames = FrameCounter()
+        self._drawn = None         # Cells as displayed (None: full redraw)
+        self._drawn_line = None
+        self._drawn_status = None
     
     def create_symbol(self, symbol):
         """Create X or O symbol with proper scaling"""
-        size = self.cell_size - 30
+        size = self.cell_size * 4 // 5
         surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        thickness = max(self.cell_size // 10, 2)
         
         if symbol == 'X':
-            margin = 10
-            thickness = 15
+            margin = size // 12
             pygame.draw.line(surf, self.X_COLOR, 
                            (margin, margin), 
                            (size-margin, size-margin), 
@@ -134,117 +69,172 @@ class TicTacToeGUI:
                            (margin, size-margin), 
                            thickness)
         else:  # 'O'
-            radius = (size - 20) // 2
-            thickness = 15
+            radius = (size - size // 6) // 2
             pygame.draw.circle(surf, self.O_COLOR, 
                              (size//2, size//2), 
                              radius, thickness)
         
         return surf
     
-    def draw_grid(self):
+    def create_background(self):
+        """Background and grid, blitted back under every repainted area"""
+        surf = pygame.Surface((self.width, self.height))
+        surf.fill(self.BG_COLOR)
+        self.draw_grid(surf)
+        return surf
+    
+    def text(self, font, text):
+        """Rendered text surface, cached"""
+        key = (font, text)
+        if key not in self.text_cache:
+            self.text_cache[key] = font.render(text, True, (0, 0, 0))
+        return self.text_cache[key]
+    
+    def draw_grid(self, surface):
         """Draw the Tic Tac Toe grid"""
+        grid = self.size * self.cell_size
         # Vertical lines
-        for i in range(1, 3):
+        for i in range(1, self.size):
             x = self.margin + i * self.cell_size
-            pygame.draw.line(self.screen, self.LINE_COLOR,
+            pygame.draw.line(surface, self.LINE_COLOR,
                            (x, self.margin),
-                           (x, self.margin + 3 * self.cell_size),
+                           (x, self.margin + grid),
                            self.line_width)
         
         # Horizontal lines
-        for i in range(1, 3):
+        for i in range(1, self.size):
             y = self.margin + i * self.cell_size
-            pygame.draw.line(self.screen, self.LINE_COLOR,
+            pygame.draw.line(surface, self.LINE_COLOR,
                            (self.margin, y),
-                           (self.margin + 3 * self.cell_size, y),
+                           (self.margin + grid, y),
                            self.line_width)
     
+    def draw_cell(self, row, col):
+        """Repaint one cell over the background, returns its rect"""
+        rect = pygame.Rect(self.margin + col * self.cell_size, self.margin + row * self.cell_size,
+                           self.cell_size, self.cell_size)
+        self.screen.blit(self.background, rect, rect)
+        player = self.game.board[row][col]
+        if player:
+            img = self.x_img if player == 1 else self.o_img
+            self.screen.blit(img, img.get_rect(center=rect.center))
+        return rect
+    
     def draw_symbols(self):
         """Draw X and O symbols on the board"""
-        for row in range(3):
-            for col in range(3):
-                if self.game.board[row][col] == 0:
-                    continue
-                
-                x = self.margin + col * self.cell_size + self.cell_size//2
-                y = self.margin + row * self.cell_size + self.cell_size//2
-                
-                if self.game.board[row][col] == 1:
-                    self.screen.blit(self.x_img, 
-                                    (x - self.x_img.get_width()//2, 
-                                     y - self.x_img.get_height()//2))
-                else:
-                    self.screen.blit(self.o_img, 
-                                    (x - self.o_img.get_width()//2, 
-                                     y - self.o_img.get_height()//2))
+        board = self.game.board
+        for row in range(self.size):
+            for col in range(self.size):
+                if board[row][col] != 0:
+                    self.draw_cell(row, col)
     
     def draw_winning_line(self):
-        """Draw the winning line if there's a winner"""
+        """Draw the winning line if there's a winner, returns its bounding rect"""
         if not self.game.winning_line:
-            return
+            return None
             
-        line_type, index = self.game.winning_line
         color = self.WIN_COLOR
         width = self.line_width + 2
+        line_type, index = self.game.winning_line
+        if isinstance(line_type, tuple):
+            # Plateau N x N : cases aux deux bouts de l'alignement
+            (r0, c0), (r1, c1) = self.game.winning_line
+            half = self.cell_size // 2
+            return pygame.draw.line(self.screen, color,
+                           (self.margin + c0 * self.cell_size + half, self.margin + r0 * self.cell_size + half),
+                           (self.margin + c1 * self.cell_size + half, self.margin + r1 * self.cell_size + half),
+                           width)
         
         if line_type == 'row':
             y = self.margin + index * self.cell_size + self.cell_size//2
-            pygame.draw.line(self.screen, color,
+            return pygame.draw.line(self.screen, color,
                            (self.margin, y),
                            (self.margin + 3 * self.cell_size, y),
                            width)
         
         elif line_type == 'col':
             x = self.margin + index * self.cell_size + self.cell_size//2
-            pygame.draw.line(self.screen, color,
+            return pygame.draw.line(self.screen, color,
                            (x, self.margin),
                            (x, self.margin + 3 * self.cell_size),
                            width)
         
         elif line_type == 'diag' and index == 1:
-            pygame.draw.line(self.screen, color,
+            return pygame.draw.line(self.screen, color,
                            (self.margin, self.margin),
                            (self.margin + 3 * self.cell_size, 
                             self.margin + 3 * self.cell_size),
                            width)
         
         elif line_type == 'diag' and index == 2:
-            pygame.draw.line(self.screen, color,
+            return pygame.draw.line(self.screen, color,
                            (self.margin + 3 * self.cell_size, self.margin),
                            (self.margin, self.margin + 3 * self.cell_size),
                            width)
     
+    def status_text(self):
+        if self.game.game_over:
+            if self.game.winner:
+                return f"Player {self.game.winner} wins!"
+            return "It's a draw!"
+        return f"Player {self.game.current_player}'s turn"
+    
     def draw_info_panel(self):
-        """Draw the game status information panel"""
+        """Draw the game status information panel, returns its rect"""
         panel_rect = pygame.Rect(0, self.height - self.info_height, 
                                 self.width, self.info_height)
         pygame.draw.rect(self.screen, self.INFO_BG, panel_rect)
         
         if self.game.game_over:
-            if self.game.winner:
-                text = f"Player {self.game.winner} wins!"
-            else:
-                text = "It's a draw!"
-            restart_text = self.small_font.render("Click to play again", True, (0, 0, 0))
+            restart_text = self.text(self.small_font, "Click to play again")
             self.screen.blit(restart_text, 
                            (self.width//2 - restart_text.get_width()//2, 
                             self.height - self.info_height//2))
-        else:
-            text = f"Player {self.game.current_player}'s turn"
         
-        text_surface = self.font.render(text, True, (0, 0, 0))
+        text_surface = self.text(self.font, self.status_text())
         self.screen.blit(text_surface, 
                        (self.width//2 - text_surface.get_width()//2, 
                         self.height - self.info_height + 20))
+        return panel_rect
     
     def draw_board(self):
-        """Draw the complete game board"""
-        self.screen.fill(self.BG_COLOR)
-        self.draw_grid()
+        """Draw the complete game board, returns the dirty rects (the whole window)"""
+        self.screen.blit(self.background, (0, 0))
         self.draw_symbols()
         self.draw_winning_line()
         self.draw_info_panel()
+        self._remember()
+        return [self.screen.get_rect()]
+    
+    def _remember(self):
+        self._drawn = [cell for row in self.game.board for cell in row]
+        self._drawn_line = self.game.winning_line
+        self._drawn_status = self.status_text()
+    
+    def render(self):
+        """Repaint what changed since the last render, returns the dirty rects"""
+        cells = [cell for row in self.game.board for cell in row]
+        drawn = self._drawn
+        # Partie réinitialisée (cases vidées) ou fenêtre découverte : tout redessiner
+        if drawn is None or any(old and not new for old, new in zip(drawn, cells)):
+            return self.draw_board()
+        
+        dirty = [self.draw_cell(*divmod(i, self.size))
+                 for i, (old, new) in enumerate(zip(drawn, cells)) if old != new]
+        if self.game.winning_line != self._drawn_line:
+            dirty.append(self.draw_winning_line())
+        if self.status_text() != self._drawn_status:
+            dirty.append(self.draw_info_panel())
+        self._remember()
+        return dirty
+    
+    def refresh(self):
+        """Render and push only the dirty rects to the display"""
+        start = time.perf_counter()
+        dirty = self.render()
+        if dirty:
+            pygame.display.update(dirty)
+            self.frames.record(start)
     
     def handle_click(self, pos):
         """Handle mouse clicks"""
@@ -254,8 +244,8 @@ class TicTacToeGUI:
         
         x, y = pos
         # Check if click is within the grid
-        if (self.margin <= x < self.margin + 3 * self.cell_size and
-            self.margin <= y < self.margin + 3 * self.cell_size):
+        if (self.margin <= x < self.margin + self.size * self.cell_size and
+            self.margin <= y < self.margin + self.size * self.cell_size):
             
             # Convert to grid coordinates
             row = (y - self.margin) // self.cell_size
@@ -266,21 +256,25 @@ class TicTacToeGUI:
                 self.game.make_move(row, col)
     
     def run(self):
-        """Main game loop"""
-        clock = pygame.time.Clock()
+        """Main game loop: sleeps in pygame.event.wait() until a click or an expose"""
+        allow_events()
+        self.refresh()
         
         while True:
-            for event in pygame.event.get():
+            for event in self.frames.wait_events():
                 if event.type == QUIT:
+                    print(f"Rendu : {self.frames.report()}")
                     pygame.quit()
                     sys.exit()
                 elif event.type == MOUSEBUTTONDOWN:
                     self.handle_click(event.pos)
+                elif event.type in EXPOSE_EVENTS:
+                    self._drawn = None
             
-            self.draw_board()
-            pygame.display.update()
-            clock.tick(30)
+            self.refresh()
 
 if __name__ == "__main__":
-    game = TicTacToeGUI(is_ai_game=False)
+    # python game.py [taille [alignement]], par exemple python game.py 15 5
+    args = [int(arg) for arg in sys.argv[1:3]]
+    game = TicTacToeGUI(False, *args)
     game.run()
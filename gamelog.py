@@ -0,0 +1,208 @@
+"""Append-only log of completed games, one fixed-size 16-byte record per game.
+
+    offset  size  field
+    0       4     start        start time, Unix seconds (little-endian u32)
+    4       4     duration_ms  game duration in milliseconds (u32)
+    8       5     moves        up to 9 cells (0-8), 4 bits each, first move in
+                               the low nibble of byte 0; unused nibbles are 0xF
+    13      1     n_moves
+    14      1     result       0 draw, 1 X won, 2 O won
+    15      1     flags        bit 0: game against the server's AI
+
+Records go to segment files <prefix>-<n>.log in a directory; a new segment
+starts every segment_records games. GameLogWriter only packs the record on
+the caller's thread, a background thread writes the pending records in
+batches. The files have no header, so GameLogReader maps each segment as
+a NumPy record array (numpy.memmap) and computes statistics over millions
+of games without creating Python objects; a partial record left at the
+end of a segment by a crash is ignored.
+"""
+import glob
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+RECORD = struct.Struct('<II5sBBB')
+RECORD_SIZE = RECORD.size
+NO_MOVE = 0xF
+MAX_DURATION_MS = 0xFFFFFFFF
+FLAG_VS_AI = 1
+DRAW, X_WON, O_WON = 0, 1, 2
+
+
+def pack_moves(cells):
+    packed = bytearray([NO_MOVE << 4 | NO_MOVE] * 5)
+    for i, cell in enumerate(cells):
+        shift = (i & 1) * 4
+        packed[i >> 1] = packed[i >> 1] & ~(0xF << shift) | cell << shift
+    return bytes(packed)
+
+
+def unpack_moves(packed, n_moves):
+    return [(packed[i >> 1] >> ((i & 1) * 4)) & 0xF for i in range(n_moves)]
+
+
+def pack_record(cells, result, start, end, vs_ai=False):
+    # Horloge reculée ou partie interminable : durée bornée plutôt qu'un struct.error
+    duration_ms = min(max(int((end - start) * 1000), 0), MAX_DURATION_MS)
+    return RECORD.pack(int(start), duration_ms, pack_moves(cells), len(cells),
+                       result, FLAG_VS_AI if vs_ai else 0)
+
+
+def record_dtype():
+    """NumPy dtype of one record (numpy is only needed to read the log)"""
+    import numpy as np
+
+    return np.dtype([('start', '<u4'), ('duration_ms', '<u4'), ('moves', 'u1', (5,)),
+                     ('n_moves', 'u1'), ('result', 'u1'), ('flags', 'u1')])
+
+
+class GameLogWriter:
+    """Buffered, batched writer; log_game() never touches the disk"""
+
+    def __init__(self, directory, prefix='games', segment_records=1 << 20, flush_interval=0.5,
+                 batch_records=4096):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_records = segment_records
+        self.flush_interval = flush_interval
+        self.batch_records = batch_records
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.written = 0
+
+        # Reprendre à la fin du dernier segment existant de ce préfixe
+        # (games-w0-000000.log n'est pas un segment de games)
+        pattern = re.compile(rf'^{re.escape(prefix)}-(\d{{6}})\.log$')
+        segments = [int(match.group(1)) for match in map(pattern.match, os.listdir(directory)) if match]
+        self._segment = max(segments, default=0)
+        path = os.path.join(directory, f'{prefix}-{self._segment:06d}.log')
+        self._segment_size = os.path.getsize(path) // RECORD_SIZE if segments else 0
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name='gamelog', daemon=True)
+        self._thread.start()
+
+    def log_game(self, cells, result, start, end, vs_ai=False):
+        record = pack_record(cells, result, start, end, vs_ai)
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.batch_records
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        while pending:
+            if self._file is None or self._segment_size >= self.segment_records:
+                self._open_segment()
+            batch = pending[:self.segment_records - self._segment_size]
+            del pending[:len(batch)]
+            self._file.write(b''.join(batch))
+            self._segment_size += len(batch)
+            self.written += len(batch)
+        if self._file is not None:
+            self._file.flush()
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        if self._segment_size >= self.segment_records:
+            self._segment += 1
+            self._segment_size = 0
+        path = os.path.join(self.directory, f'{self.prefix}-{self._segment:06d}.log')
+        # Tronquer un enregistrement partiel laissé par un arrêt brutal
+        if os.path.exists(path):
+            os.truncate(path, self._segment_size * RECORD_SIZE)
+        self._file = open(path, 'ab')
+
+    def close(self):
+        """Write every pending record and stop the background thread"""
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class GameLogReader:
+    """Read-only view of every segment of a log directory as NumPy record arrays"""
+
+    def __init__(self, directory):
+        import numpy as np
+
+        dtype = record_dtype()
+        self.segments = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.log'))):
+            count = os.path.getsize(path) // RECORD_SIZE
+            if count:
+                self.segments.append(np.memmap(path, dtype=dtype, mode='r', shape=(count,)))
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    @staticmethod
+    def moves(records):
+        """(N, 9) array of cells, -1 after the last move"""
+        import numpy as np
+
+        nibbles = np.empty((len(records), 10), dtype=np.int8)
+        nibbles[:, 0::2] = records['moves'] & 0xF
+        nibbles[:, 1::2] = records['moves'] >> 4
+        cells = nibbles[:, :9]
+        cells[np.arange(9) >= records['n_moves'][:, None]] = -1
+        return cells
+
+    def opening_frequency(self, depth=1):
+        """Games per opening sequence of `depth` moves, as an array of shape (9,) * depth"""
+        import numpy as np
+
+        counts = np.zeros(9 ** depth, dtype=np.int64)
+        weights = 9 ** np.arange(depth - 1, -1, -1)
+        for segment in self.segments:
+            long_enough = segment[segment['n_moves'] >= depth]
+            codes = self.moves(long_enough)[:, :depth].astype(np.int64) @ weights
+            counts += np.bincount(codes, minlength=9 ** depth)
+        return counts.reshape((9,) * depth)
+
+    def win_rate_by_first_move(self):
+        """Per first cell (0-8): games, X wins, O wins, draws and X win rate"""
+        import numpy as np
+
+        results = np.zeros((9, 3), dtype=np.int64)  # [cellule, résultat]
+        for segment in self.segments:
+            played = segment[segment['n_moves'] > 0]
+            first = (played['moves'][:, 0] & 0xF).astype(np.int64)
+            results += np.bincount(first * 3 + played['result'], minlength=27).reshape(9, 3)
+        games = results.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x_rate = np.where(games > 0, results[:, X_WON] / games, 0.0)
+        return {'games': games, 'x_wins': results[:, X_WON], 'o_wins': results[:, O_WON],
+                'draws': results[:, DRAW], 'x_win_rate': x_rate}
+
+
+if __name__ == "__main__":
+    reader = GameLogReader(sys.argv[1] if len(sys.argv) > 1 else 'game_logs')
+    start = time.perf_counter()
+    openings = reader.opening_frequency()
+    rates = reader.win_rate_by_first_move()
+    print(f"{len(reader)} parties dans {len(reader.segments)} segments "
+          f"({time.perf_counter() - start:.3f}s)")
+    print("Case  ouvertures  victoires X  victoires O  nuls  taux X")
+    for cell in range(9):
+        print(f"{divmod(cell, 3)}  {openings[cell]:>10}  {rates['x_wins'][cell]:>11}"
+              f"  {rates['o_wins'][cell]:>11}  {rates['draws'][cell]:>4}  {rates['x_win_rate'][cell]:.2f}")
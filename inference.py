@@ -0,0 +1,92 @@
+"""Micro-batched policy inference for the server's AI seats.
+
+Every AI turn of every game goes through one BatchInferenceQueue. Boards
+are collected until max_batch are pending or max_delay seconds have passed
+since the first one, then answered with a single predict_batch call, so
+thousands of human-vs-AI games cost a few forward passes per tick instead
+of one each.
+"""
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from numpy_policy import NumpyPolicyAgent
+
+
+class BatchInferenceQueue:
+    """submit(flat_board) -> future of the chosen cell (0-8).
+
+    The agent needs predict_batch(boards, masks) like NumpyPolicyAgent.
+    Inference runs on the event loop: a batch of small MLP passes is
+    cheaper than a round trip to an executor. on_batch(size, seconds,
+    waits), if given, is called after each batch with its inference time
+    and the seconds each board waited between submit() and its answer.
+    """
+
+    def __init__(self, agent=None, max_batch=256, max_delay=0.002, history=10000, on_batch=None):
+        self.agent = agent if agent is not None else NumpyPolicyAgent()
+        self.on_batch = on_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []  # (board, future, submit time)
+        self._timer = None
+        self.batches = 0
+        self.boards = 0
+        self.largest_batch = 0
+        self.inference_seconds = 0.0
+        self.latencies = deque(maxlen=history)  # Secondes entre submit() et la réponse
+
+    def submit(self, board):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((board, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return future
+
+    def flush(self):
+        """Answer every pending board with one batched call"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        boards = np.array([board for board, _, _ in pending], dtype=np.float32)
+        try:
+            actions = self.agent.predict_batch(boards, boards == 0)
+        except Exception as e:
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        done = time.perf_counter()
+
+        waits = [done - submitted for _, _, submitted in pending]
+        for (_, future, _), action in zip(pending, actions):
+            if not future.done():
+                future.set_result(int(action))
+        self.latencies.extend(waits)
+        self.batches += 1
+        self.boards += len(pending)
+        self.largest_batch = max(self.largest_batch, len(pending))
+        self.inference_seconds += done - start
+        if self.on_batch is not None:
+            self.on_batch(len(pending), done - start, waits)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            'batches': self.batches,
+            'boards': self.boards,
+            'mean_batch': self.boards / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'inference_ms_per_batch': 1000 * self.inference_seconds / self.batches if self.batches else 0.0,
+            'latency_p50_ms': float(np.percentile(latencies, 50)),
+            'latency_p99_ms': float(np.percentile(latencies, 99)),
+        }
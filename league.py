@@ -0,0 +1,210 @@
+"""Self-play league: PPO against a pool of frozen opponents.
+
+TicTacToeEnv lets the agent place the stone of whichever player is to
+move, so the policy plays both sides of every game and never meets a
+fixed opponent. LeagueVecEnv gives each episode a side and an opponent
+sampled from an OpponentPool (uniform random moves, the solver and
+frozen NumPy snapshots of the policy being trained); the opponent's
+replies are computed with one predict_batch call per pool member over
+all the envs it currently plays. LeagueCallback adds a snapshot to the
+pool every snapshot_interval steps and reports the win/draw/loss rates
+of the current policy against each member.
+"""
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+from batch_game import BatchTicTacToe
+from numpy_policy import NumpyPolicyAgent, policy_weights
+from solver import NO_MOVE, Solver
+from tictactoe_env import BOARD_POWERS, strategic_rewards
+from vec_env import BatchVecEnv
+
+
+# === ADVERSAIRES ===
+class RandomOpponent:
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+
+    def predict_batch(self, boards, masks):
+        return (self.rng.random(masks.shape) * masks).argmax(axis=-1)
+
+
+class SolverOpponent:
+    """Perfect player, one table lookup per board"""
+
+    def __init__(self, solver=None):
+        solver = solver or Solver.load()
+        self.moves = np.frombuffer(solver.moves, dtype=np.int8)
+
+    def predict_batch(self, boards, masks):
+        codes = np.asarray(boards, dtype=np.int64) @ BOARD_POWERS
+        moves = self.moves[codes].astype(np.intp)
+        # Pas de coup dans la table (partie finie) : première case libre
+        return np.where(moves == NO_MOVE, masks.argmax(axis=-1), moves)
+
+
+class OpponentPool:
+    """Named opponents with predict_batch(boards, masks).
+
+    Random and solver opponents are always there; add_snapshot keeps the
+    last max_snapshots frozen policies, a new one taking the slot of the
+    oldest so that the member indices of running episodes stay valid.
+    """
+
+    def __init__(self, max_snapshots=8, solver=None, seed=0):
+        self.names = ['random', 'solver']
+        self.agents = [RandomOpponent(seed), SolverOpponent(solver)]
+        self.max_snapshots = max_snapshots
+        self.snapshot_slots = []
+
+    def __len__(self):
+        return len(self.agents)
+
+    def add_snapshot(self, name, agent):
+        if len(self.snapshot_slots) < self.max_snapshots:
+            self.snapshot_slots.append(len(self.agents))
+            self.names.append(name)
+            self.agents.append(agent)
+            return
+        slot = self.snapshot_slots.pop(0)
+        self.snapshot_slots.append(slot)
+        self.names[slot] = name
+        self.agents[slot] = agent
+
+
+def play_match(agent, opponent, n_games=1000, player=2):
+    """Win/draw/loss rates of agent playing `player` against opponent, both with predict_batch"""
+    games = BatchTicTacToe(n_games)
+    while not games.game_over.all():
+        live = ~games.game_over
+        actions = np.full(n_games, -1)
+        for mover, side in ((agent, games.current_player == player),
+                            (opponent, games.current_player != player)):
+            turn = np.flatnonzero(live & side)
+            if len(turn):
+                boards = games.boards[turn]
+                actions[turn] = mover.predict_batch(boards.astype(np.float32), boards == 0)
+        games.step(actions)
+    winners = games.winner
+    return {
+        'win': float(np.mean(winners == player)),
+        'draw': float(np.mean(winners == 0)),
+        'loss': float(np.mean(winners == 3 - player)),
+    }
+
+
+def evaluate(agent, pool, n_games=200):
+    """{member name: rates}, half of the games as X and half as O"""
+    report = {}
+    for name, opponent in zip(pool.names, pool.agents):
+        as_x = play_match(agent, opponent, n_games // 2, player=1)
+        as_o = play_match(agent, opponent, n_games - n_games // 2, player=2)
+        report[name] = {key: (as_x[key] + as_o[key]) / 2 for key in as_x}
+    return report
+
+
+# === ENVIRONNEMENT ===
+class LeagueVecEnv(BatchVecEnv):
+    """N games where the agent plays one side against a pool member.
+
+    Each episode draws the agent's side among `sides` and an opponent
+    uniformly from the pool; when the agent is O the opponent opens. The
+    observation is the raw board (the side to move follows from the stone
+    counts) and the rewards are those of TicTacToeEnv from the agent's
+    point of view: +100 win, -100 loss, 10 draw, -20 and end of episode
+    for an occupied cell, the strategic reward after the agent's other
+    moves.
+    """
+
+    def __init__(self, n_envs, pool, sides=(1, 2), seed=0):
+        self.pool = pool
+        self.sides = np.array(sides, dtype=np.int8)
+        self.rng = np.random.default_rng(seed)
+        self.side = np.full(n_envs, 2, dtype=np.int8)
+        self.opponent = np.zeros(n_envs, dtype=np.intp)
+        super().__init__(n_envs)
+
+    def _new_episodes(self, mask):
+        """Reset the games of mask, draw their side and opponent, let the opponent open"""
+        count = int(mask.sum())
+        self.games.reset(mask)
+        self.side[mask] = self.rng.choice(self.sides, count)
+        self.opponent[mask] = self.rng.integers(len(self.pool), size=count)
+        self._opponent_moves(mask & (self.side == 2))
+
+    def _opponent_moves(self, mask):
+        """One opponent move in every game of mask, batched per pool member"""
+        actions = np.full(self.num_envs, -1)
+        boards = self.games.boards
+        for member in np.unique(self.opponent[mask]):
+            index = np.flatnonzero(mask & (self.opponent == member))
+            actions[index] = self.pool.agents[member].predict_batch(
+                boards[index].astype(np.float32), boards[index] == 0)
+        return self.games.step(actions)
+
+    def reset(self):
+        self._new_episodes(np.ones(self.num_envs, dtype=bool))
+        self._reset_seeds()
+        self._reset_options()
+        return self.games.boards.astype(np.int32)
+
+    def step_wait(self):
+        valid, winner, done = self.games.step(self._actions)
+        boards = self.games.boards
+        # Récompense stratégique vue du camp de l'agent (TicTacToeEnv compte pour O)
+        own_view = np.where((self.side[:, None] == 1) & (boards > 0), 3 - boards, boards)
+        rewards = np.where(done, np.where(winner == self.side, 100., 10.), strategic_rewards(own_view))
+        rewards[~valid] = -20
+
+        _, opponent_winner, opponent_done = self._opponent_moves(valid & ~done)
+        rewards[opponent_done] = np.where(opponent_winner[opponent_done] != 0, -100., 10.)
+        dones = done | opponent_done | ~valid
+
+        obs = self.games.boards.astype(np.int32)
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = obs[i].copy()
+            if not valid[i]:
+                infos[i]["invalid_move"] = True
+        if dones.any():
+            self._new_episodes(dones)
+            obs[dones] = self.games.boards[dones]
+        return obs, rewards.astype(np.float32), dones, infos
+
+
+# === CALLBACK ===
+class LeagueCallback(BaseCallback):
+    """Freeze the policy into the pool every snapshot_interval steps and report its results.
+
+    history holds (num_timesteps, evaluate() report) taken just before
+    each snapshot, so the new policy is measured against the older ones.
+    """
+
+    def __init__(self, pool, snapshot_interval=20000, eval_games=200, verbose=1):
+        super().__init__(verbose)
+        self.pool = pool
+        self.snapshot_interval = snapshot_interval
+        self.eval_games = eval_games
+        self.history = []
+        self._last_snapshot = 0
+
+    def _snapshot(self):
+        agent = NumpyPolicyAgent(policy_weights(self.model.policy))
+        report = evaluate(agent, self.pool, self.eval_games)
+        self.history.append((self.num_timesteps, report))
+        if self.verbose:
+            print(f"Ligue, {self.num_timesteps} steps (victoires/nuls/défaites) :")
+            for name, rates in report.items():
+                print(f"  {name:<12} {rates['win']:.2f} / {rates['draw']:.2f} / {rates['loss']:.2f}")
+        self.pool.add_snapshot(f'pi@{self.num_timesteps}', agent)
+        self._last_snapshot = self.num_timesteps
+
+    def _on_training_start(self):
+        if not self.pool.snapshot_slots:
+            self._snapshot()
+
+    def _on_rollout_end(self):
+        if self.num_timesteps - self._last_snapshot >= self.snapshot_interval:
+            self._snapshot()
+
+    def _on_step(self):
+        return True
@@ -0,0 +1,219 @@
+"""Headless load generator for server.py.
+
+Opens many concurrent connections with the binary (or JSON) protocol, lets
+the server pair them into games and plays random or solver moves (random
+only on boards larger than 3x3), with an optional think time between
+moves. Reports connection setup time, move round-trip time (move sent ->
+own delta received) percentiles, throughput and error counts.
+
+    python loadgen.py --connections 5000 --duration 30 --rate 2 --strategy solver
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+from protocol import BINARY, JSON, PVP, VS_AI, client_handshake, frame, read_frame
+from server import raise_fd_limit
+from solver import Solver
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of an already sorted list, nearest rank"""
+    if not values:
+        return 0.0
+    return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+class LoadStats:
+    def __init__(self):
+        self.connect_times = []
+        self.rtts = []
+        self.moves = 0
+        self.games = 0
+        self.connected = 0
+        self.errors = Counter()
+        self.elapsed = 0.0
+
+    def report(self):
+        connect = sorted(self.connect_times)
+        rtts = sorted(self.rtts)
+        return {
+            'connections': self.connected,
+            'connect_ms': {f'p{q}': 1000 * percentile(connect, q) for q in (50, 99)},
+            'rtt_ms': {name: 1000 * percentile(rtts, q)
+                       for name, q in (('p50', 50), ('p99', 99), ('p999', 99.9))},
+            'moves': self.moves,
+            'games': self.games,
+            'moves_per_s': self.moves / self.elapsed if self.elapsed else 0.0,
+            'games_per_s': self.games / self.elapsed if self.elapsed else 0.0,
+            'errors': dict(self.errors),
+        }
+
+
+class Bot:
+    """One connection: plays games back to back until cancelled.
+
+    A move refused with INVALID_MOVE or NOT_YOUR_TURN means the local board
+    is out of sync: the bot asks for the full state and plays from it.
+    """
+
+    def __init__(self, stats, strategy, rate, mode, rng, solver):
+        self.stats = stats
+        self.strategy = strategy
+        self.think_time = 1 / rate if rate else 0.0
+        self.mode = mode
+        self.rng = rng
+        self.solver = solver
+        self.writer = None
+        self.codec = None
+        self.game_id = None
+        self.player = None
+        self.board = None
+        self.sent_at = 0.0
+
+    def send(self, message):
+        self.writer.write(frame(self.codec.encode(message)))
+
+    def requeue(self):
+        self.send({'type': 'play_ai' if self.mode == VS_AI else 'queue'})
+
+    def choose(self):
+        size = len(self.board)
+        if self.strategy == 'solver' and size == 3:
+            move = self.solver.best_move(self.board)
+            if move is not None:
+                return move
+        return self.rng.choice([(r, c) for r in range(size) for c in range(size) if self.board[r][c] == 0])
+
+    async def move(self):
+        if self.think_time:
+            # Temps de réflexion aléatoire autour de 1/rate
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+        row, col = self.choose()
+        self.send({'type': 'move', 'game_id': self.game_id, 'row': row, 'col': col})
+        self.sent_at = time.perf_counter()
+
+    async def run(self, host, port, encoding):
+        start = time.perf_counter()
+        try:
+            reader, self.writer = await asyncio.open_connection(host, port)
+            self.codec = await client_handshake(reader, self.writer, encoding, self.mode)
+        except (OSError, asyncio.IncompleteReadError):
+            self.stats.errors['CONNECT'] += 1
+            return
+        self.stats.connect_times.append(time.perf_counter() - start)
+        self.stats.connected += 1
+
+        try:
+            while True:
+                message = self.codec.decode(await read_frame(reader))
+                kind = message['type']
+                if kind == 'joined':
+                    self.game_id, self.player = message['game_id'], message['player']
+                    size = message.get('size', 3)
+                    self.board = [[0] * size for _ in range(size)]
+                    if self.player == 1:
+                        await self.move()
+                elif kind == 'delta':
+                    self.board[message['row']][message['col']] = message['player']
+                    if message['player'] == self.player:
+                        self.stats.rtts.append(time.perf_counter() - self.sent_at)
+                        self.stats.moves += 1
+                    if message['game_over']:
+                        if self.player == 1:  # Chaque partie comptée une fois
+                            self.stats.games += 1
+                        self.requeue()
+                    elif message['current_player'] == self.player:
+                        await self.move()
+                elif kind == 'state':
+                    self.board = message['board']
+                    if not message['game_over'] and message['current_player'] == self.player:
+                        await self.move()
+                elif kind == 'error':
+                    self.stats.errors[message['error']] += 1
+                    if message['error'] == 'OPPONENT_LEFT':
+                        self.requeue()
+                    elif message['error'] in ('INVALID_MOVE', 'NOT_YOUR_TURN'):
+                        # Plateau local désynchronisé : repartir de l'état du serveur
+                        self.send({'type': 'get_state', 'game_id': self.game_id})
+                else:
+                    self.stats.errors['UNEXPECTED_' + kind.upper()] += 1
+        except asyncio.IncompleteReadError:
+            self.stats.errors['DISCONNECTED'] += 1
+        except (OSError, ValueError):
+            self.stats.errors['PROTOCOL'] += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run_load(host='127.0.0.1', port=5555, connections=1000, duration=10.0, rate=0.0,
+                   strategy='random', mode=PVP, encoding=BINARY, seed=0):
+    """Run `connections` bots for `duration` seconds; returns LoadStats.
+
+    rate is the number of moves per second of each bot (0: as fast as
+    possible), strategy is 'random' or 'solver'.
+    """
+    rng = random.Random(seed)
+    solver = Solver.load() if strategy == 'solver' else None
+    stats = LoadStats()
+    bots = [Bot(stats, strategy, rate, mode, random.Random(rng.random()), solver)
+            for _ in range(connections)]
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(bot.run(host, port, encoding)) for bot in bots]
+    await asyncio.wait(tasks, timeout=duration)
+    stats.elapsed = time.perf_counter() - start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for bot in bots:
+        bot.close()
+    return stats
+
+
+def print_report(report):
+    connect = report['connect_ms']
+    print(f"Connexions : {report['connections']}  (établissement p50 {connect['p50']:.1f} ms,"
+          f" p99 {connect['p99']:.1f} ms)")
+    rtt = report['rtt_ms']
+    print(f"Coups : {report['moves']}  ({report['moves_per_s']:,.0f}/s)  parties : {report['games']}"
+          f"  ({report['games_per_s']:,.0f}/s)")
+    print(f"Aller-retour d'un coup : p50 {rtt['p50']:.2f} ms  p99 {rtt['p99']:.2f} ms"
+          f"  p999 {rtt['p999']:.2f} ms")
+    print(f"Erreurs : {report['errors'] or 'aucune'}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Générateur de charge pour server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="coups par seconde et par connexion (0 : au plus vite)")
+    parser.add_argument("--strategy", choices=("random", "solver"), default="random")
+    parser.add_argument("--ai", action="store_true", help="jouer contre l'IA du serveur")
+    parser.add_argument("--json", action="store_true", help="encodage JSON au lieu du binaire")
+    parser.add_argument("--report-json", action="store_true", help="afficher le rapport en JSON")
+    args = parser.parse_args(argv)
+
+    raise_fd_limit()
+    stats = asyncio.run(run_load(
+        args.host, args.port, args.connections, args.duration, args.rate, args.strategy,
+        VS_AI if args.ai else PVP, JSON if args.json else BINARY))
+    report = stats.report()
+    if args.report_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,49 @@
+"""PPO policy whose action distribution only covers the legal moves.
+
+The observation is the board itself, so the legal moves are its empty
+cells, the same mask as TicTacToeEnv.action_masks(). It is rebuilt from
+the observation instead of being stored in the rollout buffer (the plain
+PPO of stable_baselines3 has no mask support), so rollouts, PPO updates
+and predictions never put probability on an occupied cell.
+"""
+import torch as th
+from stable_baselines3.common.policies import ActorCriticPolicy, BaseModel
+
+# Logit of a masked action: exp() underflows to 0 without producing NaN
+MASKED_LOGIT = -1e8
+
+
+def mask_logits(logits, obs):
+    """logits with the occupied cells of obs (N, 9) set to MASKED_LOGIT"""
+    return th.where(obs == 0, logits, th.full_like(logits, MASKED_LOGIT))
+
+
+class MaskedMlpPolicy(ActorCriticPolicy):
+    """MlpPolicy with a masked categorical distribution in forward, evaluate_actions and get_distribution"""
+
+    def _latent(self, obs):
+        features = self.extract_features(obs)
+        if self.share_features_extractor:
+            return self.mlp_extractor(features)
+        pi_features, vf_features = features
+        return self.mlp_extractor.forward_actor(pi_features), self.mlp_extractor.forward_critic(vf_features)
+
+    def _masked_distribution(self, latent_pi, obs):
+        logits = mask_logits(self.action_net(latent_pi), obs.reshape(len(obs), -1))
+        return self.action_dist.proba_distribution(action_logits=logits)
+
+    def forward(self, obs, deterministic=False):
+        latent_pi, latent_vf = self._latent(obs)
+        distribution = self._masked_distribution(latent_pi, obs)
+        actions = distribution.get_actions(deterministic=deterministic)
+        log_prob = distribution.log_prob(actions)
+        return actions.reshape((-1, *self.action_space.shape)), self.value_net(latent_vf), log_prob
+
+    def evaluate_actions(self, obs, actions):
+        latent_pi, latent_vf = self._latent(obs)
+        distribution = self._masked_distribution(latent_pi, obs)
+        return self.value_net(latent_vf), distribution.log_prob(actions), distribution.entropy()
+
+    def get_distribution(self, obs):
+        features = BaseModel.extract_features(self, obs, self.pi_features_extractor)
+        return self._masked_distribution(self.mlp_extractor.forward_actor(features), obs)
@@ -0,0 +1,321 @@
+"""Monte Carlo Tree Search agent for boards of any size.
+
+DRLAgent and the solver only know 3x3; MCTSAgent plays any make_game()
+board with the same predict(board, valid_moves) interface. Each move runs
+playouts until a time budget (seconds) or a playout budget is spent:
+select a leaf with UCB1 (PUCT when an evaluator gives priors), expand it,
+evaluate it with a uniformly random game to the end (or the critic value)
+and back the result up the path.
+
+The tree is a structure of arrays (array module), one slot per node, the
+children of a node being contiguous slots: no Python object per node.
+Between two predict calls the subtree of the new position (our move, then
+the opponent's) is kept and compacted to the front of fresh arrays, so
+its visits carry over to the next search.
+
+PolicyPriors wraps NumpyPolicyAgent (the exported PPO policy, 3x3 only):
+the leaves selected for a batch of playouts are evaluated in one call and
+their move probabilities become the PUCT priors.
+"""
+import math
+import random
+import time
+from array import array
+from itertools import zip_longest
+
+import numpy as np
+
+from engine import make_game
+
+NO_CHILD = -1
+
+
+class PolicyPriors:
+    """Batched evaluator from an agent with action_probs(boards) and values(boards).
+
+    Returns (priors, values) for boards (N, cells) and the players to move.
+    values is None unless use_value=True; it is then the critic value for
+    the player to move squashed to [-1, 1] (the PPO env rewards a win of O
+    with +100, so the raw value is scaled by 1/100 and negated for X).
+    """
+
+    def __init__(self, agent, use_value=False):
+        self.agent = agent
+        self.use_value = use_value
+
+    def __call__(self, boards, players):
+        boards = np.asarray(boards, dtype=np.float32)
+        priors = self.agent.action_probs(boards)
+        if not self.use_value:
+            return priors, None
+        values = np.tanh(self.agent.values(boards) / 100)
+        return priors, np.where(np.asarray(players) == 2, values, -values)
+
+
+class RandomAgent:
+    """Uniformly random legal move, baseline for MCTSAgent"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def predict(self, board, valid_moves):
+        return self.rng.choice(valid_moves)
+
+
+class MCTSAgent:
+    """MCTS player with the predict(board, valid_moves) interface of DRLAgent.
+
+    The search of one move stops after `playouts` playouts or
+    `time_budget` seconds, whichever comes first (at least one playout).
+    win_length is that of make_game() for the size of the boards given to
+    predict. With an evaluator (PolicyPriors) selection uses PUCT and
+    batch_size leaves are evaluated per call, virtual losses spreading a
+    batch over different paths. After each predict, last_playouts,
+    last_seconds and reused_visits (visits of the subtree kept from the
+    previous move) describe the search.
+    """
+
+    def __init__(self, playouts=1000, time_budget=None, win_length=None, evaluator=None,
+                 batch_size=16, exploration=None, seed=0):
+        if playouts is None and time_budget is None:
+            raise ValueError("Il faut un budget de simulations ou de temps")
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.win_length = win_length
+        self.evaluator = evaluator
+        self.batch_size = batch_size if evaluator is not None else 1
+        if exploration is None:
+            exploration = 2.0 if evaluator is not None else 1.4
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.last_playouts = 0
+        self.last_seconds = 0.0
+        self.reused_visits = 0
+        self._root_cells = None
+        self._root_player = None
+        self._new_tree()
+
+    # === ARBRE ===
+    def _new_tree(self):
+        """Empty tree with only the root (slot 0)"""
+        self.move = array('H', [0])        # case jouée pour arriver au nœud
+        self.first_child = array('i', [NO_CHILD])
+        self.n_children = array('H', [0])
+        self.visits = array('i', [0])
+        self.value = array('d', [0.0])     # somme des résultats pour le joueur qui a joué move
+        self.prior = array('f', [1.0])
+
+    def __len__(self):
+        return len(self.move)
+
+    def _expand(self, node, cells, priors=None):
+        cells = list(cells)
+        count = len(cells)
+        if priors is None:
+            # Ordre aléatoire : UCB1 visite d'abord les enfants jamais visités, dans l'ordre des cases
+            self.rng.shuffle(cells)
+            node_priors = [1.0 / count] * count
+        else:
+            node_priors = [float(priors[cell]) for cell in cells]
+            total = sum(node_priors) or 1.0
+            node_priors = [p / total for p in node_priors]
+        self.first_child[node] = len(self.move)
+        self.n_children[node] = count
+        self.move.extend(cells)
+        self.first_child.extend(array('i', [NO_CHILD]) * count)
+        self.n_children.extend(array('H', [0]) * count)
+        self.visits.extend(array('i', [0]) * count)
+        self.value.extend(array('d', [0.0]) * count)
+        self.prior.extend(node_priors)
+
+    def _compact(self, root):
+        """Keep only the subtree of root, renumbered breadth-first from slot 0"""
+        move, first_child, n_children = self.move, self.first_child, self.n_children
+        order = [root]
+        new_first = []
+        # order grandit pendant la boucle : chaque nœud ajoute ses enfants, contigus, à la fin
+        for node in order:
+            first = first_child[node]
+            if first == NO_CHILD:
+                new_first.append(NO_CHILD)
+            else:
+                new_first.append(len(order))
+                order.extend(range(first, first + n_children[node]))
+        self.move = array('H', [move[node] for node in order])
+        self.first_child = array('i', new_first)
+        self.n_children = array('H', [n_children[node] for node in order])
+        self.visits = array('i', [self.visits[node] for node in order])
+        self.value = array('d', [self.value[node] for node in order])
+        self.prior = array('f', [self.prior[node] for node in order])
+
+    def _reroot(self, cells, player):
+        """Move the root to the position cells, keeping its subtree when it follows from the old root"""
+        old, old_player = self._root_cells, self._root_player
+        self._root_cells, self._root_player = cells, player
+        node = NO_CHILD
+        if old is not None and len(old) == len(cells) and all(a == b or a == 0 for a, b in zip(old, cells)):
+            new_stones = {cell for cell, (a, b) in enumerate(zip(old, cells)) if a != b}
+            node, mover = 0, old_player
+            while new_stones and node != NO_CHILD:
+                first = self.first_child[node]
+                if first == NO_CHILD:
+                    node = NO_CHILD
+                    break
+                # Les coups peuvent avoir été joués dans un autre ordre : le plus visité des enfants possibles
+                children = [child for child in range(first, first + self.n_children[node])
+                            if self.move[child] in new_stones and cells[self.move[child]] == mover]
+                node = max(children, key=self.visits.__getitem__, default=NO_CHILD)
+                if node != NO_CHILD:
+                    new_stones.discard(self.move[node])
+                mover = 3 - mover
+        if node == NO_CHILD:
+            self._new_tree()
+        elif node != 0:
+            self._compact(node)
+        self.reused_visits = self.visits[0]
+
+    # === RECHERCHE ===
+    def _select(self, root_game):
+        """(path of nodes, player who moved into each, game at the leaf) for one playout"""
+        game = root_game.copy()
+        move, first_child, n_children = self.move, self.first_child, self.n_children
+        visits, value, prior = self.visits, self.value, self.prior
+        c = self.exploration
+        node = 0
+        path = [0]
+        movers = [3 - game.current_player]
+        while first_child[node] != NO_CHILD and not game.game_over:
+            first = first_child[node]
+            best, best_score = first, -math.inf
+            if self.evaluator is None:
+                log_n = math.log(visits[node] or 1)
+                for child in range(first, first + n_children[node]):
+                    n = visits[child]
+                    if n == 0:
+                        best = child
+                        break
+                    score = value[child] / n + c * math.sqrt(log_n / n)
+                    if score > best_score:
+                        best, best_score = child, score
+            else:
+                sqrt_n = math.sqrt(visits[node])
+                for child in range(first, first + n_children[node]):
+                    n = visits[child]
+                    score = (value[child] / n if n else 0.0) + c * prior[child] * sqrt_n / (1 + n)
+                    if score > best_score:
+                        best, best_score = child, score
+            movers.append(game.current_player)
+            game.play(move[best])
+            node = best
+            path.append(node)
+        return path, movers, game
+
+    def _rollout(self, game):
+        """Winner of a uniformly random game from game (played in place), 0 for a draw"""
+        rand = self.rng.random
+        while not game.game_over:
+            free = game.free_cells
+            game.play(free[int(rand() * len(free))])
+        return game.winner or 0
+
+    def _backup(self, path, movers, x_value):
+        """Add one visit and the result (x_value: +1 X wins, -1 O wins) along path"""
+        visits, value = self.visits, self.value
+        for node, mover in zip(path, movers):
+            visits[node] += 1
+            value[node] += x_value if mover == 1 else -x_value
+
+    def _virtual_loss(self, path, sign):
+        for node in path:
+            self.visits[node] += sign
+            self.value[node] -= sign
+
+    def _batch(self, root_game, n):
+        """Run up to n playouts, evaluating their leaves in one evaluator call; returns the count"""
+        pending = []
+        leaves = set()
+        done = 0
+        for _ in range(n):
+            path, movers, game = self._select(root_game)
+            leaf = path[-1]
+            if game.game_over:
+                self._backup(path, movers, WINNER_VALUE[game.winner or 0])
+                done += 1
+            elif self.evaluator is None:
+                self._expand(leaf, game.free_cells)
+                self._backup(path, movers, WINNER_VALUE[self._rollout(game)])
+                done += 1
+            elif leaf in leaves:
+                break
+            else:
+                leaves.add(leaf)
+                self._virtual_loss(path, 1)
+                pending.append((path, movers, game))
+        if pending:
+            boards = [[cell for row in game.board for cell in row] for _, _, game in pending]
+            players = [game.current_player for _, _, game in pending]
+            priors, values = self.evaluator(boards, players)
+            for i, (path, movers, game) in enumerate(pending):
+                self._virtual_loss(path, -1)
+                self._expand(path[-1], game.free_cells, priors[i])
+                if values is None:
+                    x_value = WINNER_VALUE[self._rollout(game)]
+                else:
+                    x_value = float(values[i]) if players[i] == 1 else -float(values[i])
+                self._backup(path, movers, x_value)
+        return done + len(pending)
+
+    def search(self, game):
+        """Playouts from game within the budgets; returns their number"""
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else math.inf
+        limit = self.playouts if self.playouts is not None else math.inf
+        done = 0
+        while done < limit and (done == 0 or time.perf_counter() < deadline):
+            done += self._batch(game, min(self.batch_size, limit - done))
+        self.last_playouts = done
+        self.last_seconds = time.perf_counter() - start
+        return done
+
+    # === INTERFACE AGENT ===
+    def _game(self, board):
+        """Engine in the position of board, X having played first"""
+        size = len(board)
+        cells = [cell for row in board for cell in row]
+        game = make_game(size, self.win_length)
+        xs = [cell for cell, player in enumerate(cells) if player == 1]
+        os_ = [cell for cell, player in enumerate(cells) if player == 2]
+        for x, o in zip_longest(xs, os_):
+            if x is not None:
+                game.play(x)
+            if o is not None:
+                game.play(o)
+        return game, cells
+
+    def predict(self, board, valid_moves):
+        game, cells = self._game(board)
+        self._reroot(cells, game.current_player)
+        self.search(game)
+        size = len(board)
+        valid = {row * size + col for row, col in valid_moves}
+        first = self.first_child[0]
+        children = [child for child in range(first, first + self.n_children[0]) if self.move[child] in valid]
+        if not children:
+            return valid_moves[0]
+        best = max(children, key=self.visits.__getitem__)
+        return divmod(self.move[best], size)
+
+
+# Résultat d'une partie vu de X, indexé par le gagnant (0 : nul)
+WINNER_VALUE = (0.0, 1.0, -1.0)
+
+
+def play_game(x_agent, o_agent, size=3, win_length=None):
+    """Winner (0 for a draw) of one game between two predict(board, valid_moves) agents"""
+    game = make_game(size, win_length)
+    agents = {1: x_agent, 2: o_agent}
+    while not game.game_over:
+        row, col = agents[game.current_player].predict(game.board, game.get_valid_moves())
+        if not game.make_move(row, col):
+            raise ValueError(f"Coup invalide {(row, col)}")
+    return game.winner or 0
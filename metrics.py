@@ -0,0 +1,160 @@
+"""In-process metrics: counters, gauges and latency histograms.
+
+Recording is a few attribute updates (a bisect for histograms), cheap
+enough to leave on under load; the Prometheus text format is only built
+when render() is called, e.g. by the HTTP endpoint of start_http_endpoint.
+Gauges and counters can also be read from a callback at render time, so
+values the server already tracks (connections, live games) cost nothing.
+"""
+import asyncio
+from bisect import bisect_left
+
+# Secondes, de 10 µs à 2,5 s
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Le dernier compte les valeurs > bounds[-1]
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (0-1)"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metric:
+    """A named metric and its children, one per tuple of label values"""
+
+    def __init__(self, kind, name, help, labelnames, factory, fn):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.factory = factory
+        self.fn = fn
+        self.children = {}
+        if not labelnames and fn is None:
+            self.children[()] = factory()
+
+    def labels(self, *values):
+        """Child for these label values (no values for a metric without labels).
+
+        Keep the child of hot paths in a variable to skip the dict lookup.
+        """
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+    def samples(self):
+        """(suffix, labels dict, value) for the text format"""
+        if self.fn is not None:
+            yield '', {}, self.fn()
+            return
+        for values, child in self.children.items():
+            labels = dict(zip(self.labelnames, values))
+            if self.kind != 'histogram':
+                yield '', labels, child.value
+                continue
+            cumulative = 0
+            for bound, count in zip(child.bounds + (float('inf'),), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield '_bucket', dict(labels, le=le), cumulative
+            yield '_sum', labels, child.sum
+            yield '_count', labels, child.count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, kind, name, help, labelnames, factory, fn=None):
+        if name in self.metrics:
+            raise ValueError(f"Métrique déjà déclarée : {name}")
+        metric = self.metrics[name] = Metric(kind, name, help, tuple(labelnames), factory, fn)
+        return metric
+
+    def counter(self, name, help, labelnames=(), fn=None):
+        return self._add('counter', name, help, labelnames, Counter, fn)
+
+    def gauge(self, name, help, labelnames=(), fn=None):
+        return self._add('gauge', name, help, labelnames, Gauge, fn)
+
+    def histogram(self, name, help, labelnames=(), bounds=LATENCY_BUCKETS):
+        return self._add('histogram', name, help, labelnames, lambda: Histogram(bounds))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                if labels:
+                    text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+                    lines.append(f"{metric.name}{suffix}{{{text}}} {value}")
+                else:
+                    lines.append(f"{metric.name}{suffix} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+async def start_http_endpoint(registry, host='127.0.0.1', port=9100):
+    """Serve registry.render() over HTTP (any path) on an asyncio server"""
+    async def scrape(reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            body = registry.render().encode()
+            writer.write(b'HTTP/1.0 200 OK\r\n'
+                         b'Content-Type: text/plain; version=0.0.4\r\n'
+                         b'Content-Length: %d\r\n\r\n' % len(body) + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(scrape, host, port)
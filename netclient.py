@@ -0,0 +1,216 @@
+"""Network side of the online mode of client.py, without pygame.
+
+NetworkClient owns the server connection: a background thread runs an
+asyncio loop that reads the frames, decodes them and puts the messages in
+a queue.Queue, then calls on_message() so the GUI can wake its render loop
+(blocked in pygame.event.wait()). The GUI never touches the socket; send()
+hands the encoded frame to the network loop with call_soon_threadsafe.
+
+OnlineGame is the client-side state of a game with optimistic moves: a
+local move is played at once on a predicted engine and kept as pending
+until the server's delta confirms it. The engine is the confirmed moves
+(server deltas, in order) followed by the pending ones; when the server
+rejects a move or plays something else than predicted, the engine is
+rebuilt from the confirmed moves, which takes the rejected move off the
+screen. The display never waits for a round trip.
+"""
+import asyncio
+import queue
+import threading
+import time
+
+from engine import make_game
+from protocol import BINARY, PVP, client_handshake, frame, read_frame
+
+# Erreurs du serveur qui annulent notre plus ancien coup en attente
+REJECTIONS = ('INVALID_MOVE', 'NOT_YOUR_TURN', 'NO_GAME')
+
+
+class NetworkClient:
+    """Server connection owned by a background thread.
+
+    start() connects and completes the handshake (raises OSError or
+    ConnectionError on failure). Decoded messages are put in `messages`;
+    when the connection ends a {'type': 'disconnected'} message (local only,
+    not part of the protocol) is queued last.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5555, mode=PVP, encoding=BINARY, on_message=None):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.encoding = encoding
+        self.on_message = on_message
+        self.messages = queue.Queue()
+        self.codec = None
+        self.error = None
+        self._loop = None
+        self._writer = None
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="network", daemon=True)
+
+    def start(self, timeout=5.0):
+        self.thread.start()
+        if not self._ready.wait(timeout):
+            raise ConnectionError(f"Pas de réponse de {self.host}:{self.port}")
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self.codec = await client_handshake(reader, self._writer, self.encoding, self.mode)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            self.error = e if isinstance(e, (OSError, ConnectionError)) else ConnectionError(e)
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            while True:
+                self._deliver(self.codec.decode(await read_frame(reader)))
+        except (asyncio.IncompleteReadError, OSError, ValueError):
+            pass  # Déconnexion ou message illisible : fin de la session
+        finally:
+            self._writer.close()
+            self._deliver({'type': 'disconnected'})
+
+    def _deliver(self, message):
+        self.messages.put(message)
+        if self.on_message is not None:
+            self.on_message()
+
+    def send(self, message):
+        """Queue message for the server (callable from any thread)"""
+        data = frame(self.codec.encode(message))
+        try:
+            self._loop.call_soon_threadsafe(self._writer.write, data)
+        except RuntimeError:
+            pass  # Boucle réseau déjà arrêtée : le message 'disconnected' est en file
+
+    def poll(self):
+        """Messages received since the last poll, without blocking"""
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        if self._writer is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._writer.close)
+            except RuntimeError:
+                pass
+        self.thread.join(timeout=2)
+
+
+class OnlineGame:
+    """Predicted game of an online session, read by the GUI like an engine.
+
+    handle(message) applies a server message; play(row, col) plays a local
+    move at once and returns the 'move' message to send (None if the move
+    is not ours to play). ack_seconds holds the round trip of each
+    confirmed move, rollbacks counts the rebuilds after a rejection or a
+    misprediction.
+    """
+
+    def __init__(self):
+        self.game_id = None
+        self.player = None
+        self.size = 3
+        self.win_length = None
+        self.game = make_game()
+        self.confirmed = []
+        self.pending = []  # (row, col, heure d'envoi)
+        self.opponent_left = False
+        self.disconnected = False
+        self.rollbacks = 0
+        self.ack_seconds = []
+
+    # Interface moteur lue par l'interface graphique
+    @property
+    def board(self):
+        return self.game.board
+
+    @property
+    def current_player(self):
+        return self.game.current_player
+
+    @property
+    def winner(self):
+        return self.game.winner
+
+    @property
+    def winning_line(self):
+        return self.game.winning_line
+
+    @property
+    def game_over(self):
+        return self.game.game_over or self.opponent_left or self.disconnected
+
+    @property
+    def joined(self):
+        return self.game_id is not None
+
+    def leave(self):
+        """Forget the finished game while waiting for the next 'joined'"""
+        self.game_id = None
+        self.pending = []
+        self.opponent_left = False
+
+    def play(self, row, col):
+        if not self.joined or self.game_over or self.game.current_player != self.player:
+            return None
+        if not self.game.make_move(row, col):
+            return None
+        self.pending.append((row, col, time.perf_counter()))
+        return {'type': 'move', 'game_id': self.game_id, 'row': row, 'col': col}
+
+    def _rebuild(self):
+        """Engine = confirmed moves then the pending ones still legal"""
+        self.rollbacks += 1
+        self.game = make_game(self.size, self.win_length)
+        for row, col in self.confirmed:
+            self.game.make_move(row, col)
+        kept = []
+        for move in self.pending:
+            if self.game.current_player != self.player or not self.game.make_move(*move[:2]):
+                break
+            kept.append(move)
+        self.pending = kept
+
+    def handle(self, message):
+        kind = message['type']
+        if kind == 'joined':
+            self.game_id, self.player = message['game_id'], message['player']
+            self.size, self.win_length = message.get('size', 3), message.get('win_length')
+            self.game = make_game(self.size, self.win_length)
+            self.confirmed, self.pending = [], []
+            self.opponent_left = False
+        elif kind == 'delta' and message['game_id'] == self.game_id:
+            move = (message['row'], message['col'])
+            self.confirmed.append(move)
+            if self.pending and message['player'] == self.player and self.pending[0][:2] == move:
+                # Coup prédit confirmé : l'écran est déjà à jour
+                self.ack_seconds.append(time.perf_counter() - self.pending.pop(0)[2])
+            elif self.pending:
+                self._rebuild()
+            else:
+                self.game.make_move(*move)
+            if not self.pending and (message['game_over'], message['winner']) != (self.game.game_over,
+                                                                                  self.game.winner):
+                self._rebuild()
+        elif kind == 'error':
+            if message['error'] in REJECTIONS and self.pending:
+                self.pending.pop(0)
+                self._rebuild()
+            elif message['error'] == 'OPPONENT_LEFT':
+                self.opponent_left = True
+        elif kind == 'disconnected':
+            self.disconnected = True
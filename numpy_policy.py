@@ -0,0 +1,107 @@
+"""Torch-free inference for the trained PPO policy.
+
+``export_policy`` (needs stable_baselines3, imported lazily) writes the
+MLP weights of a saved PPO model to a plain .npz file; ``NumpyPolicyAgent``
+loads that file and runs the network with NumPy only.
+"""
+import os
+
+import numpy as np
+
+POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe_policy.npz")
+
+# Logit of an occupied cell, same as masked_policy.MASKED_LOGIT (no torch import here)
+MASKED_LOGIT = -1e8
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0),
+}
+
+
+def export_policy(model_path="tictactoe_ppo", out_path=POLICY_PATH):
+    """Write the policy and value MLPs of a saved PPO model to out_path"""
+    from stable_baselines3 import PPO
+
+    policy = PPO.load(model_path, device="cpu").policy
+    return export_policy_weights(policy, out_path)
+
+
+def policy_weights(policy):
+    """Weights of an SB3 ActorCriticPolicy as a dict of NumPy arrays"""
+    import torch.nn as nn
+
+    weights = {'activation': np.array(policy.activation_fn.__name__.lower())}
+    for prefix, hidden, head in (('pi', policy.mlp_extractor.policy_net, policy.action_net),
+                                 ('vf', policy.mlp_extractor.value_net, policy.value_net)):
+        layers = [layer for layer in hidden if isinstance(layer, nn.Linear)] + [head]
+        for i, layer in enumerate(layers):
+            weights[f'{prefix}_w{i}'] = layer.weight.detach().cpu().numpy().T.copy()
+            weights[f'{prefix}_b{i}'] = layer.bias.detach().cpu().numpy().copy()
+    return weights
+
+
+def export_policy_weights(policy, out_path=POLICY_PATH):
+    np.savez(out_path, **policy_weights(policy))
+    return out_path
+
+
+class NumpyPolicyAgent:
+    """PPO policy evaluated with NumPy, same predict(board, valid_moves) as DRLAgent.
+
+    Accepts either the path of an exported .npz file or the dict returned
+    by policy_weights.
+    """
+
+    def __init__(self, path=POLICY_PATH):
+        weights = np.load(path) if isinstance(path, str) else path
+        self.activation = ACTIVATIONS[str(weights['activation'])]
+        self.pi_layers = self._layers(weights, 'pi')
+        self.vf_layers = self._layers(weights, 'vf')
+
+    @staticmethod
+    def _layers(weights, prefix):
+        layers = []
+        while f'{prefix}_w{len(layers)}' in weights:
+            i = len(layers)
+            layers.append((np.asarray(weights[f'{prefix}_w{i}'], dtype=np.float32),
+                           np.asarray(weights[f'{prefix}_b{i}'], dtype=np.float32)))
+        return layers
+
+    def _mlp(self, layers, obs):
+        x = np.asarray(obs, dtype=np.float32)
+        for w, b in layers[:-1]:
+            x = self.activation(x @ w + b)
+        w, b = layers[-1]
+        return x @ w + b
+
+    def logits(self, boards):
+        """Action logits for one board (9,) or a batch (N, 9)"""
+        return self._mlp(self.pi_layers, boards)
+
+    def action_probs(self, boards):
+        """Probabilities over the empty cells, as DRLAgent and MaskedMlpPolicy"""
+        logits = np.where(np.asarray(boards) == 0, self.logits(boards), MASKED_LOGIT)
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def values(self, boards):
+        """Critic value for one board or a batch"""
+        return self._mlp(self.vf_layers, boards)[..., 0]
+
+    def predict_batch(self, boards, masks):
+        """Most probable legal cell for each row of boards (N, 9) given bool masks (N, 9)"""
+        logits = np.where(masks, self.logits(boards), -np.inf)
+        return logits.argmax(axis=-1)
+
+    def predict(self, board, valid_moves):
+        flat_board = np.array(board).flatten()
+        logits = self.logits(flat_board)
+        valid_actions = [r * 3 + c for (r, c) in valid_moves]
+        best_action = valid_actions[np.argmax(logits[valid_actions])]
+        return divmod(int(best_action), 3)
+
+
+if __name__ == "__main__":
+    print(f"Politique exportée dans {export_policy()}")
@@ -0,0 +1,105 @@
+"""Supervised pretraining of the PPO policy before fine-tuning with PPO.learn.
+
+The datasets are (board, move) pairs: every solver-optimal move of every
+reachable position, or the moves of logged games (gamelog.py). The env
+rewards O's result for every stone, so by default only the positions with
+O to move are kept, the side the agent plays in the GUI and the server.
+pretrain_policy fits the MlpPolicy actor on minibatches with a
+cross-entropy loss; the value network is left to PPO.
+"""
+import os
+
+import numpy as np
+
+from solver import Solver, decode, player_to_move, reachable_codes, winner
+
+
+def solver_dataset(solver=None, player=2):
+    """(boards (N, 9) int8, actions (N,)), one row per optimal move; player=None keeps both sides"""
+    solver = solver or Solver.load()
+    boards, actions = [], []
+    for code in reachable_codes():
+        cells = decode(code)
+        if winner(cells) or 0 not in cells:
+            continue
+        if player is not None and player_to_move(cells) != player:
+            continue
+        board = [cells[i:i + 3] for i in range(0, 9, 3)]
+        for cell in range(9):
+            if cells[cell] == 0 and solver.is_optimal(board, divmod(cell, 3)):
+                boards.append(cells)
+                actions.append(cell)
+    return np.array(boards, dtype=np.int8), np.array(actions, dtype=np.int64)
+
+
+def game_log_dataset(directory, player=2, winners_only=True):
+    """(boards, actions) replayed from a game log directory.
+
+    With winners_only, only the moves of the side that won (both sides of
+    a draw) are kept. Raises ValueError if the directory is missing or no
+    move is kept.
+    """
+    from gamelog import GameLogReader
+
+    if not os.path.isdir(directory):
+        raise ValueError(f"Répertoire de parties introuvable : {directory}")
+    reader = GameLogReader(directory)
+    boards, actions = [], []
+    for segment in reader.segments:
+        moves = reader.moves(segment)
+        results = np.asarray(segment['result'])
+        board = np.zeros((len(moves), 9), dtype=np.int8)
+        rows = np.arange(len(moves))
+        for t in range(9):
+            mover = 1 if t % 2 == 0 else 2
+            played = moves[:, t] >= 0
+            keep = played.copy()
+            if player is not None:
+                keep &= mover == player
+            if winners_only:
+                keep &= (results == mover) | (results == 0)
+            boards.append(board[keep].copy())
+            actions.append(moves[keep, t].astype(np.int64))
+            board[rows[played], moves[played, t]] = mover
+    if not sum(map(len, actions)):
+        raise ValueError(f"Aucun coup à apprendre dans {directory}")
+    return np.concatenate(boards), np.concatenate(actions)
+
+
+def pretrain_policy(policy, boards, actions, epochs=100, batch_size=256, learning_rate=3e-3, seed=0):
+    """Fit the policy's action distribution to (boards, actions); returns the mean loss per epoch"""
+    import torch
+
+    if not len(boards):
+        raise ValueError("Jeu de données vide")
+    obs = torch.as_tensor(boards, dtype=torch.float32, device=policy.device)
+    targets = torch.as_tensor(actions, dtype=torch.int64, device=policy.device)
+    # Seul l'acteur est ajusté, le réseau de valeur est laissé à PPO
+    actor = [param for name, param in policy.named_parameters()
+             if not name.startswith(('value_net', 'mlp_extractor.value_net'))]
+    optimizer = torch.optim.Adam(actor, lr=learning_rate)
+    generator = torch.Generator().manual_seed(seed)
+
+    policy.set_training_mode(True)
+    losses = []
+    for _ in range(epochs):
+        order = torch.randperm(len(obs), generator=generator).to(policy.device)
+        total = 0.0
+        for start in range(0, len(obs), batch_size):
+            batch = order[start:start + batch_size]
+            log_probs = policy.get_distribution(obs[batch]).log_prob(targets[batch])
+            loss = -log_probs.mean()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(batch)
+        losses.append(total / len(obs))
+    policy.set_training_mode(False)
+    return losses
+
+
+def win_rate_vs_random(agent, n_games=2000, player=2, seed=0):
+    """Win/draw/loss rates of agent.predict_batch playing `player` against uniform random moves"""
+    from league import RandomOpponent, play_match
+
+    return play_match(agent, RandomOpponent(seed), n_games, player)
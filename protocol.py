@@ -0,0 +1,279 @@
+"""Wire protocol between the server and the clients.
+
+Every message travels in a frame: a 2-byte big-endian payload length
+followed by the payload, so messages survive TCP coalescing and splitting.
+The payload is encoded by the codec negotiated during the handshake:
+
+    client -> HELLO(version, preferred encoding, mode)    always binary
+    server -> WELCOME(version, chosen encoding)           always binary
+    then every message uses the chosen codec (BINARY, or JSON as fallback)
+
+Messages are dicts with a 'type' key. In the binary codec the first payload
+byte is the type and the other fields are packed with struct; the board is
+sent as its size followed by 2 bits per cell. After a move the server sends
+a 'delta' (the move and the new game status) instead of the whole board.
+
+Boards from 3x3 to MAX_BOARD_SIZE x MAX_BOARD_SIZE are supported (the
+largest whose full 'state' still fits in a JSON frame): 'joined' may end with
+the board size and winning length (no 'size' field: 3x3, 3 in a row), and a
+winning line that is not one of the 8 named 3x3 lines travels as its end
+cells, line byte EXTENDED_LINE followed by 4 bytes at the end of the
+payload.
+
+The HELLO mode picks the first game: PVP queues the client for a human
+opponent, VS_AI starts a game against the server's AI, which plays O.
+After a game, 'queue' and 'play_ai' ask for a new one of either kind.
+"""
+import json
+import struct
+
+VERSION = 2
+BINARY = 0
+JSON = 1
+ENCODINGS = (BINARY, JSON)
+PVP = 0
+VS_AI = 1
+MODES = (PVP, VS_AI)
+
+MAX_FRAME = 0xFFFF
+# 181x181 : un 'state' JSON plein dépasse MAX_FRAME (l'octet de taille binaire irait jusqu'à 255)
+MAX_BOARD_SIZE = 180
+_LENGTH = struct.Struct('!H')
+
+ERRORS = ('INVALID_MOVE', 'NOT_YOUR_TURN', 'BAD_VERSION', 'BAD_MESSAGE', 'NO_GAME', 'OPPONENT_LEFT',
+          'UNSUPPORTED')
+NO_CELL = 0xFF
+
+WINNING_LINES = ([('row', i) for i in range(3)] + [('col', i) for i in range(3)] +
+                 [('diag', 1), ('diag', 2)])
+_LINE_INDEX = {line: i + 1 for i, line in enumerate(WINNING_LINES)}
+EXTENDED_LINE = 0xFF
+_LINE_ENDS = struct.Struct('!BBBB')
+_GEOMETRY = struct.Struct('!BB')
+
+# type name -> (type byte, struct of the fields after the type byte, field names)
+MESSAGES = {
+    'hello': (1, struct.Struct('!BBB'), ('version', 'encoding', 'mode')),
+    'welcome': (2, struct.Struct('!BB'), ('version', 'encoding')),
+    'joined': (3, struct.Struct('!IB'), ('game_id', 'player')),
+    'move': (4, struct.Struct('!IBB'), ('game_id', 'row', 'col')),
+    'get_state': (5, struct.Struct('!I'), ('game_id',)),
+    'state': (6, struct.Struct('!IBBBB'), ('game_id', 'size', 'current_player', 'flags', 'line')),
+    'delta': (7, struct.Struct('!IBBBBBB'),
+              ('game_id', 'row', 'col', 'player', 'current_player', 'flags', 'line')),
+    'error': (8, struct.Struct('!IB'), ('game_id', 'error')),
+    'get_hint': (9, struct.Struct('!I'), ('game_id',)),
+    'hint': (10, struct.Struct('!IBB'), ('game_id', 'row', 'col')),
+    'queue': (11, struct.Struct('!'), ()),
+    'play_ai': (12, struct.Struct('!'), ()),
+}
+_BY_CODE = {code: (name, packer, fields) for name, (code, packer, fields) in MESSAGES.items()}
+
+
+def frame(payload):
+    if len(payload) > MAX_FRAME:
+        raise ValueError(f"Message trop long ({len(payload)} octets)")
+    return _LENGTH.pack(len(payload)) + payload
+
+
+class FrameDecoder:
+    """Incremental splitter for a byte stream: feed() returns the complete payloads"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        payloads = []
+        payload = self.pop()
+        while payload is not None:
+            payloads.append(payload)
+            payload = self.pop()
+        return payloads
+
+    def pop(self):
+        """Next complete payload, removed from the buffer, or None"""
+        if len(self.buffer) < 2:
+            return None
+        (length,) = _LENGTH.unpack_from(self.buffer)
+        if len(self.buffer) < 2 + length:
+            return None
+        payload = bytes(self.buffer[2:2 + length])
+        del self.buffer[:2 + length]
+        return payload
+
+
+async def read_frame(reader):
+    """Next payload from an asyncio StreamReader (IncompleteReadError on EOF)"""
+    (length,) = _LENGTH.unpack(await reader.readexactly(2))
+    return await reader.readexactly(length)
+
+
+def _status_fields(message):
+    """(flags, line byte, trailing bytes of an extended line)"""
+    winner = message['winner'] or 0
+    flags = int(message['game_over']) | winner << 1
+    line = message['winning_line']
+    if line is None:
+        return flags, 0, b''
+    if line in _LINE_INDEX:
+        return flags, _LINE_INDEX[line], b''
+    (r0, c0), (r1, c1) = line
+    return flags, EXTENDED_LINE, _LINE_ENDS.pack(r0, c0, r1, c1)
+
+
+def _status_dict(flags, line, tail):
+    if line == EXTENDED_LINE:
+        r0, c0, r1, c1 = _LINE_ENDS.unpack_from(tail)
+        winning_line = ((r0, c0), (r1, c1))
+    else:
+        winning_line = WINNING_LINES[line - 1] if line else None
+    return {
+        'game_over': bool(flags & 1),
+        'winner': (flags >> 1) or None,
+        'winning_line': winning_line,
+    }
+
+
+def _pack_board(board):
+    cells = [cell for row in board for cell in row]
+    packed = bytearray((len(cells) + 3) // 4)
+    for i, cell in enumerate(cells):
+        packed[i >> 2] |= cell << ((i & 3) * 2)
+    return bytes(packed)
+
+
+def _unpack_board(data, size):
+    if not 3 <= size <= MAX_BOARD_SIZE or len(data) < (size * size + 3) // 4:
+        raise ValueError("Message binaire invalide")
+    cells = [(data[i >> 2] >> ((i & 3) * 2)) & 3 for i in range(size * size)]
+    if 3 in cells:
+        raise ValueError("Message binaire invalide")
+    return [cells[r * size:(r + 1) * size] for r in range(size)]
+
+
+class BinaryCodec:
+    encoding = BINARY
+
+    @staticmethod
+    def encode(message):
+        kind = message['type']
+        code, packer, fields = MESSAGES[kind]
+        if kind == 'state':
+            flags, line, tail = _status_fields(message)
+            board = message['board']
+            return (bytes((code,)) +
+                    packer.pack(message['game_id'], len(board), message['current_player'], flags, line) +
+                    _pack_board(board) + tail)
+        if kind == 'delta':
+            flags, line, tail = _status_fields(message)
+            return bytes((code,)) + packer.pack(
+                message['game_id'], message['row'], message['col'], message['player'],
+                message['current_player'], flags, line) + tail
+        if kind == 'joined' and 'size' in message:
+            return (bytes((code,)) + packer.pack(message['game_id'], message['player']) +
+                    _GEOMETRY.pack(message['size'], message['win_length']))
+        if kind == 'error':
+            return bytes((code,)) + packer.pack(message['game_id'], ERRORS.index(message['error']) + 1)
+        if kind == 'hint' and message['row'] is None:
+            return bytes((code,)) + packer.pack(message['game_id'], NO_CELL, NO_CELL)
+        return bytes((code,)) + packer.pack(*(message[field] for field in fields))
+
+    @staticmethod
+    def decode(payload):
+        try:
+            kind, packer, fields = _BY_CODE[payload[0]]
+            values = packer.unpack_from(payload, 1)
+        except (KeyError, IndexError, struct.error):
+            raise ValueError("Message binaire invalide") from None
+        message = dict(zip(fields, values))
+        message['type'] = kind
+        # Case hors de tout plateau (sauf NO_CELL : pas d'indice) ou code d'erreur inconnu
+        if 'row' in message and max(message['row'], message['col']) >= MAX_BOARD_SIZE:
+            if not (kind == 'hint' and message['row'] == message['col'] == NO_CELL):
+                raise ValueError("Message binaire invalide")
+        if kind == 'error' and not 1 <= message['error'] <= len(ERRORS):
+            raise ValueError("Message binaire invalide")
+        rest = payload[1 + packer.size:]
+        if kind in ('state', 'delta'):
+            if kind == 'state':
+                size = message.pop('size')
+                message['board'] = _unpack_board(rest, size)
+                rest = rest[(size * size + 3) // 4:]
+            try:
+                message.update(_status_dict(message.pop('flags'), message.pop('line'), rest))
+            except (IndexError, struct.error):
+                raise ValueError("Message binaire invalide") from None
+        elif kind == 'joined' and len(rest) >= _GEOMETRY.size:
+            message['size'], message['win_length'] = _GEOMETRY.unpack_from(rest)
+            if not (3 <= message['size'] <= MAX_BOARD_SIZE and 1 <= message['win_length'] <= message['size']):
+                raise ValueError("Message binaire invalide")
+        elif kind == 'error':
+            message['error'] = ERRORS[message['error'] - 1]
+        elif kind == 'hint' and message['row'] == NO_CELL:
+            message['row'] = message['col'] = None
+        return message
+
+
+class JsonCodec:
+    encoding = JSON
+
+    @staticmethod
+    def encode(message):
+        return json.dumps(message, separators=(',', ':')).encode()
+
+    @staticmethod
+    def decode(payload):
+        try:
+            message = json.loads(payload)
+            if message['type'] not in MESSAGES:
+                raise KeyError(message['type'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Message JSON invalide") from None
+        line = message.get('winning_line')
+        if line is not None:
+            message['winning_line'] = tuple(tuple(end) if isinstance(end, list) else end for end in line)
+        return message
+
+
+CODECS = {BINARY: BinaryCodec, JSON: JsonCodec}
+
+
+def state_message(game_id, game):
+    state = game.get_state()
+    state['type'] = 'state'
+    state['game_id'] = game_id
+    return state
+
+
+def delta_message(game_id, game, row, col, player):
+    return {
+        'type': 'delta',
+        'game_id': game_id,
+        'row': row,
+        'col': col,
+        'player': player,
+        'current_player': game.current_player,
+        'game_over': game.game_over,
+        'winner': game.winner,
+        'winning_line': game.winning_line,
+    }
+
+
+def apply_delta(state, delta):
+    """Update a client-side 'state' message in place with a 'delta'"""
+    state['board'][delta['row']][delta['col']] = delta['player']
+    for field in ('current_player', 'game_over', 'winner', 'winning_line'):
+        state[field] = delta[field]
+    return state
+
+
+async def client_handshake(reader, writer, encoding=BINARY, mode=PVP):
+    """Send HELLO and wait for WELCOME; returns the codec chosen by the server"""
+    writer.write(frame(BinaryCodec.encode(
+        {'type': 'hello', 'version': VERSION, 'encoding': encoding, 'mode': mode})))
+    await writer.drain()
+    welcome = BinaryCodec.decode(await read_frame(reader))
+    if welcome['type'] != 'welcome':
+        raise ConnectionError(f"Handshake refusé : {welcome}")
+    return CODECS[welcome['encoding']]
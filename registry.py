@@ -0,0 +1,122 @@
+"""Game registry and matchmaking queue for the server.
+
+Players are opaque objects (the server passes its connection objects).
+All methods take one lock, so the registry can be shared between threads;
+every operation is O(1).
+"""
+import threading
+import time
+from collections import OrderedDict
+from engine import TicTacToe
+
+
+class GameSession:
+    """One game in progress and its two players, keyed by symbol (1 or 2).
+
+    moves lists the cells played (row * size + col) for the game log.
+    started is the wall-clock start time; clock, from time.monotonic(),
+    measures the duration even if the wall clock is set back.
+    """
+    __slots__ = ('game_id', 'game', 'players', 'moves', 'started', 'clock')
+
+    def __init__(self, game_id, game, players):
+        self.game_id = game_id
+        self.game = game
+        self.players = players
+        self.moves = []
+        self.started = time.time()
+        self.clock = time.monotonic()
+
+    def opponent(self, player):
+        first, second = self.players[1], self.players[2]
+        return second if player is first else first
+
+
+class GameRegistry:
+    def __init__(self, game_factory=TicTacToe, first_game_id=1, game_id_step=1):
+        self.game_factory = game_factory
+        self._lock = threading.Lock()
+        self._waiting = OrderedDict()  # FIFO of players waiting for an opponent
+        self._sessions = {}            # player -> GameSession
+        self.games = {}                # game_id -> GameSession
+        self._next_game_id = first_game_id
+        self._game_id_step = game_id_step  # Identifiants disjoints entre processus du cluster
+        self.created_games = 0
+        self.reclaimed_games = 0
+
+    def join(self, player):
+        """Queue player; returns the new GameSession if an opponent was waiting, else None.
+
+        As before the matchmaking queue, the player who waited plays O (2)
+        and the newcomer plays X (1) and moves first.
+        """
+        with self._lock:
+            if player in self._sessions or player in self._waiting:
+                return None
+            if not self._waiting:
+                self._waiting[player] = None
+                return None
+            opponent, _ = self._waiting.popitem(last=False)
+            return self._create(opponent, player)
+
+    def create_game(self, first, second):
+        """Start a game between two given players, bypassing the queue"""
+        with self._lock:
+            return self._create(second, first)
+
+    def _create(self, waiting, newcomer):
+        game_id = self._next_game_id
+        self._next_game_id += self._game_id_step
+        session = GameSession(game_id, self.game_factory(), {1: newcomer, 2: waiting})
+        self.games[game_id] = session
+        self._sessions[waiting] = self._sessions[newcomer] = session
+        self.created_games += 1
+        return session
+
+    def session_of(self, player):
+        return self._sessions.get(player)
+
+    def finish(self, session):
+        """Reclaim a finished game; its players can join() again"""
+        with self._lock:
+            self._reclaim(session)
+
+    def leave(self, player):
+        """Remove a disconnected player.
+
+        Returns the GameSession they abandoned (already reclaimed, so the
+        caller can notify the opponent), or None.
+        """
+        with self._lock:
+            if player in self._waiting:
+                del self._waiting[player]
+                return None
+            session = self._sessions.get(player)
+            if session is not None:
+                self._reclaim(session)
+            return session
+
+    def _reclaim(self, session):
+        if self.games.pop(session.game_id, None) is None:
+            return
+        for player in session.players.values():
+            if self._sessions.get(player) is session:
+                del self._sessions[player]
+        self.reclaimed_games += 1
+
+    @property
+    def live_games(self):
+        return len(self.games)
+
+    @property
+    def waiting_players(self):
+        return len(self._waiting)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'live_games': len(self.games),
+                'waiting_players': len(self._waiting),
+                'created_games': self.created_games,
+                'reclaimed_games': self.reclaimed_games,
+            }
@@ -0,0 +1,60 @@
+"""Event-driven rendering helpers shared by the pygame GUIs (game.py, client.py).
+
+The GUIs repaint only after an event changed something. FrameCounter.wait_events
+blocks in pygame.event.wait() while there is nothing to draw, and
+allow_events() keeps mouse motion and other cosmetic events out of the
+queue, so an idle window does not wake the process. Repaints push only their
+dirty rects with pygame.display.update(rects). FrameCounter also times each
+repaint and measures the CPU share of the process, to check that idling
+stays near 0%.
+"""
+import time
+
+import pygame
+from pygame.locals import KEYDOWN, MOUSEBUTTONDOWN, QUIT, VIDEOEXPOSE, WINDOWEXPOSED
+
+# Fenêtre découverte : tout redessiner
+EXPOSE_EVENTS = (VIDEOEXPOSE, WINDOWEXPOSED)
+GUI_EVENTS = (QUIT, MOUSEBUTTONDOWN, KEYDOWN) + EXPOSE_EVENTS
+
+
+def allow_events(events=GUI_EVENTS):
+    """Only queue the given event types (call after pygame.display.set_mode)"""
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(list(events))
+
+
+class FrameCounter:
+    """Repaint count and durations, wakeups and CPU share since creation"""
+
+    def __init__(self):
+        self.frames = 0
+        self.wakeups = 0
+        self.total_seconds = 0.0
+        self.worst_seconds = 0.0
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def wait_events(self):
+        """Block until an event arrives, then return it with the other pending events"""
+        events = [pygame.event.wait()]
+        events.extend(pygame.event.get())
+        self.wakeups += 1
+        return events
+
+    def record(self, start):
+        """Count a repaint that began at time.perf_counter() == start"""
+        seconds = time.perf_counter() - start
+        self.frames += 1
+        self.total_seconds += seconds
+        self.worst_seconds = max(self.worst_seconds, seconds)
+
+    def cpu_share(self):
+        """Process CPU time / wall time since creation"""
+        wall = time.perf_counter() - self._wall_start
+        return (time.process_time() - self._cpu_start) / wall if wall else 0.0
+
+    def report(self):
+        mean = self.total_seconds / self.frames if self.frames else 0.0
+        return (f"{self.frames} images ({mean * 1000:.2f} ms en moyenne, {self.worst_seconds * 1000:.2f} ms"
+                f" au pire), {self.wakeups} réveils, CPU {self.cpu_share():.1%}")
@@ -1,91 +1,503 @@
-import socket
-import threading
-import json
-from game import TicTacToe
+import asyncio
+import time
+from functools import partial
+from metrics import MetricsRegistry, start_http_endpoint
+from protocol import (CODECS, ENCODINGS, JSON, MAX_BOARD_SIZE, MAX_FRAME, VERSION, VS_AI, BinaryCodec,
+                      FrameDecoder, delta_message, frame, state_message)
+from engine import make_game
+from registry import GameRegistry
+from solver import Solver
 
-class TicTacToeServer:
-    def __init__(self, host='0.0.0.0', port=5555):
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind((host, port))
-        self.server.listen()
-        
-        self.games = {}
-        self.players = {}
-        self.player_count = 0
-        
-        print(f"Serveur démarré sur {host}:{port}")
-    
-    def broadcast_game_state(self, game_id):
-        game = self.games[game_id]
-        players = self.players[game_id]
-        
-        state = game.get_state()
-        state_json = json.dumps({
-            'board': state['board'].tolist(),
-            'current_player': state['current_player'],
-            'game_over': state['game_over'],
-            'winner': state['winner'],
-            'winning_line': state['winning_line']
-        })
-        
-        for player in players.values():
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def raise_fd_limit():
+    """Raise the soft limit on open files to the hard limit (one fd per player)"""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def check_geometry(board_size, win_length=None):
+    """Raise ValueError unless the protocol can carry games of this size"""
+    if not 3 <= board_size <= MAX_BOARD_SIZE:
+        raise ValueError(f"Taille de plateau {board_size} hors limites (3 à {MAX_BOARD_SIZE})")
+    if win_length is not None and not 1 <= win_length <= board_size:
+        raise ValueError(f"Longueur gagnante {win_length} impossible sur un plateau "
+                         f"{board_size}x{board_size}")
+
+
+class Player:
+    """Server side of one connection"""
+    __slots__ = ('writer', 'codec', 'addr', 'detached', 'connection')
+
+    def __init__(self, writer, codec, addr, connection=None):
+        self.writer = writer
+        self.codec = codec
+        self.addr = addr
+        self.detached = False  # Socket passé à un autre processus (voir cluster.py)
+        self.connection = connection  # FrameProtocol de la connexion
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(frame(self.codec.encode(message)))
+
+    def unread(self):
+        """Bytes received from the client but not handled yet (the start of a frame included)"""
+        if self.connection is None:
+            return b''
+        return bytes(self.connection.frames.buffer)
+
+
+# Tailles des appels groupés de l'IA (BatchInferenceQueue, max_batch 256)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Lecture suspendue au-delà : deux trames maximales en attente
+READ_LIMIT = 2 * (MAX_FRAME + 2)
+
+
+class FrameProtocol(asyncio.StreamReaderProtocol):
+    """Server connection whose received bytes go to a FrameDecoder, not to a StreamReader.
+
+    The writing side is the usual StreamWriter. Everything the client sent
+    and the server has not handled yet stays in self.frames.buffer, so
+    cluster.py can pass it on with the socket. Reading is paused while more
+    than READ_LIMIT bytes are pending.
+    """
+
+    def __init__(self, client_connected_cb=None):
+        super().__init__(None, client_connected_cb)
+        self.frames = FrameDecoder()
+        self.transport = None
+        self._eof = False
+        self._paused = False
+        self._waiter = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        super().connection_made(transport)
+
+    def data_received(self, data):
+        self.frames.buffer += data
+        if len(self.frames.buffer) > READ_LIMIT and not self._paused:
+            self._paused = True
+            self.transport.pause_reading()
+        self._wake()
+
+    def eof_received(self):
+        self._eof = True
+        self._wake()
+        return super().eof_received()
+
+    def connection_lost(self, exc):
+        self._eof = True
+        self._wake()
+        super().connection_lost(exc)
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def next_frame(self):
+        """Next payload (IncompleteReadError once the client is gone)"""
+        while True:
+            payload = self.frames.pop()
+            if payload is not None:
+                if self._paused and len(self.frames.buffer) <= READ_LIMIT:
+                    self._paused = False
+                    self.transport.resume_reading()
+                return payload
+            if self._eof:
+                raise asyncio.IncompleteReadError(bytes(self.frames.buffer), None)
+            self._waiter = asyncio.get_running_loop().create_future()
             try:
-                player.send(state_json.encode())
-            except:
-                pass
-    
-    def handle_client(self, conn, addr):
-        print(f"Nouvelle connexion de {addr}")
-        
-        # Assigner un ID de joueur et une partie
-        self.player_count += 1
-        player_id = self.player_count
-        game_id = (player_count + 1) // 2
-        
-        if game_id not in self.games:
-            self.games[game_id] = TicTacToe()
-            self.players[game_id] = {}
-        
-        # Envoyer l'ID du joueur
-        conn.send(str(player_id % 2 + 1).encode())  # 1 ou 2
-        
-        self.players[game_id][player_id] = conn
-        print(f"Joueur {player_id} ajouté à la partie {game_id}")
-        
+                await self._waiter
+            finally:
+                self._waiter = None
+
+
+class AiSeat:
+    """The server's AI in a registry session; its moves come from the inference queue"""
+    __slots__ = ()
+    writer = None
+    addr = 'IA'
+
+    def send(self, message):
+        pass
+
+
+class TicTacToeServer:
+    """Game server running every connection as a coroutine on one asyncio loop.
+
+    An idle player costs a socket and a suspended coroutine instead of an
+    OS thread. Pairing and game lifetime are handled by a GameRegistry:
+    players wait in its matchmaking queue, finished or abandoned games are
+    reclaimed, and a player sends 'queue' to play again.
+
+    'play_ai' starts a game against an AiSeat. AI turns of all games are
+    answered in batches by a BatchInferenceQueue, created on first use.
+    When the policy fails or picks an illegal cell, the solver plays that
+    turn instead, so the human always gets the AI's reply.
+
+    self.metrics counts messages, errors and broadcast bytes and times
+    message handling and broadcasts; with metrics_port it is served in the
+    Prometheus text format on 127.0.0.1:metrics_port.
+
+    With game_log (a directory, or a GameLogWriter), every completed game
+    is appended to the binary game log by a background thread.
+
+    board_size and win_length select the game (make_game: 15 and 5 for
+    five-in-a-row), from 3 to protocol.MAX_BOARD_SIZE cells per row (ValueError
+    otherwise). The AI, the hints and the game log only exist for 3x3
+    tic-tac-toe; on other boards play_ai and get_hint get UNSUPPORTED.
+    """
+
+    def __init__(self, host='0.0.0.0', port=5555, backlog=4096, verbose=True, reuse_port=False,
+                 metrics_port=None, game_log=None, board_size=3, win_length=None):
+        check_geometry(board_size, win_length)
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.verbose = verbose
+        self.metrics_port = metrics_port
+        self.server = None
+        self.metrics_server = None
+        self.connections = 0
+
+        self.board_size = board_size
+        self.win_length = win_length or min(board_size, 5)
+        self.tic_tac_toe = (board_size, self.win_length) == (3, 3)
+        self.registry = GameRegistry(partial(make_game, board_size, self.win_length))
+        self.solver = Solver.load()  # Oracle pour les indices (HINT)
+        self._inference = None
+        if isinstance(game_log, str):
+            from gamelog import GameLogWriter
+            game_log = GameLogWriter(game_log)
+        self.game_log = game_log
+        self.setup_metrics()
+
+    def setup_metrics(self):
+        m = self.metrics = MetricsRegistry()
+        # Les valeurs déjà suivies par le serveur sont lues seulement au scrape
+        m.gauge('tictactoe_connections', "Connexions ouvertes", fn=lambda: self.connections)
+        m.gauge('tictactoe_live_games', "Parties en cours", fn=lambda: self.registry.live_games)
+        m.gauge('tictactoe_waiting_players', "Joueurs en attente d'un adversaire",
+                fn=lambda: self.registry.waiting_players)
+        m.counter('tictactoe_games_created_total', "Parties créées",
+                  fn=lambda: self.registry.created_games)
+        m.counter('tictactoe_games_reclaimed_total', "Parties terminées ou abandonnées",
+                  fn=lambda: self.registry.reclaimed_games)
+        m.counter('tictactoe_ai_boards_total', "Tours de l'IA calculés",
+                  fn=lambda: self._inference.boards if self._inference else 0)
+        m.counter('tictactoe_ai_batches_total', "Appels groupés à la politique",
+                  fn=lambda: self._inference.batches if self._inference else 0)
+        self._ai_wait_seconds = m.histogram(
+            'tictactoe_ai_wait_seconds', "Attente d'un tour de l'IA (file et inférence)").labels()
+        self._ai_batch_size = m.histogram(
+            'tictactoe_ai_batch_size', "Plateaux par appel groupé à la politique",
+            bounds=BATCH_BUCKETS).labels()
+        self._ai_inference_seconds = m.histogram(
+            'tictactoe_ai_inference_seconds', "Durée d'un appel groupé à la politique").labels()
+        self._ai_fallbacks = m.counter('tictactoe_ai_fallbacks_total',
+                                       "Tours de l'IA joués par le solveur (politique en échec)").labels()
+
+        self._accepted = m.counter('tictactoe_connections_total', "Connexions acceptées").labels()
+        self._messages = m.counter('tictactoe_messages_total', "Messages reçus par type", ('type',))
+        self._errors = m.counter('tictactoe_errors_total', "Erreurs envoyées par code", ('error',))
+        self._message_seconds = m.histogram(
+            'tictactoe_message_seconds', "Temps de traitement d'un message").labels()
+        self._broadcast_seconds = m.histogram(
+            'tictactoe_broadcast_seconds', "Temps d'encodage et d'envoi d'un broadcast").labels()
+        self._broadcast_bytes = m.counter(
+            'tictactoe_broadcast_bytes_total', "Octets envoyés par les broadcasts").labels()
+        self._broadcast_recipients = m.counter(
+            'tictactoe_broadcast_recipients_total', "Destinataires des broadcasts").labels()
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def broadcast(self, session, message):
+        """Send message to both players, encoding it once per codec in use"""
+        start = time.perf_counter()
+        payloads = {}
+        for player in session.players.values():
+            # write() only queues the data in the transport, it never blocks
+            if player.writer is None or player.writer.is_closing():
+                continue
+            if player.codec not in payloads:
+                payloads[player.codec] = frame(player.codec.encode(message))
+            payload = payloads[player.codec]
+            player.writer.write(payload)
+            self._broadcast_bytes.inc(len(payload))
+            self._broadcast_recipients.inc()
+        self._broadcast_seconds.observe(time.perf_counter() - start)
+
+    def broadcast_game_state(self, session):
+        self.broadcast(session, state_message(session.game_id, session.game))
+
+    async def handshake(self, connection, writer):
+        """Read HELLO and answer WELCOME; returns (negotiated codec, mode) or None"""
         try:
-            while True:
-                data = conn.recv(1024).decode()
-                if not data:
-                    break
-                
-                if data == "GET_STATE":
-                    self.broadcast_game_state(game_id)
-                elif data.startswith("MOVE"):
-                    _, row, col = data.split()
-                    game = self.games[game_id]
-                    
-                    if game.current_player == (player_id % 2 + 1):
-                        if game.make_move(int(row), int(col)):
-                            self.broadcast_game_state(game_id)
-                        else:
-                            conn.send("INVALID_MOVE".encode())
-                    else:
-                        conn.send("NOT_YOUR_TURN".encode())
-        
+            hello = BinaryCodec.decode(await connection.next_frame())
+        except ValueError:  # HELLO d'une autre version du protocole
+            hello = None
+        if hello is None or hello['type'] != 'hello' or hello['version'] != VERSION:
+            self._errors.labels('BAD_VERSION').inc()
+            writer.write(frame(BinaryCodec.encode({'type': 'error', 'game_id': 0, 'error': 'BAD_VERSION'})))
+            return None
+        encoding = hello['encoding'] if hello['encoding'] in ENCODINGS else JSON
+        writer.write(frame(BinaryCodec.encode({'type': 'welcome', 'version': VERSION, 'encoding': encoding})))
+        self._accepted.inc()
+        return CODECS[encoding], hello['mode']
+
+    def matchmake(self, player):
+        session = self.registry.join(player)
+        if session is None:
+            self.log(f"Joueur {player.addr} en attente d'un adversaire")
+            return
+        self.announce(session)
+
+    def send_error(self, player, game_id, error):
+        self._errors.labels(error).inc()
+        player.send({'type': 'error', 'game_id': game_id, 'error': error})
+
+    def cancel_matchmaking(self, player):
+        self.registry.leave(player)
+
+    @property
+    def inference(self):
+        if self._inference is None:
+            from inference import BatchInferenceQueue  # numpy, seulement si une IA joue
+            self._inference = BatchInferenceQueue(on_batch=self.observe_ai_batch)
+        return self._inference
+
+    def observe_ai_batch(self, size, seconds, waits):
+        self._ai_batch_size.observe(size)
+        self._ai_inference_seconds.observe(seconds)
+        for wait in waits:
+            self._ai_wait_seconds.observe(wait)
+
+    def start_ai_game(self, player):
+        if not self.tic_tac_toe:
+            self.send_error(player, 0, 'UNSUPPORTED')
+            return
+        self.cancel_matchmaking(player)
+        self.announce(self.registry.create_game(player, AiSeat()))
+
+    def request_ai_move(self, session):
+        board = [cell for row in session.game.board for cell in row]
+        future = self.inference.submit(board)
+        future.add_done_callback(partial(self.on_ai_move, session))
+
+    def on_ai_move(self, session, future):
+        if future.cancelled():
+            action = None
+        elif future.exception() is not None:
+            self.log(f"Erreur de l'IA dans la partie {session.game_id} : {future.exception()}")
+            action = None
+        else:
+            action = future.result()
+        self.play_ai_move(session, action)
+
+    def play_ai_move(self, session, action):
+        """Play the AI's cell (0-8); None or an illegal cell: the solver's move instead"""
+        if self.registry.games.get(session.game_id) is not session:
+            return  # Partie abandonnée pendant l'inférence
+        game = session.game
+        symbol = game.current_player
+        if action is None or not game.make_move(*divmod(action, 3)):
+            self._ai_fallbacks.inc()
+            row, col = self.solver.best_move(game.board)
+            game.make_move(row, col)
+            action = row * 3 + col
+        row, col = divmod(action, 3)
+        session.moves.append(action)
+        self.broadcast(session, delta_message(session.game_id, game, row, col, symbol))
+        if game.game_over:
+            self.end_game(session)
+
+    def end_game(self, session):
+        self.registry.finish(session)
+        if self.game_log is not None and self.tic_tac_toe:
+            end = session.started + (time.monotonic() - session.clock)
+            self.game_log.log_game(session.moves, session.game.winner or 0, session.started,
+                                   end, isinstance(session.players[2], AiSeat))
+
+    def announce(self, session):
+        for symbol, member in session.players.items():
+            member.send({'type': 'joined', 'game_id': session.game_id, 'player': symbol,
+                         'size': self.board_size, 'win_length': self.win_length})
+        self.log(f"Partie {session.game_id} créée")
+
+    def handle_message(self, player, message):
+        kind = message['type']
+        session = self.registry.session_of(player)
+        if kind == 'queue':
+            if session is None:
+                self.matchmake(player)
+            return
+        if kind == 'play_ai':
+            if session is None:
+                self.start_ai_game(player)
+            return
+        if session is None:
+            self.send_error(player, 0, 'NO_GAME')
+            return
+
+        game_id, game = session.game_id, session.game
+        symbol = 1 if session.players[1] is player else 2
+        if kind == 'get_state':
+            player.send(state_message(game_id, game))
+        elif kind == 'move':
+            row, col = message['row'], message['col']
+            if game.current_player != symbol:
+                self.send_error(player, game_id, 'NOT_YOUR_TURN')
+            elif game.make_move(row, col):
+                session.moves.append(row * self.board_size + col)
+                self.broadcast(session, delta_message(game_id, game, row, col, symbol))
+                if game.game_over:
+                    self.end_game(session)
+                elif isinstance(session.opponent(player), AiSeat):
+                    self.request_ai_move(session)
+            else:
+                self.send_error(player, game_id, 'INVALID_MOVE')
+        elif kind == 'get_hint':
+            if not self.tic_tac_toe:
+                self.send_error(player, game_id, 'UNSUPPORTED')
+                return
+            move = self.solver.best_move(game.board) or (None, None)
+            player.send({'type': 'hint', 'game_id': game_id, 'row': move[0], 'col': move[1]})
+        else:
+            self.send_error(player, game_id, 'BAD_MESSAGE')
+
+    async def handle_client(self, reader, writer):
+        # reader vaut None : les octets reçus restent dans FrameProtocol.frames
+        connection = writer.transport.get_protocol()
+        addr = writer.get_extra_info('peername')
+        self.log(f"Nouvelle connexion de {addr}")
+        self.connections += 1
+
+        try:
+            hello = await self.handshake(connection, writer)
+            if hello is not None:
+                codec, mode = hello
+                player = Player(writer, codec, addr, connection)
+                if mode == VS_AI:
+                    self.start_ai_game(player)
+                else:
+                    self.matchmake(player)
+                await self.serve(player)
+
+        except asyncio.IncompleteReadError:
+            pass  # Déconnexion du client
         except Exception as e:
-            print(f"Erreur avec le client {addr}: {e}")
+            self.log(f"Erreur avec le client {addr}: {e}")
+        finally:
+            self.log(f"Connexion fermée avec {addr}")
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, player):
+        """Handle the player's messages until they disconnect or move to another worker"""
+        try:
+            while True:
+                payload = await player.connection.next_frame()
+                if player.detached:
+                    return  # Trames restantes transmises avec le socket (cluster.py)
+                try:
+                    message = player.codec.decode(payload)
+                except ValueError:
+                    # Trame complète mais illisible : le flux reste aligné, la connexion continue
+                    self.send_error(player, 0, 'BAD_MESSAGE')
+                    await player.writer.drain()
+                    continue
+                start = time.perf_counter()
+                self.handle_message(player, message)
+                self._message_seconds.observe(time.perf_counter() - start)
+                self._messages.labels(message['type']).inc()
+                # Attendre que le client lise avant d'accepter d'autres messages
+                await player.writer.drain()
         finally:
-            print(f"Connexion fermée avec {addr}")
-            conn.close()
-            if game_id in self.players and player_id in self.players[game_id]:
-                del self.players[game_id][player_id]
-    
+            if not player.detached:
+                self.disconnect(player)
+
+    def disconnect(self, player):
+        abandoned = self.registry.leave(player)
+        if abandoned is not None:
+            self.send_error(abandoned.opponent(player), abandoned.game_id, 'OPPONENT_LEFT')
+
+    async def listen(self):
+        """Bind the listening socket (port 0 picks a free port, stored in self.port)"""
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: FrameProtocol(self.handle_client), self.host,
+                                               self.port, backlog=self.backlog, reuse_port=self.reuse_port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.log(f"Serveur démarré sur {self.host}:{self.port}")
+        if self.metrics_port is not None:
+            self.metrics_server = await start_http_endpoint(self.metrics, '127.0.0.1', self.metrics_port)
+            self.metrics_port = self.metrics_server.sockets[0].getsockname()[1]
+            self.log(f"Métriques sur http://127.0.0.1:{self.metrics_port}/metrics")
+        return self.server
+
+    async def close(self):
+        """Stop listening and write the pending game log records"""
+        for server in (self.server, self.metrics_server):
+            if server is not None:
+                server.close()
+        if self.game_log is not None:
+            self.game_log.close()
+
+    async def serve_forever(self):
+        await self.listen()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
     def start(self):
-        while True:
-            conn, addr = self.server.accept()
-            thread = threading.Thread(target=self.handle_client, args=(conn, addr))
-            thread.start()
+        raise_fd_limit()
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
 
 if __name__ == "__main__":
-    server = TicTacToeServer()
-    server.start()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveur de morpion")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="nombre de processus partageant le port (SO_REUSEPORT)")
+    parser.add_argument("--game-log", default=None,
+                        help="dossier du journal binaire des parties terminées")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="port local des métriques Prometheus (worker i : port + i)")
+    parser.add_argument("--size", type=int, default=3, help="taille du plateau (15 : gomoku)")
+    parser.add_argument("--win-length", type=int, default=None,
+                        help="pions alignés pour gagner (par défaut min(taille, 5))")
+    args = parser.parse_args()
+    try:
+        check_geometry(args.size, args.win_length)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.workers > 1:
+        from cluster import ServerCluster
+        cluster = ServerCluster(args.host, args.port, args.workers, metrics_port=args.metrics_port,
+                                game_log=args.game_log, board_size=args.size,
+                                win_length=args.win_length)
+        cluster.serve_forever()
+    else:
+        server = TicTacToeServer(args.host, args.port, metrics_port=args.metrics_port,
+                                 game_log=args.game_log, board_size=args.size,
+                                 win_length=args.win_length)
+        server.start()
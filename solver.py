@@ -0,0 +1,244 @@
+"""Exact tic-tac-toe solver.
+
+Every reachable position is solved once by negamax over a transposition
+table keyed on the canonical form of the board (smallest code among its 8
+rotations/reflections, 765 positions in total). The results are then
+expanded to a dense table indexed by the base-3 code of the board, so
+``best_move`` and ``value`` are a single array lookup.
+
+Scores are from the point of view of the player to move: 0 for a draw,
+positive for a win, negative for a loss; the magnitude is larger for a
+faster win (10 minus the number of plies left).
+"""
+import os
+from array import array
+
+SOLVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe_solver.bin")
+MAGIC = b"TTTS\x01"
+
+N_CODES = 3 ** 9
+POWERS = tuple(3 ** i for i in range(9))
+NO_MOVE = -1
+
+WIN_LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8),
+             (0, 4, 8), (2, 4, 6))
+
+# The 8 symmetries of the square as cell permutations: new[i] = old[perm[i]]
+_ROTATE = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+_MIRROR = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+
+
+def _compose(a, b):
+    return tuple(a[b[i]] for i in range(9))
+
+
+def _symmetries():
+    perms = []
+    perm = tuple(range(9))
+    for _ in range(4):
+        perms.append(perm)
+        perms.append(_compose(perm, _MIRROR))
+        perm = _compose(perm, _ROTATE)
+    return tuple(perms)
+
+
+SYMMETRIES = _symmetries()
+
+# Base-3 code of a 9-bit mask with every set cell worth 1, so a bitboard
+# position (x, o) encodes as TERNARY[x] + 2 * TERNARY[o]
+TERNARY = tuple(sum(POWERS[i] for i in range(9) if mask >> i & 1) for mask in range(512))
+
+
+def encode(board):
+    """Base-3 code of a board given as 3x3 rows or a flat sequence of 9 cells"""
+    if len(board) == 3:
+        board = [cell for row in board for cell in row]
+    code = 0
+    for i in range(8, -1, -1):
+        code = code * 3 + int(board[i])
+    return code
+
+
+def decode(code):
+    """Flat list of the 9 cells of a base-3 code"""
+    cells = []
+    for _ in range(9):
+        code, cell = divmod(code, 3)
+        cells.append(cell)
+    return cells
+
+
+def canonical(code):
+    """Smallest code among the 8 symmetric images of a position"""
+    cells = decode(code)
+    return min(sum(cells[perm[i]] * POWERS[i] for i in range(9)) for perm in SYMMETRIES)
+
+
+def player_to_move(cells):
+    return 1 if cells.count(1) == cells.count(2) else 2
+
+
+def winner(cells):
+    for a, b, c in WIN_LINES:
+        if cells[a] != 0 and cells[a] == cells[b] == cells[c]:
+            return cells[a]
+    return 0
+
+
+def reachable_codes():
+    """Codes of every position reachable from the empty board (5478 of them)"""
+    seen = {0}
+    stack = [0]
+    while stack:
+        code = stack.pop()
+        cells = decode(code)
+        if winner(cells) or 0 not in cells:
+            continue
+        player = player_to_move(cells)
+        for cell in range(9):
+            if cells[cell] == 0:
+                child = code + player * POWERS[cell]
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+    return sorted(seen)
+
+
+def _negamax(code, table):
+    key = canonical(code)
+    if key in table:
+        return table[key]
+    cells = decode(code)
+    if winner(cells):
+        score = -10  # the previous player just won
+    elif 0 not in cells:
+        score = 0
+    else:
+        player = player_to_move(cells)
+        score = max(_decay(-_negamax(code + player * POWERS[cell], table))
+                    for cell in range(9) if cells[cell] == 0)
+    table[key] = score
+    return score
+
+
+def _decay(score):
+    """A win (or loss) one ply further away is worth one point less"""
+    return score - 1 if score > 0 else score + 1 if score < 0 else 0
+
+
+class Solver:
+    """Dense value and best-move tables over all 3^9 board codes"""
+
+    def __init__(self, values, moves):
+        self.values = values
+        self.moves = moves
+
+    @classmethod
+    def build(cls):
+        table = {}
+        values = array('b', bytes(N_CODES))
+        moves = array('b', [NO_MOVE]) * N_CODES
+        for code in reachable_codes():
+            values[code] = _negamax(code, table)
+            cells = decode(code)
+            if winner(cells) or 0 not in cells:
+                continue
+            player = player_to_move(cells)
+            moves[code] = max(
+                (cell for cell in range(9) if cells[cell] == 0),
+                key=lambda cell: _decay(-table[canonical(code + player * POWERS[cell])]))
+        return cls(values, moves)
+
+    @classmethod
+    def load(cls, path=SOLVER_PATH):
+        """Load the precomputed tables, building and saving them if the file is missing"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            solver = cls.build()
+            solver.save(path)
+            return solver
+        if not data.startswith(MAGIC) or len(data) != len(MAGIC) + 2 * N_CODES:
+            raise ValueError(f"{path} n'est pas une table de solveur valide")
+        values = array('b')
+        values.frombytes(data[len(MAGIC):len(MAGIC) + N_CODES])
+        moves = array('b')
+        moves.frombytes(data[len(MAGIC) + N_CODES:])
+        return cls(values, moves)
+
+    def save(self, path=SOLVER_PATH):
+        with open(path, "wb") as f:
+            f.write(MAGIC + self.values.tobytes() + self.moves.tobytes())
+
+    def value(self, board):
+        """Score of the position for the player to move"""
+        return self.values[encode(board)]
+
+    def best_move(self, board):
+        """Optimal (row, col), or None if the game is over"""
+        cell = self.moves[encode(board)]
+        return None if cell == NO_MOVE else divmod(cell, 3)
+
+    def move_score(self, board, move):
+        """Score for the player to move after playing move=(row, col)"""
+        code = encode(board)
+        cells = decode(code)
+        child = code + player_to_move(cells) * POWERS[move[0] * 3 + move[1]]
+        return _decay(-self.values[child])
+
+    def is_optimal(self, board, move):
+        """True if move keeps the game-theoretic outcome (win/draw/loss) of the position"""
+        value = self.value(board)
+        score = self.move_score(board, move)
+        return (score > 0) == (value > 0) and (score < 0) == (value < 0)
+
+
+class SolverAgent:
+    """Perfect player with the same predict(board, valid_moves) interface as DRLAgent"""
+
+    def __init__(self, solver=None):
+        self.solver = solver or Solver.load()
+
+    def predict(self, board, valid_moves):
+        move = self.solver.best_move(board)
+        if move in valid_moves:
+            return move
+        return max(valid_moves, key=lambda m: self.solver.move_score(board, m))
+
+
+def oracle_report(agent, solver=None, player=None):
+    """Check an agent's moves against the solver on every reachable position.
+
+    Only positions where `player` (1 or 2, default both) is to move are
+    tested. A move counts as optimal if it keeps the win/draw/loss outcome.
+    """
+    solver = solver or Solver.load()
+    positions = optimal = 0
+    mistakes = []
+    for code in reachable_codes():
+        cells = decode(code)
+        if winner(cells) or 0 not in cells:
+            continue
+        if player is not None and player_to_move(cells) != player:
+            continue
+        board = [cells[0:3], cells[3:6], cells[6:9]]
+        valid_moves = [divmod(cell, 3) for cell in range(9) if cells[cell] == 0]
+        move = tuple(int(x) for x in agent.predict(board, valid_moves))
+        positions += 1
+        if solver.is_optimal(board, move):
+            optimal += 1
+        else:
+            mistakes.append((code, move))
+    return {
+        'positions': positions,
+        'optimal': optimal,
+        'accuracy': optimal / positions if positions else 1.0,
+        'mistakes': mistakes,
+    }
+
+
+if __name__ == "__main__":
+    solver = Solver.build()
+    solver.save()
+    print(f"Table du solveur écrite dans {SOLVER_PATH}")
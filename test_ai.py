@@ -0,0 +1,377 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from ai import DRLAgent, build_model, train_ai
+from benchmark import legacy_predict, legacy_strategic_reward, reachable_boards
+from gamelog import GameLogWriter
+from mcts import MCTSAgent, PolicyPriors, RandomAgent, play_game
+from league import LeagueVecEnv, OpponentPool, RandomOpponent, SolverOpponent, evaluate, play_match
+from numpy_policy import NumpyPolicyAgent, policy_weights
+from pretrain import game_log_dataset, pretrain_policy, solver_dataset, win_rate_vs_random
+from solver import Solver
+from tictactoe_env import BOARD_POWERS, STRATEGIC_REWARDS, TicTacToeEnv, strategic_rewards
+from vec_env import ShmSubprocVecEnv, TicTacToeVecEnv
+
+
+class TestStrategicRewards(unittest.TestCase):
+    def test_table_matches_legacy(self):
+        boards = np.arange(3 ** 9)[:, None] // BOARD_POWERS % 3
+        for code, cells in enumerate(boards):
+            self.assertEqual(STRATEGIC_REWARDS[code], legacy_strategic_reward(cells.reshape(3, 3).tolist()))
+        np.testing.assert_array_equal(strategic_rewards(boards.astype(np.int8)), STRATEGIC_REWARDS)
+
+    def test_env_reward(self):
+        env = TicTacToeEnv()
+        env.reset()
+        for action in (4, 0, 2, 6):
+            obs, reward, terminated, _, _ = env.step(action)
+            self.assertFalse(terminated)
+            self.assertEqual(reward, legacy_strategic_reward(obs.reshape(3, 3).tolist()))
+
+
+class TestTicTacToeVecEnv(unittest.TestCase):
+    def test_matches_single_env(self):
+        rng = np.random.default_rng(0)
+        n_envs = 16
+        vec_env = TicTacToeVecEnv(n_envs)
+        envs = [TicTacToeEnv() for _ in range(n_envs)]
+        obs = vec_env.reset()
+        for i, env in enumerate(envs):
+            np.testing.assert_array_equal(obs[i], env.reset()[0])
+
+        for _ in range(300):
+            # Surtout des coups valides, parfois une case déjà occupée
+            actions = vec_env.games.sample_valid_actions(rng)
+            actions[rng.random(n_envs) < 0.05] = 4
+            obs, rewards, dones, infos = vec_env.step(actions)
+            for i, env in enumerate(envs):
+                env_obs, reward, terminated, _, info = env.step(actions[i])
+                self.assertEqual(rewards[i], reward)
+                self.assertEqual(dones[i], terminated)
+                self.assertEqual(infos[i].get("invalid_move"), info.get("invalid_move"))
+                if terminated:
+                    np.testing.assert_array_equal(infos[i]["terminal_observation"], env_obs)
+                    env_obs, _ = env.reset()
+                np.testing.assert_array_equal(obs[i], env_obs)
+
+    def test_train_with_vec_env(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model")
+            model = train_ai(path, n_envs=8, total_timesteps=256)
+            self.assertEqual(model.n_envs, 8)
+            self.assertTrue(os.path.exists(path + ".zip"))
+
+
+class TestShmSubprocVecEnv(unittest.TestCase):
+    def test_matches_single_env(self):
+        n_envs = 5
+        vec_env = ShmSubprocVecEnv([TicTacToeEnv] * n_envs, n_workers=2)
+        try:
+            self.assertEqual(vec_env.n_workers, 2)
+            envs = [TicTacToeEnv() for _ in range(n_envs)]
+            obs = vec_env.reset()
+            for i, env in enumerate(envs):
+                np.testing.assert_array_equal(obs[i], env.reset()[0])
+            for step in range(12):
+                actions = np.array([(i + 2 * step) % 9 for i in range(n_envs)])
+                obs, rewards, dones, infos = vec_env.step(actions)
+                for i, env in enumerate(envs):
+                    env_obs, reward, terminated, _, info = env.step(actions[i])
+                    self.assertEqual(rewards[i], reward)
+                    self.assertEqual(dones[i], terminated)
+                    if terminated:
+                        np.testing.assert_array_equal(infos[i]["terminal_observation"], env_obs)
+                        env_obs, _ = env.reset()
+                    np.testing.assert_array_equal(obs[i], env_obs)
+            self.assertEqual(vec_env.get_attr("render_mode"), [None] * n_envs)
+        finally:
+            vec_env.close()
+
+    def test_train_with_subproc(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            model = train_ai(os.path.join(tmp, "model"), total_timesteps=64,
+                             vec_env="subproc", n_workers=2)
+            self.assertEqual(model.n_envs, 2)
+
+
+class TestDRLAgent(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.agent = DRLAgent("tictactoe_ppo", cache_size=64)
+        cls.positions = reachable_boards()[::10]
+
+    def test_matches_legacy_predict(self):
+        for board, valid_moves in self.positions:
+            move = self.agent.predict(board, valid_moves)
+            self.assertIn(move, valid_moves)
+            self.assertEqual(move, tuple(legacy_predict(self.agent.model, board, valid_moves)))
+
+    def test_cache(self):
+        agent = DRLAgent("tictactoe_ppo", cache_size=2)
+        board = [[1, 0, 0], [0, 0, 0], [0, 0, 0]]
+        valid_moves = [(r, c) for r in range(3) for c in range(3) if board[r][c] == 0]
+        agent.predict(board, valid_moves)
+        agent.predict(board, valid_moves[1:])
+        self.assertEqual((agent.cache_hits, agent.cache_misses), (1, 1))
+        for board, valid_moves in self.positions[:5]:
+            agent.predict(board, valid_moves)
+        self.assertEqual(len(agent._cache), 2)
+
+    def test_precompute(self):
+        agent = DRLAgent("tictactoe_ppo", precompute=True)
+        for board, valid_moves in self.positions:
+            self.assertEqual(agent.predict(board, valid_moves),
+                             self.agent.predict(board, valid_moves))
+        self.assertEqual(agent.cache_misses, 0)
+
+    def test_masked_probs(self):
+        boards = np.array([sum(board, []) for board, _ in self.positions])
+        probs = self.agent._forward(boards)
+        self.assertTrue((probs[boards != 0] == 0).all())
+        np.testing.assert_allclose(probs.sum(axis=1), 1, rtol=1e-5)
+
+
+class TestNumpyPolicyAgent(unittest.TestCase):
+    def test_matches_drl_agent(self):
+        drl_agent = DRLAgent("tictactoe_ppo")
+        agent = NumpyPolicyAgent(policy_weights(drl_agent.model.policy))
+        positions = reachable_boards()
+        for board, valid_moves in positions[::7]:
+            self.assertEqual(agent.predict(board, valid_moves), drl_agent.predict(board, valid_moves))
+
+        boards = np.array([sum(board, []) for board, _ in positions])
+        np.testing.assert_allclose(agent.action_probs(boards), drl_agent._forward(boards), atol=1e-5)
+        actions = agent.predict_batch(boards, boards == 0)
+        self.assertTrue((boards[np.arange(len(boards)), actions] == 0).all())
+
+    def test_no_torch_import(self):
+        code = ("import sys; from numpy_policy import NumpyPolicyAgent; "
+                "print(NumpyPolicyAgent().predict([[1, 0, 0], [0, 0, 0], [0, 0, 0]], [(1, 1), (2, 2)])); "
+                "assert 'torch' not in sys.modules")
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestActionMasks(unittest.TestCase):
+    def test_env_masks(self):
+        env = TicTacToeEnv()
+        _, info = env.reset()
+        self.assertTrue(info["action_mask"].all())
+        for action in (4, 0, 1, 3):
+            obs, _, _, _, info = env.step(action)
+            np.testing.assert_array_equal(info["action_mask"], obs == 0)
+            np.testing.assert_array_equal(env.action_masks(), obs == 0)
+        _, _, terminated, _, info = env.step(7)  # X aligne 1-4-7
+        self.assertTrue(terminated)
+        self.assertFalse(info["action_mask"].any())
+
+    def test_large_board_env(self):
+        from stable_baselines3.common.env_checker import check_env
+
+        env = TicTacToeEnv(size=15, win_length=5)
+        check_env(env)
+        obs, _ = env.reset()
+        self.assertEqual(obs.shape, (225,))
+        for i in range(4):
+            _, reward, terminated, _, _ = env.step(7 * 15 + i)  # X sur la ligne 7
+            self.assertEqual((reward, terminated), (0, False))
+            env.step(i)  # O sur la ligne 0
+        obs, reward, terminated, _, info = env.step(7 * 15 + 4)
+        self.assertEqual((reward, terminated), (-100, True))
+        self.assertFalse(info["action_mask"].any())
+        env.reset()
+        env.step(0)
+        self.assertEqual(env.step(0)[1], -20)
+
+    def test_subproc_masks(self):
+        vec_env = ShmSubprocVecEnv([TicTacToeEnv] * 4, n_workers=2)
+        try:
+            obs = vec_env.reset()
+            np.testing.assert_array_equal(vec_env.action_masks(), obs == 0)
+            for step in range(10):
+                obs, _, _, infos = vec_env.step(np.array([(i + step) % 9 for i in range(4)]))
+                np.testing.assert_array_equal(vec_env.action_masks(), obs == 0)
+                self.assertFalse(any("action_mask" in info for info in infos))
+        finally:
+            vec_env.close()
+
+    def test_masked_policy(self):
+        model = build_model(TicTacToeVecEnv(8), n_envs=8, verbose=0)
+        model.learn(512)
+        # Aucun coup illégal dans les rollouts
+        buffer = model.rollout_buffer
+        boards = buffer.observations.reshape(-1, 9)
+        actions = buffer.actions.reshape(-1).astype(int)
+        self.assertTrue((boards[np.arange(len(boards)), actions] == 0).all())
+
+        boards = np.array([sum(board, []) for board, _ in reachable_boards()], dtype=np.float32)
+        sampled, _ = model.predict(boards)
+        self.assertTrue((boards[np.arange(len(boards)), sampled] == 0).all())
+        agent = NumpyPolicyAgent(policy_weights(model.policy))
+        self.assertTrue((agent.action_probs(boards)[boards != 0] == 0).all())
+
+
+class TestPretrain(unittest.TestCase):
+    def test_solver_dataset(self):
+        solver = Solver.load()
+        boards, actions = solver_dataset(solver)
+        self.assertEqual(boards.shape, (len(actions), 9))
+        # Toujours O à jouer, coup légal et optimal
+        self.assertTrue(((boards == 1).sum(axis=1) == (boards == 2).sum(axis=1) + 1).all())
+        self.assertTrue((boards[np.arange(len(boards)), actions] == 0).all())
+        for cells, action in zip(boards[::50], actions[::50]):
+            board = cells.reshape(3, 3).tolist()
+            self.assertTrue(solver.is_optimal(board, divmod(int(action), 3)))
+
+    def test_game_log_dataset(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = GameLogWriter(tmp)
+            writer.log_game([4, 0, 8, 2, 1, 6, 3, 5, 7], 0, 0, 1)  # Nul
+            writer.log_game([0, 4, 1, 8, 2], 1, 0, 1)  # X gagne, ignorée pour O
+            writer.log_game([0, 4, 1, 2, 8, 6], 2, 0, 1)  # O gagne
+            writer.close()
+            boards, actions = game_log_dataset(tmp)
+            self.assertEqual(sorted(actions.tolist()), [0, 2, 2, 4, 5, 6, 6])
+            self.assertIn([1, 1, 0, 0, 2, 0, 0, 0, 0], boards.tolist())  # Avant le coup 2 de O
+            self.assertTrue((boards[np.arange(len(boards)), actions] == 0).all())
+            boards, actions = game_log_dataset(tmp, player=None, winners_only=False)
+            self.assertEqual(len(actions), 9 + 5 + 6)
+
+    def test_game_log_dataset_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # Répertoire absent (ou pretrain mal orthographié), puis vide
+            for directory in (os.path.join(tmp, "solvr"), tmp):
+                with self.assertRaises(ValueError):
+                    game_log_dataset(directory)
+            with self.assertRaises(ValueError):
+                build_model(TicTacToeVecEnv(1), verbose=0, pretrain=tmp)
+            writer = GameLogWriter(tmp)
+            writer.log_game([0, 4, 1, 8, 2], 1, 0, 1)  # Seulement des coups de X
+            writer.close()
+            with self.assertRaises(ValueError):
+                game_log_dataset(tmp)
+            self.assertEqual(len(game_log_dataset(tmp, player=1)[1]), 3)
+
+    def test_pretrain_policy(self):
+        boards, actions = solver_dataset()
+        model = build_model(TicTacToeVecEnv(4), n_envs=4, verbose=0)
+        before = win_rate_vs_random(NumpyPolicyAgent(policy_weights(model.policy)), n_games=500)
+        losses = pretrain_policy(model.policy, boards, actions)
+        self.assertLess(losses[-1], losses[0])
+        after = win_rate_vs_random(NumpyPolicyAgent(policy_weights(model.policy)), n_games=500)
+        self.assertGreater(after['win'], before['win'] + 0.2)
+        self.assertLess(after['loss'], before['loss'] / 2)
+
+    def test_train_pretrained(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            model = train_ai(os.path.join(tmp, "model"), n_envs=8, total_timesteps=256,
+                             pretrain="solver")
+            agent = NumpyPolicyAgent(policy_weights(model.policy))
+            self.assertGreater(win_rate_vs_random(agent, n_games=500)['win'], 0.5)
+
+
+class TestLeague(unittest.TestCase):
+    def test_solver_opponent(self):
+        solver = SolverOpponent()
+        self.assertEqual(play_match(solver, RandomOpponent(), 300, player=1)['loss'], 0.0)
+        self.assertEqual(play_match(solver, solver, 1, player=2)['draw'], 1.0)
+
+    def test_pool_replaces_oldest_snapshot(self):
+        pool = OpponentPool(max_snapshots=2)
+        for i in range(3):
+            pool.add_snapshot(f"pi@{i}", RandomOpponent(i))
+        self.assertEqual(pool.names, ["random", "solver", "pi@2", "pi@1"])
+        self.assertEqual(set(evaluate(RandomOpponent(), pool, 20)), set(pool.names))
+
+    def test_episodes(self):
+        env = LeagueVecEnv(32, OpponentPool())
+        rng = np.random.default_rng(0)
+        obs = env.reset()
+        # Le coup d'ouverture de l'adversaire est déjà joué quand l'agent a O
+        np.testing.assert_array_equal((obs != 0).sum(axis=1), (env.side == 2).astype(int))
+        outcomes = set()
+        for _ in range(200):
+            sides = env.side.copy()
+            self.assertTrue((env.games.current_player == sides).all())
+            obs, rewards, dones, infos = env.step(env.games.sample_valid_actions(rng))
+            for i in np.flatnonzero(dones):
+                board = infos[i]["terminal_observation"]
+                outcomes.add(rewards[i])
+                if rewards[i] == 100:
+                    self.assertEqual((board == sides[i]).sum(), (board == 3 - sides[i]).sum() + (sides[i] == 1))
+            self.assertFalse(any("invalid_move" in info for info in infos))
+        self.assertTrue({100, -100, 10} <= outcomes)
+
+    def test_train_self_play(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            model = train_ai(os.path.join(tmp, "model"), n_envs=8, total_timesteps=256,
+                             self_play=True)
+            self.assertEqual(model.n_envs, 8)
+
+
+class TestMCTSAgent(unittest.TestCase):
+    def test_never_loses_to_solver(self):
+        from solver import SolverAgent
+
+        solver = SolverAgent()
+        for seed in range(2):
+            self.assertEqual(play_game(MCTSAgent(playouts=1000, seed=seed), solver), 0)
+            self.assertEqual(play_game(solver, MCTSAgent(playouts=1000, seed=seed)), 0)
+
+    def test_large_board_tactics(self):
+        # 7x7, 4 alignés : X gagne en (3, 3), puis O doit bloquer (3, 3)
+        board = [[0] * 7 for _ in range(7)]
+        for col in range(3):
+            board[3][col] = 1
+        board[0][0], board[6][6], board[0][6] = 2, 2, 2
+        valid_moves = [(r, c) for r in range(7) for c in range(7) if board[r][c] == 0]
+        self.assertEqual(MCTSAgent(playouts=2000, win_length=4).predict(board, valid_moves), (3, 3))
+        board[0][6] = 0
+        valid_moves.append((0, 6))
+        self.assertEqual(MCTSAgent(playouts=2000, win_length=4).predict(board, valid_moves), (3, 3))
+
+    def test_tree_reuse(self):
+        agent = MCTSAgent(playouts=500)
+        board = [[0] * 3 for _ in range(3)]
+        row, col = agent.predict(board, [(r, c) for r in range(3) for c in range(3)])
+        self.assertEqual(agent.reused_visits, 0)
+        board[row][col] = 1
+        reply = next((r, c) for r in range(3) for c in range(3) if board[r][c] == 0)
+        board[reply[0]][reply[1]] = 2
+        agent.predict(board, [(r, c) for r in range(3) for c in range(3) if board[r][c] == 0])
+        self.assertGreater(agent.reused_visits, 0)
+        self.assertEqual(agent.visits[0], agent.reused_visits + 500)
+        # Après compaction, les enfants de chaque nœud restent contigus et dans l'arbre
+        for node in range(len(agent)):
+            if agent.first_child[node] != -1:
+                self.assertLessEqual(agent.first_child[node] + agent.n_children[node], len(agent))
+
+    def test_time_budget(self):
+        agent = MCTSAgent(playouts=None, time_budget=0.05, win_length=5)
+        board = [[0] * 15 for _ in range(15)]
+        agent.predict(board, [(r, c) for r in range(15) for c in range(15)])
+        self.assertGreaterEqual(agent.last_playouts, 1)
+        self.assertLess(agent.last_seconds, 0.5)
+
+    def test_policy_priors(self):
+        calls = []
+
+        class CountingPriors(PolicyPriors):
+            def __call__(self, boards, players):
+                calls.append(len(boards))
+                return super().__call__(boards, players)
+
+        agent = MCTSAgent(playouts=256, evaluator=CountingPriors(NumpyPolicyAgent(), use_value=True),
+                          batch_size=16)
+        self.assertIn(play_game(agent, RandomAgent()), (0, 1))
+        self.assertLessEqual(max(calls), 16)
+        self.assertGreater(sum(calls) / len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
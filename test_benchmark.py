@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmark import SUITE, compare_results, load_results, main, run_suite, save_results
+
+
+def results(**values):
+    return {name.replace('_', '.', 1): {'value': value, 'unit': 'ops/s'} for name, value in values.items()}
+
+
+class TestRegressionSuite(unittest.TestCase):
+    def test_compare(self):
+        baseline = results(engine_a=100.0, engine_b=100.0, engine_c=100.0, engine_gone=100.0)
+        current = results(engine_a=85.0, engine_b=95.0, engine_c=120.0, engine_new=50.0)
+        status = {row[0]: row[4] for row in compare_results(baseline, current, threshold=0.10)}
+        self.assertEqual(status, {'engine.a': 'REGRESSION', 'engine.b': 'ok', 'engine.c': 'faster',
+                                  'engine.gone': 'missing', 'engine.new': 'new'})
+        # Le seuil décide : 15 % de perte passe avec un seuil de 20 %
+        status = {row[0]: row[4] for row in compare_results(baseline, current, threshold=0.20)}
+        self.assertEqual(status['engine.a'], 'ok')
+
+    def test_save_and_compare_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base, current = os.path.join(tmp, 'base.json'), os.path.join(tmp, 'current.json')
+            save_results(results(engine_a=100.0), base)
+            self.assertEqual(load_results(base), results(engine_a=100.0))
+            with open(base) as f:
+                self.assertIn('python', json.load(f))
+            save_results(results(engine_a=95.0), current)
+            self.assertEqual(main(['compare', base, current]), 0)
+            save_results(results(engine_a=50.0), current)
+            self.assertEqual(main(['compare', base, current]), 1)
+
+    def test_suite_runs(self):
+        # Petite échelle, sans l'agent (chargement du modèle) : chaque cas rend un débit
+        names = [name for name in SUITE if not name.startswith('agent.')]
+        out = run_suite(scale=0.01, names=names)
+        self.assertEqual(list(out), names)
+        for name, result in out.items():
+            self.assertGreater(result['value'], 0, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,10 @@
+import os
+import random
 import unittest
-from game import TicTacToe
+import numpy as np
+from batch_game import BatchTicTacToe
+from benchmark import ListTicTacToe, scan_winner
+from engine import KInARow, TicTacToe, make_game
 
 class TestTicTacToe(unittest.TestCase):
     def setUp(self):
@@ -42,6 +47,237 @@ class TestTicTacToe(unittest.TestCase):
             self.game.make_move(row, col)
         state = self.game.get_state()
         self.assertEqual(state['winning_line'], ('diag', 1))
+    
+    def test_draw_and_occupied_cell(self):
+        moves = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)]
+        for row, col in moves:
+            self.assertTrue(self.game.make_move(row, col))
+        state = self.game.get_state()
+        self.assertTrue(state['game_over'])
+        self.assertIsNone(state['winner'])
+        self.assertEqual(self.game.get_valid_moves(), [])
+        
+        self.game.reset()
+        self.game.make_move(1, 1)
+        self.assertFalse(self.game.make_move(1, 1))
+        self.assertFalse(self.game.make_move(3, 0))
+        self.assertEqual(self.game.current_player, 2)
+    
+    def test_matches_list_engine(self):
+        # Le moteur bitboard doit se comporter comme l'ancienne version en listes
+        rng = random.Random(42)
+        reference = ListTicTacToe()
+        for _ in range(500):
+            self.game.reset()
+            reference.reset()
+            while not reference.game_over:
+                row, col = rng.choice(reference.get_valid_moves())
+                self.assertEqual(self.game.get_valid_moves(), reference.get_valid_moves())
+                self.assertEqual(self.game.make_move(row, col), reference.make_move(row, col))
+            self.assertEqual(self.game.board, reference.board)
+            self.assertEqual((self.game.winner, self.game.winning_line, self.game.game_over),
+                             (reference.winner, reference.winning_line, reference.game_over))
+
+class TestKInARow(unittest.TestCase):
+    def play_random(self, game, rng):
+        while not game.game_over:
+            row, col = rng.choice(game.get_valid_moves())
+            self.assertTrue(game.make_move(row, col))
+            yield row, col
+
+    def test_matches_bitboard_engine(self):
+        rng = random.Random(0)
+        game, reference = KInARow(3, 3), TicTacToe()
+        for _ in range(300):
+            game.reset()
+            reference.reset()
+            for row, col in self.play_random(game, rng):
+                reference.make_move(row, col)
+                self.assertEqual(sorted(game.get_valid_moves()), reference.get_valid_moves())
+                self.assertEqual((game.winner, game.game_over, game.current_player),
+                                 (reference.winner, reference.game_over, reference.current_player))
+            self.assertEqual(game.board, reference.board)
+
+    def test_matches_full_scan(self):
+        rng = random.Random(1)
+        for size, win_length in ((7, 4), (15, 5), (6, 6)):
+            game = make_game(size, win_length)
+            for _ in range(20):
+                game.reset()
+                for row, col in self.play_random(game, rng):
+                    self.assertEqual(game.winner, scan_winner(game.board, win_length))
+                    empty = [(r, c) for r in range(size) for c in range(size) if game.board[r][c] == 0]
+                    self.assertEqual(sorted(game.get_valid_moves()), empty)
+                if game.winner:
+                    (r0, c0), (r1, c1) = game.winning_line
+                    self.assertEqual(max(abs(r1 - r0), abs(c1 - c0)), win_length - 1)
+                    dr, dc = (r1 - r0) // (win_length - 1), (c1 - c0) // (win_length - 1)
+                    cells = [game.board[r0 + i * dr][c0 + i * dc] for i in range(win_length)]
+                    self.assertEqual(cells, [game.winner] * win_length)
+
+    def test_gomoku(self):
+        game = make_game(15)
+        self.assertIsInstance(make_game(3), TicTacToe)
+        self.assertEqual((game.size, game.win_length), (15, 5))
+        # Diagonale de O, X joue ailleurs
+        for i in range(5):
+            self.assertTrue(game.make_move(0, 2 * i))
+            self.assertTrue(game.make_move(14 - i, 10 + i))
+        self.assertEqual((game.winner, game.winning_line), (2, ((10, 14), (14, 10))))
+        self.assertFalse(game.make_move(5, 5))
+        self.assertFalse(KInARow(4, 3).make_move(4, 0))
+        with self.assertRaises(ValueError):
+            KInARow(3, 4)
+
+    def test_copy(self):
+        for game in (make_game(3), make_game(7, 4)):
+            game.make_move(1, 1)
+            clone = game.copy()
+            clone.make_move(0, 0)
+            self.assertEqual(game.board[0][0], 0)
+            self.assertEqual(len(game.free_cells), len(clone.free_cells) + 1)
+            self.assertEqual(sorted(clone.free_cells),
+                             sorted(r * game.size + c for r, c in clone.get_valid_moves()))
+
+
+class TestBatchTicTacToe(unittest.TestCase):
+    def test_matches_single_engine(self):
+        rng = np.random.default_rng(0)
+        batch = BatchTicTacToe(64)
+        games = [TicTacToe() for _ in range(64)]
+        for _ in range(9):
+            actions = batch.sample_valid_actions(rng)
+            # Quelques coups invalides pour vérifier qu'ils sont ignorés
+            actions[::7] = rng.integers(-1, 10, len(actions[::7]))
+            valid, winner, done = batch.step(actions)
+            for i, game in enumerate(games):
+                was_over = game.game_over
+                self.assertEqual(valid[i], game.make_move(*divmod(int(actions[i]), 3))
+                                 if 0 <= actions[i] < 9 else False)
+                self.assertEqual(done[i], game.game_over and not was_over)
+                self.assertEqual(winner[i], (game.winner or 0) if done[i] else 0)
+                self.assertEqual(batch.boards[i].tolist(), sum(game.board, []))
+                self.assertEqual(batch.current_player[i], game.current_player)
+    
+    def test_auto_reset(self):
+        batch = BatchTicTacToe(2, auto_reset=True)
+        for action in (0, 3, 1, 4):
+            batch.step([action, action])
+        valid, winner, done = batch.step([2, 8])
+        self.assertEqual(winner.tolist(), [1, 0])
+        self.assertEqual(done.tolist(), [True, False])
+        self.assertEqual(batch.boards[0].tolist(), [0] * 9)
+        self.assertFalse(batch.game_over[0])
+        self.assertEqual(batch.current_player.tolist(), [1, 2])
+
+class TestRendering(unittest.TestCase):
+    """Dirty-rect rendering of the pygame GUIs, on SDL's headless video driver"""
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    def tearDown(self):
+        import pygame
+        pygame.quit()
+
+    def test_game_dirty_rects(self):
+        import game
+        from game import TicTacToeGUI
+
+        self.assertIs(game.TicTacToe, TicTacToe)
+        gui = TicTacToeGUI()
+        self.assertEqual(gui.render(), [gui.screen.get_rect()])
+        self.assertEqual(gui.render(), [])
+        gui.game.make_move(1, 1)
+        cell, panel = gui.render()
+        self.assertEqual(cell.size, (gui.cell_size, gui.cell_size))
+        self.assertEqual(panel.top, gui.height - gui.info_height)
+        for row, col in [(0, 0), (1, 0), (0, 1)]:
+            gui.game.make_move(row, col)
+        self.assertEqual(len(gui.render()), 4)
+        gui.game.make_move(1, 2)
+        # Victoire : case, ligne gagnante et panneau
+        self.assertEqual(len(gui.render()), 3)
+        gui.game.reset()
+        self.assertEqual(gui.render(), [gui.screen.get_rect()])
+
+    def test_client_glyphs_rendered_once(self):
+        from client import TicTacToeGUI
+
+        gui = TicTacToeGUI(size=7, win_length=4)
+        renders = []
+
+        class CountingFont:
+            def render(self, *args):
+                renders.append(args)
+
+        gui.render()
+        gui.font = CountingFont()
+        for cell in range(10):
+            gui.game.play(cell)
+            dirty = gui.render()
+            self.assertEqual(dirty[0], gui.cell_rect(*divmod(cell, 7)))
+        self.assertEqual(renders, [])
+        # La dernière rangée est sous le bandeau d'état, redessiné avec elle
+        gui.game.play(6 * 7 + 3)
+        self.assertEqual(gui.render()[-1], gui.status_rect)
+
+    def test_online_gui(self):
+        import asyncio
+        import threading
+        import pygame
+        from client import NETWORK_EVENT, OnlineGUI
+        from protocol import VS_AI
+        from server import TicTacToeServer
+
+        server = TicTacToeServer(host='127.0.0.1', port=0, verbose=False)
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.listen())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            gui = OnlineGUI('127.0.0.1', server.port, VS_AI)
+
+            def network_events():
+                # Le thread réseau réveille la boucle avec NETWORK_EVENT
+                event = pygame.event.wait(5000)
+                self.assertEqual(event.type, NETWORK_EVENT)
+                gui.handle_event(event)
+
+            def scenario():
+                network_events()
+                self.assertEqual(gui.status_text(), "À vous de jouer (X)")
+                gui.render()
+                gui.handle_click((10, 10))
+                self.assertEqual(gui.render()[0], gui.cell_rect(0, 0))
+                self.assertEqual(gui.status_text(), "Tour de l'adversaire")
+                while gui.online.pending or gui.online.current_player != 1:
+                    network_events()
+                self.assertEqual(gui.online.rollbacks, 0)
+
+            # run() dans son ordre réel (filtre d'événements, connexion), la boucle de rendu remplacée
+            gui.loop = scenario
+            gui.run()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.run_until_complete(server.close())
+            loop.close()
+
+    def test_frame_counter(self):
+        import pygame
+        from render import FrameCounter, allow_events
+
+        pygame.display.set_mode((10, 10))
+        allow_events()
+        counter = FrameCounter()
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=(1, 1)))
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_r))
+        self.assertEqual([event.type for event in counter.wait_events()], [pygame.KEYDOWN])
+        counter.record(counter._wall_start)
+        self.assertEqual((counter.frames, counter.wakeups), (1, 1))
+        self.assertIn("1 images", counter.report())
 
 if __name__ == "__main__":
     unittest.main()
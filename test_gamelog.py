@@ -0,0 +1,100 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from gamelog import (MAX_DURATION_MS, O_WON, RECORD, RECORD_SIZE, X_WON, GameLogReader,
+                     GameLogWriter, pack_moves, pack_record, unpack_moves)
+from test_server import Client, ServerTestCase
+
+
+class TestGameLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pack_moves(self):
+        for cells in ([], [4], [0, 1, 2, 3, 4, 5, 6, 7, 8], [8, 0, 7]):
+            packed = pack_moves(cells)
+            self.assertEqual(len(packed), 5)
+            self.assertEqual(unpack_moves(packed, len(cells)), cells)
+
+    def test_duration_bounds(self):
+        # Horloge murale reculée pendant la partie, puis partie de plus de 49 jours
+        for end, duration in ((990.0, 0), (1000.0 + 2 ** 33, MAX_DURATION_MS)):
+            self.assertEqual(RECORD.unpack(pack_record([4], X_WON, 1000.0, end))[1], duration)
+
+    def test_segments_and_stats(self):
+        games = [([4, 0, 8, 2, 6, 1, 3], X_WON), ([0, 4, 8, 2, 6, 3, 5], O_WON), ([4, 0, 1], X_WON)] * 5
+        writer = GameLogWriter(self.directory, segment_records=4)
+        for cells, result in games:
+            writer.log_game(cells, result, 1000.0, 1002.5)
+        writer.close()
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+        reader = GameLogReader(self.directory)
+        self.assertEqual(len(reader), 15)
+        record = reader.segments[0][0]
+        self.assertEqual((record['start'], record['duration_ms'], record['n_moves']), (1000, 2500, 7))
+        self.assertEqual(reader.moves(reader.segments[0][:1]).tolist(), [[4, 0, 8, 2, 6, 1, 3, -1, -1]])
+        self.assertEqual(reader.opening_frequency().tolist(), [5, 0, 0, 0, 10, 0, 0, 0, 0])
+        self.assertEqual(reader.opening_frequency(depth=2)[4, 0], 10)
+        rates = reader.win_rate_by_first_move()
+        self.assertEqual((rates['games'][4], rates['x_wins'][4], rates['o_wins'][0]), (10, 10, 5))
+        self.assertEqual(rates['x_win_rate'][4], 1.0)
+
+        # Reprise après un arrêt brutal : l'enregistrement partiel est ignoré puis écrasé
+        last = os.path.join(self.directory, sorted(os.listdir(self.directory))[-1])
+        with open(last, 'ab') as f:
+            f.write(b'\x01' * 5)
+        self.assertEqual(len(GameLogReader(self.directory)), 15)
+        writer = GameLogWriter(self.directory, segment_records=4)
+        writer.log_game([4], X_WON, 0, 0)
+        writer.close()
+        self.assertEqual(os.path.getsize(last), 4 * RECORD_SIZE)
+        self.assertEqual(len(GameLogReader(self.directory)), 16)
+
+    def test_resume_ignores_other_prefixes(self):
+        # Segments du serveur et d'un worker du cluster dans le même répertoire
+        for prefix, count in (('games', 3), ('games-w0', 5)):
+            writer = GameLogWriter(self.directory, prefix, segment_records=2)
+            for _ in range(count):
+                writer.log_game([4], X_WON, 0, 0)
+            writer.close()
+        for prefix in ('games', 'games-w0'):
+            writer = GameLogWriter(self.directory, prefix, segment_records=2)
+            writer.log_game([4], X_WON, 0, 0)
+            writer.close()
+        sizes = {name: os.path.getsize(os.path.join(self.directory, name)) // RECORD_SIZE
+                 for name in os.listdir(self.directory)}
+        self.assertEqual(sizes, {'games-000000.log': 2, 'games-000001.log': 2, 'games-w0-000000.log': 2,
+                                 'games-w0-000001.log': 2, 'games-w0-000002.log': 2})
+        self.assertEqual(len(GameLogReader(self.directory)), 10)
+
+
+class TestServerGameLog(ServerTestCase):
+    def test_completed_games_are_logged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            async def scenario(server):
+                o_player, x_player = await Client.connect(server), await Client.connect(server)
+                await asyncio.gather(o_player.joined(), x_player.joined())
+                for i, (row, col) in enumerate([(0, 0), (1, 1), (0, 1), (2, 2), (0, 2)]):
+                    mover, other = (x_player, o_player) if i % 2 == 0 else (o_player, x_player)
+                    await mover.request('move', row=row, col=col)
+                    await other.receive()
+                o_player.close()
+                x_player.close()
+
+            self.run_with_server(scenario, game_log=directory)
+            reader = GameLogReader(directory)
+            self.assertEqual(len(reader), 1)
+            record = reader.segments[0][0]
+            self.assertEqual((record['result'], record['flags']), (X_WON, 0))
+            self.assertEqual(reader.moves(reader.segments[0]).tolist()[0][:5], [0, 4, 1, 8, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ("pygame", "tkinter", "torch", "stable_baselines3")
+
+# Module -> (heavy modules it must not import, import time budget in seconds)
+BUDGETS = {
+    "engine": (HEAVY_MODULES + ("numpy",), 0.1),
+    "solver": (HEAVY_MODULES + ("numpy",), 0.1),
+    "server": (HEAVY_MODULES + ("numpy",), 0.3),
+    "netclient": (HEAVY_MODULES + ("numpy",), 0.3),
+    "numpy_policy": (HEAVY_MODULES, 1.0),
+    "tictactoe_env": (HEAVY_MODULES, 1.0),
+    "ai": (HEAVY_MODULES, 1.0),
+    "mcts": (HEAVY_MODULES, 1.0),
+}
+
+
+def measure_import(module):
+    """Import `module` in a fresh interpreter, return (seconds, loaded heavy modules)"""
+    code = ("import sys, time; start = time.perf_counter(); "
+            f"import {module}; elapsed = time.perf_counter() - start; "
+            f"print(elapsed); print(' '.join(m for m in {HEAVY_MODULES + ('numpy',)!r} "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout.splitlines()
+    return float(out[0]), set(out[1].split())
+
+
+class TestImportBudget(unittest.TestCase):
+    def test_headless_imports(self):
+        for module, (forbidden, budget) in BUDGETS.items():
+            with self.subTest(module=module):
+                # Le meilleur de 2 essais pour ne pas dépendre du cache disque
+                seconds, loaded = min(measure_import(module), measure_import(module))
+                self.assertFalse(loaded & set(forbidden), f"{module} imports {loaded & set(forbidden)}")
+                self.assertLess(seconds, budget, f"import {module} took {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    unittest.main()
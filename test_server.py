@@ -0,0 +1,594 @@
+import asyncio
+import struct
+import random
+import threading
+import unittest
+
+from cluster import ServerCluster
+from engine import TicTacToe, make_game
+from inference import BatchInferenceQueue
+from loadgen import Bot, LoadStats, run_load
+from metrics import MetricsRegistry
+from netclient import NetworkClient, OnlineGame
+from protocol import (BINARY, JSON, MAX_BOARD_SIZE, PVP, VERSION, VS_AI, BinaryCodec, FrameDecoder,
+                      JsonCodec, apply_delta, client_handshake, delta_message, frame, read_frame,
+                      state_message)
+from registry import GameRegistry
+from server import TicTacToeServer
+
+
+class ServerTestCase(unittest.TestCase):
+    def run_with_server(self, scenario, **options):
+        """Run scenario(server) against a server listening on a free local port"""
+        async def main():
+            server = TicTacToeServer(host='127.0.0.1', port=0, verbose=False, metrics_port=0, **options)
+            await server.listen()
+            try:
+                await asyncio.wait_for(scenario(server), timeout=30)
+                # Laisser le serveur traiter les déconnexions
+                while server.connections:
+                    await asyncio.sleep(0.01)
+            finally:
+                await server.close()
+        asyncio.run(main())
+
+
+class Client:
+    """Minimal protocol client for the tests"""
+
+    @classmethod
+    async def connect(cls, server, encoding=BINARY, mode=PVP):
+        client = cls()
+        client.game_id = 0
+        client.reader, client.writer = await asyncio.open_connection('127.0.0.1', server.port)
+        client.codec = await client_handshake(client.reader, client.writer, encoding, mode)
+        return client
+
+    async def joined(self):
+        """Wait for the matchmaking queue to pair this client"""
+        joined = await self.receive()
+        self.game_id, self.player = joined['game_id'], joined['player']
+        return joined
+
+    def send(self, kind, **fields):
+        self.writer.write(frame(self.codec.encode(dict(type=kind, game_id=self.game_id, **fields))))
+
+    async def receive(self):
+        return self.codec.decode(await read_frame(self.reader))
+
+    async def request(self, kind, **fields):
+        self.send(kind, **fields)
+        await self.writer.drain()
+        return await self.receive()
+
+    def close(self):
+        self.writer.close()
+
+
+class TestProtocol(unittest.TestCase):
+    def test_roundtrip(self):
+        game = TicTacToe()
+        for row, col in [(0, 0), (1, 1), (0, 1), (2, 2), (0, 2)]:
+            game.make_move(row, col)
+        gomoku = make_game(15)
+        for i in range(5):
+            gomoku.make_move(i, i)
+            gomoku.make_move(14, i)
+        messages = [
+            {'type': 'hello', 'version': 2, 'encoding': JSON, 'mode': VS_AI},
+            {'type': 'joined', 'game_id': 70000, 'player': 2},
+            {'type': 'move', 'game_id': 3, 'row': 2, 'col': 1},
+            {'type': 'error', 'game_id': 3, 'error': 'NOT_YOUR_TURN'},
+            {'type': 'hint', 'game_id': 3, 'row': None, 'col': None},
+            state_message(3, game),
+            state_message(4, TicTacToe()),
+            delta_message(3, game, 0, 2, 1),
+            {'type': 'joined', 'game_id': 5, 'player': 1, 'size': 15, 'win_length': 5},
+            state_message(6, gomoku),
+            delta_message(6, gomoku, 4, 4, 1),
+        ]
+        for codec in (BinaryCodec, JsonCodec):
+            for message in messages:
+                self.assertEqual(codec.decode(codec.encode(message)), message)
+        self.assertLess(len(BinaryCodec.encode(state_message(3, game))),
+                        len(JsonCodec.encode(state_message(3, game))))
+        with self.assertRaises(ValueError):
+            BinaryCodec.decode(b'\x63')
+
+    def test_malformed_binary(self):
+        payloads = [
+            b'\x08' + struct.pack('!IB', 3, 0),                # code d'erreur 0
+            b'\x08' + struct.pack('!IB', 3, 99),               # code d'erreur inconnu
+            b'\x04' + struct.pack('!IBB', 3, 200, 1),          # case hors de tout plateau
+            b'\x0a' + struct.pack('!IBB', 3, 0xFF, 1),         # indice à moitié vide
+            b'\x06' + struct.pack('!IBBBB', 3, 250, 1, 0, 0),  # plateau trop grand
+            b'\x06' + struct.pack('!IBBBB', 3, 15, 1, 0, 0),   # plateau tronqué
+            b'\x06' + struct.pack('!IBBBB', 3, 3, 1, 0, 0) + b'\xff\xff\xff',  # case de valeur 3
+            b'\x03' + struct.pack('!IBBB', 3, 1, 2, 2),        # plateau 2x2
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                BinaryCodec.decode(payload)
+
+    def test_frame_decoder(self):
+        payloads = [BinaryCodec.encode({'type': 'get_state', 'game_id': i}) for i in range(3)]
+        stream = b''.join(frame(payload) for payload in payloads)
+        decoder = FrameDecoder()
+        # Un octet à la fois (paquets découpés), puis tout d'un coup (paquets fusionnés)
+        received = [p for i in range(len(stream)) for p in decoder.feed(stream[i:i + 1])]
+        self.assertEqual(received, payloads)
+        self.assertEqual(decoder.feed(stream), payloads)
+
+    def test_apply_delta(self):
+        game = TicTacToe()
+        state = state_message(1, game)
+        for row, col in [(0, 0), (1, 1), (0, 1), (2, 2), (0, 2)]:
+            player = game.current_player
+            game.make_move(row, col)
+            apply_delta(state, delta_message(1, game, row, col, player))
+        self.assertEqual(state, state_message(1, game))
+
+
+class TestTicTacToeServer(ServerTestCase):
+    def test_game_semantics(self):
+        async def scenario(server):
+            second = await Client.connect(server)
+            first = await Client.connect(server, encoding=JSON)
+            await asyncio.gather(first.joined(), second.joined())
+            self.assertEqual((second.player, first.player), (2, 1))
+            self.assertEqual((second.codec, first.codec), (BinaryCodec, JsonCodec))
+            self.assertEqual(second.game_id, first.game_id)
+
+            reply = await second.request('move', row=0, col=0)
+            self.assertEqual(reply['error'], 'NOT_YOUR_TURN')
+            delta = await first.request('move', row=1, col=1)
+            self.assertEqual((delta['type'], delta['player'], delta['current_player']), ('delta', 1, 2))
+            self.assertEqual(await second.receive(), delta)
+
+            self.assertEqual((await second.request('move', row=1, col=1))['error'], 'INVALID_MOVE')
+            # Trame illisible : BAD_MESSAGE, la connexion reste ouverte
+            second.writer.write(frame(b'\x04' + struct.pack('!IBB', second.game_id, 200, 0)))
+            self.assertEqual((await second.receive())['error'], 'BAD_MESSAGE')
+            hint = await second.request('get_hint')
+            self.assertEqual((hint['row'], hint['col']), (0, 0))
+            state = await second.request('get_state')
+            self.assertEqual(state['board'], [[0, 0, 0], [0, 1, 0], [0, 0, 0]])
+            self.assertEqual(state['current_player'], 2)
+
+            first.close()
+            second.close()
+        self.run_with_server(scenario)
+
+    def test_bad_version(self):
+        async def scenario(server):
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            # HELLO de la version 1, sans le champ mode
+            writer.write(frame(bytes((1, 1, BINARY))))
+            self.assertEqual(BinaryCodec.decode(await read_frame(reader))['error'], 'BAD_VERSION')
+            self.assertEqual(await reader.read(), b'')
+            writer.close()
+        self.run_with_server(scenario)
+
+    def test_many_connections(self):
+        async def scenario(server):
+            clients = await asyncio.gather(*(Client.connect(server) for _ in range(1000)))
+            await asyncio.gather(*(client.joined() for client in clients))
+            self.assertEqual(server.registry.live_games, 500)
+            # Chaque paire joue un coup en parallèle
+            replies = await asyncio.gather(*(
+                client.request('move', row=0, col=0) for client in clients if client.player == 1))
+            self.assertTrue(all(reply['type'] == 'delta' for reply in replies))
+            for client in clients:
+                client.close()
+        self.run_with_server(scenario)
+
+    def test_game_lifetime(self):
+        async def scenario(server):
+            o_player, x_player = await Client.connect(server), await Client.connect(server)
+            await asyncio.gather(o_player.joined(), x_player.joined())
+            self.assertEqual(server.registry.stats()['live_games'], 1)
+            for i, (row, col) in enumerate([(0, 0), (1, 1), (0, 1), (2, 2), (0, 2)]):
+                mover, other = (x_player, o_player) if i % 2 == 0 else (o_player, x_player)
+                delta = await mover.request('move', row=row, col=col)
+                self.assertEqual(await other.receive(), delta)
+            self.assertEqual(delta['winner'], 1)
+            # La partie terminée est récupérée
+            self.assertEqual(server.registry.stats(), {
+                'live_games': 0, 'waiting_players': 0, 'created_games': 1, 'reclaimed_games': 1})
+            self.assertEqual((await x_player.request('get_state'))['error'], 'NO_GAME')
+
+            # Rejouer, puis abandonner
+            x_player.send('queue')
+            o_player.send('queue')
+            await asyncio.gather(o_player.joined(), x_player.joined())
+            self.assertEqual(server.registry.live_games, 1)
+            o_player.close()
+            left = await x_player.receive()
+            self.assertEqual(left['error'], 'OPPONENT_LEFT')
+            self.assertEqual(server.registry.stats()['reclaimed_games'], 2)
+            self.assertEqual(server.registry.live_games, 0)
+            x_player.close()
+        self.run_with_server(scenario)
+
+    def test_play_vs_ai(self):
+        async def scenario(server):
+            client = await Client.connect(server, mode=VS_AI)
+            await client.joined()
+            self.assertEqual(client.player, 1)
+            self.assertEqual(server.registry.waiting_players, 0)
+            state = await client.request('get_state')
+            while not state['game_over']:
+                row, col = next((r, c) for r in range(3) for c in range(3) if state['board'][r][c] == 0)
+                apply_delta(state, await client.request('move', row=row, col=col))
+                if not state['game_over']:
+                    reply = await client.receive()
+                    self.assertEqual((reply['type'], reply['player']), ('delta', 2))
+                    apply_delta(state, reply)
+            self.assertEqual(server.registry.live_games, 0)
+            self.assertGreaterEqual(server.inference.stats()['boards'], 2)
+
+            # Nouvelle partie contre l'IA, abandonnée
+            client.send('play_ai')
+            await client.joined()
+            self.assertEqual(server.registry.live_games, 1)
+            client.close()
+        self.run_with_server(scenario)
+
+    def test_ai_fallback(self):
+        class BrokenAgent:
+            def __init__(self, error):
+                self.error = error
+
+            def predict_batch(self, boards, masks):
+                if self.error:
+                    raise RuntimeError("politique indisponible")
+                return [0] * len(boards)  # Toujours la case 0, occupée dès le premier coup
+
+        for error in (True, False):
+            async def scenario(server):
+                server._inference = BatchInferenceQueue(BrokenAgent(error))
+                client = await Client.connect(server, mode=VS_AI)
+                await client.joined()
+                state = await client.request('get_state')
+                while not state['game_over']:
+                    row, col = next((r, c) for r in range(3) for c in range(3) if state['board'][r][c] == 0)
+                    apply_delta(state, await client.request('move', row=row, col=col))
+                    if not state['game_over']:
+                        # Le solveur joue à la place de l'IA : une réponse à chaque coup
+                        reply = await asyncio.wait_for(client.receive(), timeout=1)
+                        self.assertEqual((reply['type'], reply['player']), ('delta', 2))
+                        apply_delta(state, reply)
+                self.assertEqual(server.registry.live_games, 0)
+                self.assertGreater(server._ai_fallbacks.value, 0)
+                client.close()
+            with self.subTest(error=error):
+                self.run_with_server(scenario)
+
+    def test_board_size_limits(self):
+        for size, win_length in ((2, None), (MAX_BOARD_SIZE + 1, None), (300, None), (15, 16)):
+            with self.subTest(size=size, win_length=win_length):
+                with self.assertRaises(ValueError):
+                    TicTacToeServer(verbose=False, board_size=size, win_length=win_length)
+                with self.assertRaises(ValueError):
+                    ServerCluster(verbose=False, board_size=size, win_length=win_length)
+        # Le plus grand plateau accepté : état complet en JSON dans une trame
+        n = MAX_BOARD_SIZE
+        state = {'type': 'state', 'game_id': 2 ** 32 - 1, 'board': [[2] * n] * n, 'current_player': 2,
+                 'game_over': True, 'winner': 2, 'winning_line': ((n - 1, 0), (n - 1, 4))}
+        frame(JsonCodec.encode(state))
+        frame(BinaryCodec.encode(state))
+
+    def test_large_board(self):
+        async def scenario(server):
+            o_player, x_player = await Client.connect(server), await Client.connect(server, JSON)
+            joined = await asyncio.gather(o_player.joined(), x_player.joined())
+            self.assertEqual({(j['size'], j['win_length']) for j in joined}, {(7, 4)})
+            # X aligne 4 pions sur la colonne 6, O joue sur la ligne 0
+            for i in range(4):
+                delta = await x_player.request('move', row=3 + i, col=6)
+                self.assertEqual(await o_player.receive(), delta)
+                if i < 3:
+                    await o_player.request('move', row=0, col=i)
+                    await x_player.receive()
+            self.assertEqual((delta['winner'], delta['winning_line']), (1, ((3, 6), (6, 6))))
+            self.assertEqual((await o_player.request('get_hint'))['error'], 'NO_GAME')
+
+            o_player.send('play_ai')
+            self.assertEqual((await o_player.receive())['error'], 'UNSUPPORTED')
+            o_player.send('queue')
+            x_player.send('queue')
+            await asyncio.gather(o_player.joined(), x_player.joined())
+            self.assertEqual((await x_player.request('get_hint'))['error'], 'UNSUPPORTED')
+            state = await x_player.request('get_state')
+            self.assertEqual(len(state['board']), 7)
+            o_player.close()
+            x_player.close()
+        self.run_with_server(scenario, board_size=7, win_length=4)
+
+    def test_metrics_endpoint(self):
+        async def scenario(server):
+            o_player, x_player = await Client.connect(server), await Client.connect(server)
+            await asyncio.gather(o_player.joined(), x_player.joined())
+            await x_player.request('move', row=1, col=1)
+            await o_player.receive()
+            await x_player.request('move', row=0, col=0)
+            # Un tour de l'IA : attente, taille et durée de l'appel groupé
+            ai_player = await Client.connect(server, mode=VS_AI)
+            await ai_player.joined()
+            await ai_player.request('move', row=1, col=1)
+            await ai_player.receive()
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.metrics_port)
+            writer.write(b'GET /metrics HTTP/1.0\r\n\r\n')
+            response = (await reader.read()).decode()
+            writer.close()
+            self.assertTrue(response.startswith('HTTP/1.0 200 OK'))
+            samples = dict(line.rsplit(' ', 1) for line in response.split('\r\n\r\n')[1].splitlines()
+                           if not line.startswith('#'))
+            self.assertEqual(samples['tictactoe_connections'], '3')
+            self.assertEqual(samples['tictactoe_live_games'], '2')
+            self.assertEqual(samples['tictactoe_messages_total{type="move"}'], '3')
+            self.assertEqual(samples['tictactoe_errors_total{error="NOT_YOUR_TURN"}'], '1')
+            self.assertEqual(samples['tictactoe_message_seconds_count'], '3')
+            self.assertEqual(samples['tictactoe_broadcast_recipients_total'], '4')
+            self.assertEqual(samples['tictactoe_ai_batch_size_count'], '1')
+            self.assertEqual(samples['tictactoe_ai_batch_size_bucket{le="1"}'], '1')
+            self.assertEqual(samples['tictactoe_ai_wait_seconds_count'], '1')
+            self.assertEqual(samples['tictactoe_ai_inference_seconds_count'], '1')
+            for client in (o_player, x_player, ai_player):
+                client.close()
+        self.run_with_server(scenario)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_render(self):
+        metrics = MetricsRegistry()
+        metrics.counter('requests_total', "Requêtes", ('kind',)).labels('a').inc(3)
+        metrics.gauge('queue', "File", fn=lambda: 7)
+        latency = metrics.histogram('latency_seconds', "Latence", bounds=(0.1, 1.0)).labels()
+        for value in (0.05, 0.5, 0.5, 2.0):
+            latency.observe(value)
+        self.assertEqual(latency.quantile(0.5), 1.0)
+        lines = metrics.render().splitlines()
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{kind="a"} 3', lines)
+        self.assertIn('queue 7', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_count 4', lines)
+        with self.assertRaises(ValueError):
+            metrics.gauge('queue', "File")
+
+
+class TestOnlineClient(ServerTestCase):
+    def test_optimistic_moves(self):
+        async def scenario(server):
+            wakeups = []
+            net = NetworkClient('127.0.0.1', server.port, VS_AI, on_message=lambda: wakeups.append(1))
+            await asyncio.to_thread(net.start)
+            online = OnlineGame()
+
+            async def receive():
+                online.handle(await asyncio.to_thread(net.messages.get, True, 5))
+
+            await receive()
+            self.assertEqual((online.joined, online.player), (True, 1))
+            while not online.game_over:
+                if online.current_player != online.player:
+                    await receive()
+                    continue
+                row, col = next((r, c) for r in range(3) for c in range(3) if online.board[r][c] == 0)
+                net.send(online.play(row, col))
+                # Affiché tout de suite, avant la réponse du serveur
+                self.assertEqual(online.board[row][col], 1)
+                self.assertEqual(len(online.pending), 1)
+                # Pas de second coup avant celui de l'adversaire
+                self.assertIsNone(online.play(*next((r, c) for r in range(3) for c in range(3)
+                                                    if online.board[r][c] == 0)))
+                await receive()
+                self.assertEqual(online.pending, [])
+            self.assertEqual(online.rollbacks, 0)
+            self.assertEqual(len(online.ack_seconds), len(online.confirmed) - len(online.confirmed) // 2)
+            self.assertEqual(len(wakeups), 1 + len(online.confirmed))
+            net.close()
+            self.assertEqual(net.messages.get(timeout=5)['type'], 'disconnected')
+        self.run_with_server(scenario)
+
+    def test_rollback(self):
+        online = OnlineGame()
+        self.assertIsNone(online.play(0, 0))
+        online.handle({'type': 'joined', 'game_id': 4, 'player': 1, 'size': 7, 'win_length': 4})
+        self.assertEqual(online.play(0, 0), {'type': 'move', 'game_id': 4, 'row': 0, 'col': 0})
+        online.handle({'type': 'error', 'game_id': 4, 'error': 'INVALID_MOVE'})
+        self.assertEqual((online.board[0][0], online.pending, online.rollbacks), (0, [], 1))
+
+        # Le serveur a retenu un autre coup que celui affiché : l'écran suit le serveur
+        online.play(0, 0)
+        online.handle({'type': 'delta', 'game_id': 4, 'row': 6, 'col': 6, 'player': 1, 'current_player': 2,
+                       'game_over': False, 'winner': None, 'winning_line': None})
+        self.assertEqual((online.board[0][0], online.board[6][6], online.current_player), (0, 1, 2))
+        self.assertIsNone(online.play(1, 1))
+        online.handle({'type': 'error', 'game_id': 4, 'error': 'OPPONENT_LEFT'})
+        self.assertTrue(online.game_over)
+
+    def test_connection_refused(self):
+        net = NetworkClient('127.0.0.1', 1)
+        with self.assertRaises(OSError):
+            net.start()
+
+
+class TestLoadGenerator(ServerTestCase):
+    def test_run_load(self):
+        async def scenario(server):
+            for mode in (PVP, VS_AI):
+                stats = await run_load('127.0.0.1', server.port, connections=20, duration=1.0,
+                                       strategy='solver', mode=mode)
+                report = stats.report()
+                self.assertEqual(report['connections'], 20)
+                self.assertEqual(report['errors'], {})
+                self.assertGreater(report['games'], 0)
+                self.assertEqual(report['moves'], len(stats.rtts))
+                self.assertLessEqual(report['rtt_ms']['p50'], report['rtt_ms']['p999'])
+        self.run_with_server(scenario)
+
+    def test_bot_recovers_from_refused_move(self):
+        class Clumsy(Bot):
+            def choose(self):
+                taken = [(r, c) for r, row in enumerate(self.board) for c, cell in enumerate(row) if cell]
+                if taken and not self.stats.errors:
+                    return taken[0]  # case déjà jouée : INVALID_MOVE
+                return super().choose()
+
+        async def scenario(server):
+            stats = LoadStats()
+            bot = Clumsy(stats, 'random', 0, VS_AI, random.Random(0), None)
+            task = asyncio.ensure_future(bot.run('127.0.0.1', server.port, BINARY))
+            for _ in range(200):
+                if stats.games >= 2:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            bot.close()
+            self.assertEqual(dict(stats.errors), {'INVALID_MOVE': 1})
+            self.assertGreaterEqual(stats.games, 2)
+        self.run_with_server(scenario)
+
+
+class TestBatchInferenceQueue(unittest.TestCase):
+    def test_batches_pending_boards(self):
+        class FirstLegal:
+            def predict_batch(self, boards, masks):
+                return masks.argmax(axis=1)
+
+        async def main():
+            queue = BatchInferenceQueue(FirstLegal(), max_batch=4, max_delay=0.01)
+            boards = [[1] * i + [0] * (9 - i) for i in range(6)]
+            actions = await asyncio.gather(*(queue.submit(board) for board in boards))
+            return queue, actions
+
+        queue, actions = asyncio.run(main())
+        self.assertEqual(actions, list(range(6)))
+        # 4 plateaux dès que le lot est plein, les 2 autres après max_delay
+        stats = queue.stats()
+        self.assertEqual((stats['batches'], stats['boards'], stats['largest_batch']), (2, 6, 4))
+
+
+class TestServerCluster(unittest.TestCase):
+    # Le noyau répartit les connexions entre les workers : des séries de parties
+    # jusqu'à ce qu'un joueur change de worker (une sur deux environ)
+    MAX_ROUNDS = 50
+
+    def run_with_cluster(self, scenario):
+        """Run scenario(cluster) once both workers listen; returns the cluster once stopped"""
+        cluster = ServerCluster(host='127.0.0.1', port=0, workers=2, verbose=False).start()
+        coordinator = threading.Thread(target=cluster.run)
+        coordinator.start()
+
+        async def main():
+            while cluster.ready < cluster.n_workers:
+                await asyncio.sleep(0.01)
+            await scenario(cluster)
+
+        try:
+            asyncio.run(asyncio.wait_for(main(), timeout=60))
+        finally:
+            cluster.stop()
+            coordinator.join()
+            cluster.close()
+        return cluster
+
+    def test_players_paired_across_workers(self):
+        async def scenario(cluster):
+            for _ in range(self.MAX_ROUNDS):
+                clients = [await Client.connect(cluster) for _ in range(20)]
+                await asyncio.gather(*(client.joined() for client in clients))
+                games = {}
+                for client in clients:
+                    games.setdefault(client.game_id, []).append(client)
+                self.assertEqual(len(games), 10)
+                for pair in games.values():
+                    x_player, o_player = sorted(pair, key=lambda client: client.player)
+                    self.assertEqual((x_player.player, o_player.player), (1, 2))
+                    delta = await x_player.request('move', row=1, col=1)
+                    self.assertEqual(await o_player.receive(), delta)
+                for client in clients:
+                    client.close()
+                if cluster.handoffs:
+                    break
+
+        self.assertGreater(self.run_with_cluster(scenario).handoffs, 0)
+
+    def test_pipelined_bytes_follow_handoff(self):
+        hello = frame(BinaryCodec.encode(
+            {'type': 'hello', 'version': VERSION, 'encoding': BINARY, 'mode': PVP}))
+        queue = frame(BinaryCodec.encode({'type': 'queue'}))
+        get_state = frame(BinaryCodec.encode({'type': 'get_state', 'game_id': 0}))
+
+        async def player(cluster):
+            reader, writer = await asyncio.open_connection('127.0.0.1', cluster.port)
+            # Une trame complète et le début d'une autre, avant d'être apparié
+            writer.write(hello + queue + get_state[:3])
+            self.assertEqual(BinaryCodec.decode(await read_frame(reader))['type'], 'welcome')
+            joined = BinaryCodec.decode(await read_frame(reader))
+            writer.write(get_state[3:])
+            state = BinaryCodec.decode(await read_frame(reader))
+            writer.close()
+            return joined['game_id'], state
+
+        async def scenario(cluster):
+            for _ in range(self.MAX_ROUNDS):
+                for game_id, state in await asyncio.gather(*(player(cluster) for _ in range(20))):
+                    self.assertEqual((state['type'], state['game_id']), ('state', game_id))
+                if cluster.handoffs:
+                    break
+
+        self.assertGreater(self.run_with_cluster(scenario).handoffs, 0)
+
+
+class TestGameRegistry(unittest.TestCase):
+    def test_concurrent_matchmaking(self):
+        registry = GameRegistry()
+        players = [object() for _ in range(2000)]
+        sessions = []
+
+        def join(chunk):
+            for player in chunk:
+                session = registry.join(player)
+                if session is not None:
+                    sessions.append(session)
+
+        threads = [threading.Thread(target=join, args=(players[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(sessions), 1000)
+        paired = [p for session in sessions for p in session.players.values()]
+        self.assertEqual(len(set(map(id, paired))), 2000)
+        self.assertEqual(registry.waiting_players, 0)
+        self.assertEqual(registry.live_games, 1000)
+
+        for session in sessions[:10]:
+            registry.finish(session)
+            registry.finish(session)
+        self.assertEqual(registry.stats()['reclaimed_games'], 10)
+        self.assertEqual(registry.live_games, 990)
+
+    def test_waiting_player_leaves(self):
+        registry = GameRegistry()
+        first, second, third = object(), object(), object()
+        self.assertIsNone(registry.join(first))
+        self.assertIsNone(registry.leave(first))
+        self.assertIsNone(registry.join(second))
+        session = registry.join(third)
+        self.assertEqual(session.players, {1: third, 2: second})
+        self.assertIs(registry.leave(third), session)
+        self.assertIsNone(registry.session_of(second))
+        self.assertEqual(registry.stats()['reclaimed_games'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import random
+import tempfile
+import unittest
+
+from engine import TicTacToe
+from solver import (Solver, SolverAgent, canonical, oracle_report,
+                    reachable_codes)
+
+
+class TestSolver(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = Solver.load()
+
+    def test_positions(self):
+        codes = reachable_codes()
+        self.assertEqual(len(codes), 5478)
+        self.assertEqual(len({canonical(code) for code in codes}), 765)
+        self.assertEqual(self.solver.value([[0] * 3] * 3), 0)
+        # X gagne en jouant (0, 2), O doit bloquer en (0, 2)
+        self.assertEqual(self.solver.best_move([[1, 1, 0], [2, 2, 0], [0, 0, 0]]), (0, 2))
+        self.assertEqual(self.solver.best_move([[1, 1, 0], [2, 0, 0], [0, 0, 0]]), (0, 2))
+        self.assertGreater(self.solver.value([[1, 1, 0], [2, 2, 0], [0, 0, 0]]), 0)
+        self.assertIsNone(self.solver.best_move([[1, 1, 1], [2, 2, 0], [0, 0, 0]]))
+
+    def test_load_matches_build(self):
+        built = Solver.build()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "solver.bin")
+            built.save(path)
+            loaded = Solver.load(path)
+        self.assertEqual(loaded.values, self.solver.values)
+        self.assertEqual(loaded.moves, self.solver.moves)
+
+    def test_agent_never_loses(self):
+        rng = random.Random(0)
+        agent = SolverAgent(self.solver)
+        game = TicTacToe()
+        for i in range(200):
+            game.reset()
+            agent_player = 1 + i % 2
+            while not game.game_over:
+                valid_moves = game.get_valid_moves()
+                if game.current_player == agent_player:
+                    move = agent.predict(game.board, valid_moves)
+                else:
+                    move = rng.choice(valid_moves)
+                self.assertTrue(game.make_move(*move))
+            self.assertIn(game.winner, (None, agent_player))
+
+    def test_oracle_report(self):
+        report = oracle_report(SolverAgent(self.solver), self.solver)
+        self.assertEqual(report['accuracy'], 1.0)
+        self.assertEqual(report['mistakes'], [])
+
+        class FirstMoveAgent:
+            def predict(self, board, valid_moves):
+                return valid_moves[0]
+
+        report = oracle_report(FirstMoveAgent(), self.solver)
+        self.assertLess(report['accuracy'], 1.0)
+        code, move = report['mistakes'][0]
+        self.assertFalse(self.solver.is_optimal(
+            [[(code // 3 ** (3 * r + c)) % 3 for c in range(3)] for r in range(3)], move))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Gymnasium environment for training the tic-tac-toe agent.
+
+Only needs numpy and gymnasium: stable_baselines3/torch are imported by
+the training and inference code in ai.py.
+"""
+import numpy as np
+import gymnasium as gym
+from batch_game import LINES
+from engine import TicTacToe, make_game
+from solver import N_CODES, POWERS, TERNARY
+
+# === ENVIRONNEMENT GYMNASIUM ===
+class TicTacToeEnv(gym.Env):
+    """The agent places the stone of the player to move, rewards are O's.
+
+    size and win_length select the game (engine.make_game); actions and
+    observations are the size * size cells. The strategic shaping reward
+    of non-final steps only exists for 3x3 (STRATEGIC_REWARDS), larger
+    boards only get the final rewards.
+    """
+    metadata = {"render_modes": ["human"]}
+
+    def __init__(self, render_mode=None, size=3, win_length=None):
+        super(TicTacToeEnv, self).__init__()
+        self.render_mode = render_mode
+        self.size = size
+        self.game = make_game(size, win_length)
+        self._shaped = isinstance(self.game, TicTacToe)
+
+        self.action_space = gym.spaces.Discrete(size * size)
+        self.observation_space = gym.spaces.Box(low=0, high=2, shape=(size * size,), dtype=np.int32)
+
+    def _obs(self):
+        return np.array(self.game.board, dtype=np.int32).flatten()
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self.game.reset()
+        return self._obs(), {"action_mask": self.action_masks()}
+
+    def action_masks(self):
+        """Boolean (size * size,) array of the legal cells: the empty ones, none once the game is over"""
+        if self.game.game_over:
+            return np.zeros(self.size * self.size, dtype=bool)
+        return self._obs() == 0
+
+    def step(self, action):
+        row, col = divmod(int(action), self.size)
+
+        if not self.game.make_move(row, col):
+            return (self._obs(), -20, True, False,
+                    {"invalid_move": True, "action_mask": self.action_masks()})
+
+        terminated = self.game.game_over
+        info = {"action_mask": self.action_masks()}
+
+        if self.game.winner == 2:
+            reward = 100
+        elif self.game.winner == 1:
+            reward = -100
+        elif self.game.game_over:
+            reward = 10
+        elif self._shaped:
+            x, o = self.game.masks
+            reward = float(STRATEGIC_REWARDS[TERNARY[x] + 2 * TERNARY[o]])
+        else:
+            reward = 0
+
+        return self._obs(), reward, terminated, False, info
+
+# Score of a line indexed by [number of O (player 2), number of X (player 1)]:
+# +100/-100 for three O/X, 10/2 for two/one O with the rest empty,
+# 15/3 for two/one X with the rest empty (a threat worth blocking)
+LINE_SCORES = np.zeros((4, 4), dtype=np.float32)
+LINE_SCORES[3, 0] = 100
+LINE_SCORES[0, 3] = -100
+LINE_SCORES[2, 0] = 10
+LINE_SCORES[1, 0] = 2
+LINE_SCORES[0, 2] = 15
+LINE_SCORES[0, 1] = 3
+
+CORNERS = [0, 2, 6, 8]
+
+
+BOARD_POWERS = np.array(POWERS)  # solver.POWERS as a vector: base-3 codes of board arrays
+
+
+def _shaped_rewards(boards):
+    """Strategic reward of O for an (N, 9) array of boards: line scores, center and corners"""
+    lines = boards[:, LINES]
+    rewards = LINE_SCORES[(lines == 2).sum(axis=2), (lines == 1).sum(axis=2)].sum(axis=1)
+    rewards += np.where(boards[:, 4] == 2, 2, np.where(boards[:, 4] == 1, -1, 0))
+    rewards += (boards[:, CORNERS] == 2).sum(axis=1)
+    return rewards
+
+
+# Strategic reward of every one of the 3^9 boards, indexed by base-3 code
+STRATEGIC_REWARDS = _shaped_rewards(np.arange(N_CODES)[:, None] // BOARD_POWERS % 3)
+
+
+def strategic_rewards(boards):
+    """Strategic reward of O (shaping of non-final steps) for an (N, 9) array of boards"""
+    return STRATEGIC_REWARDS[np.asarray(boards, dtype=np.intp) @ BOARD_POWERS]
@@ -0,0 +1,286 @@
+"""Vectorized environments for train_ai (stable_baselines3 VecEnv subclasses)."""
+import multiprocessing as mp
+
+import numpy as np
+import gymnasium as gym
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+from batch_game import BatchTicTacToe
+from tictactoe_env import strategic_rewards
+
+
+# === ENVIRONNEMENT VECTORISÉ ===
+class BatchVecEnv(VecEnv):
+    """Base of the in-process VecEnvs whose n_envs games live in one BatchTicTacToe.
+
+    There is no object per env: get_attr, set_attr and env_method act on
+    the VecEnv itself. Subclasses implement reset() and step_wait().
+    """
+    render_mode = None
+
+    def __init__(self, n_envs):
+        self.games = BatchTicTacToe(n_envs)
+        self._actions = None
+        super().__init__(n_envs,
+                         gym.spaces.Box(low=0, high=2, shape=(9,), dtype=np.int32),
+                         gym.spaces.Discrete(9))
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def action_masks(self):
+        return self.games.valid_moves_mask()
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
+
+
+class TicTacToeVecEnv(BatchVecEnv):
+    """N copies of TicTacToeEnv stepped together on a BatchTicTacToe.
+
+    Same rules and rewards as TicTacToeEnv; finished episodes are reset
+    automatically and their last board is put in info["terminal_observation"]
+    as SB3 expects.
+    """
+
+    def reset(self):
+        self.games.reset()
+        self._reset_seeds()
+        self._reset_options()
+        return self.games.boards.astype(np.int32)
+
+    def step_wait(self):
+        valid, winner, done = self.games.step(self._actions)
+        obs = self.games.boards.astype(np.int32)
+
+        rewards = np.where(winner == 2, 100., np.where(winner == 1, -100., 10.))
+        rewards = np.where(done, rewards, strategic_rewards(obs))
+        rewards[~valid] = -20
+        dones = done | ~valid
+
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = obs[i].copy()
+            if not valid[i]:
+                infos[i]["invalid_move"] = True
+        if dones.any():
+            self.games.reset(dones)
+            obs[dones] = 0
+        return obs, rewards.astype(np.float32), dones, infos
+
+
+# === ENVIRONNEMENTS DANS DES PROCESSUS ===
+def _shared_array(dtype, shape):
+    """Process-shared buffer (no lock) and a NumPy view on it"""
+    dtype = np.dtype(dtype)
+    raw = mp.RawArray('b', max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return raw, _view(raw, dtype, shape)
+
+
+def _view(raw, dtype, shape):
+    return np.frombuffer(raw, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def _worker(remote, parent_remote, env_fns, start, stop, buffers, obs_dtype, obs_shape):
+    """Run envs [start, stop) and exchange actions/obs/rewards/dones through shared buffers.
+
+    Action masks (info["action_mask"]) are written to a shared buffer too,
+    only the infos of finished episodes (or non-empty ones) go through the pipe.
+    """
+    parent_remote.close()
+    envs = [env_fn() for env_fn in env_fns.var]
+    n_envs = buffers['n_envs']
+    obs = _view(buffers['obs'], obs_dtype, (n_envs,) + obs_shape)[start:stop]
+    actions = _view(buffers['actions'], np.int64, (n_envs,))[start:stop]
+    rewards = _view(buffers['rewards'], np.float32, (n_envs,))[start:stop]
+    dones = _view(buffers['dones'], np.bool_, (n_envs,))[start:stop]
+    masks = None
+    if 'masks' in buffers:
+        masks = _view(buffers['masks'], np.bool_, (n_envs, buffers['n_actions']))[start:stop]
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                infos = []
+                for i, env in enumerate(envs):
+                    ob, reward, terminated, truncated, info = env.step(actions[i])
+                    done = terminated or truncated
+                    if done:
+                        info["TimeLimit.truncated"] = truncated and not terminated
+                        info["terminal_observation"] = ob
+                        ob, reset_info = env.reset()
+                        info["action_mask"] = reset_info.get("action_mask")
+                    obs[i] = ob
+                    rewards[i] = reward
+                    dones[i] = done
+                    mask = info.pop("action_mask", None)
+                    if masks is not None and mask is not None:
+                        masks[i] = mask
+                    if info:
+                        infos.append((start + i, info))
+                remote.send(infos)
+            elif cmd == 'reset':
+                seeds, options = data
+                reset_infos = []
+                for i, env in enumerate(envs):
+                    obs[i], info = env.reset(seed=seeds[i], options=options[i])
+                    mask = info.pop("action_mask", None)
+                    if masks is not None and mask is not None:
+                        masks[i] = mask
+                    reset_infos.append(info)
+                remote.send(reset_infos)
+            elif cmd == 'get_attr':
+                attr_name, indices = data
+                remote.send([getattr(envs[i - start], attr_name) for i in indices])
+            elif cmd == 'set_attr':
+                attr_name, value, indices = data
+                for i in indices:
+                    setattr(envs[i - start], attr_name, value)
+                remote.send(None)
+            elif cmd == 'env_method':
+                method_name, args, kwargs, indices = data
+                remote.send([getattr(envs[i - start], method_name)(*args, **kwargs) for i in indices])
+            elif cmd == 'is_wrapped':
+                wrapper_class, indices = data
+                remote.send([isinstance(envs[i - start], wrapper_class) for i in indices])
+            elif cmd == 'close':
+                for env in envs:
+                    env.close()
+                remote.close()
+                break
+    except KeyboardInterrupt:
+        pass
+
+
+class ShmSubprocVecEnv(VecEnv):
+    """VecEnv running gymnasium envs in worker processes.
+
+    Each of the n_workers processes owns a contiguous slice of the envs.
+    Actions, observations, rewards and dones live in shared memory, so a
+    step only sends a short command (and the infos of finished episodes)
+    over the pipes instead of pickling every observation. Envs with an
+    action_masks() method also share their masks (action_masks()).
+    """
+
+    def __init__(self, env_fns, n_workers=None, start_method=None):
+        n_envs = len(env_fns)
+        n_workers = min(n_workers or mp.cpu_count(), n_envs)
+
+        probe = env_fns[0]()
+        observation_space, action_space = probe.observation_space, probe.action_space
+        has_masks = hasattr(probe, "action_masks")
+        probe.close()
+        self._obs_dtype = observation_space.dtype
+        self._obs_shape = observation_space.shape
+
+        buffers = {'n_envs': n_envs}
+        buffers['obs'], self._obs = _shared_array(self._obs_dtype, (n_envs,) + self._obs_shape)
+        buffers['actions'], self._actions = _shared_array(np.int64, (n_envs,))
+        buffers['rewards'], self._rewards = _shared_array(np.float32, (n_envs,))
+        buffers['dones'], self._dones = _shared_array(np.bool_, (n_envs,))
+        self._masks = None
+        if has_masks:
+            buffers['n_actions'] = int(action_space.n)
+            buffers['masks'], self._masks = _shared_array(np.bool_, (n_envs, action_space.n))
+
+        # forkserver like SB3's SubprocVecEnv: forking a process that already
+        # runs torch threads is not safe
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        bounds = np.linspace(0, n_envs, n_workers + 1).astype(int)
+        self._slices = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        self.remotes, self.processes = [], []
+        for start, stop in self._slices:
+            remote, work_remote = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(work_remote, remote, CloudpickleWrapper(env_fns[start:stop]), start, stop,
+                      buffers, self._obs_dtype, self._obs_shape),
+                daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.closed = False
+        self.waiting = False
+        super().__init__(n_envs, observation_space, action_space)
+
+    def action_masks(self):
+        return self._masks.copy()
+
+    @property
+    def n_workers(self):
+        return len(self.processes)
+
+    def reset(self):
+        for remote, (start, stop) in zip(self.remotes, self._slices):
+            remote.send(('reset', (self._seeds[start:stop], self._options[start:stop])))
+        self.reset_infos = [info for remote in self.remotes for info in remote.recv()]
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs.copy()
+
+    def step_async(self, actions):
+        self._actions[:] = actions
+        for remote in self.remotes:
+            remote.send(('step', None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [{} for _ in range(self.num_envs)]
+        for remote in self.remotes:
+            for i, info in remote.recv():
+                infos[i] = info
+        self.waiting = False
+        return self._obs.copy(), self._rewards.copy(), self._dones.copy(), infos
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def _call(self, cmd, indices, *data):
+        """Send cmd to the workers owning `indices` and concatenate their answers"""
+        indices = self._get_indices(indices)
+        results = []
+        for remote, (start, stop) in zip(self.remotes, self._slices):
+            mine = [i for i in indices if start <= i < stop]
+            if mine:
+                remote.send((cmd, data + (mine,)))
+                results.extend(remote.recv() or [])
+        return results
+
+    def get_attr(self, attr_name, indices=None):
+        return self._call('get_attr', indices, attr_name)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call('set_attr', indices, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._call('env_method', indices, method_name, method_args, method_kwargs)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self._call('is_wrapped', indices, wrapper_class)